@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""
+Batch wiki generator: document many repositories in one run.
+Usage: python batch_docs.py manifest.txt --output-dir wikis/ [--jobs N]
+
+The manifest lists one repository path per line (blank lines and `#`
+comments are ignored). Repositories are scheduled across one shared pool
+of worker processes, and each gets its own directory with WIKI.md,
+analysis.json and the analysis log.
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import argparse
+import contextlib
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import fields
+
+# Import from sibling scripts
+script_dir = Path(__file__).parent
+sys.path.insert(0, str(script_dir))
+
+from lsp_analyzer import (
+    AnalysisOptions, add_analysis_arguments, options_from_args, analyze_project,
+    default_daemon_socket, spawn_daemon, write_analysis
+)
+from generate_wiki import generate_wiki
+
+def read_manifest(path: Path) -> list[Path]:
+    """Repository roots listed in a manifest, resolved and deduplicated."""
+    base = path.resolve().parent
+    roots = []
+    seen = set()
+    for line in path.read_text().splitlines():
+        line = line.split("#", 1)[0].strip()
+        if not line:
+            continue
+        root = (base / Path(line).expanduser()).resolve()
+        if root not in seen:
+            seen.add(root)
+            roots.append(root)
+    return roots
+
+def output_slugs(roots: list[Path]) -> dict[Path, str]:
+    """A distinct output directory name per repository."""
+    slugs = {}
+    used = set()
+    for root in roots:
+        slug = re.sub(r"[^\w.-]+", "-", root.name) or "repo"
+        candidate, n = slug, 1
+        while candidate in used:
+            n += 1
+            candidate = f"{slug}-{n}"
+        used.add(candidate)
+        slugs[root] = candidate
+    return slugs
+
+def document_repository(root: Path, output_dir: Path, use_lsp: bool, options: AnalysisOptions) -> dict:
+    """Analyze one repository and write its wiki; runs in a worker process."""
+    output_dir.mkdir(parents=True, exist_ok=True)
+    result = {"path": str(root), "output": str(output_dir), "pid": os.getpid(), "started": time.time()}
+    with open(output_dir / "analysis.log", "w") as log, contextlib.redirect_stderr(log):
+        try:
+            began = time.monotonic()
+            analysis = analyze_project(root, use_lsp=use_lsp, options=options)
+            result["analysis_seconds"] = time.monotonic() - began
+            
+            began = time.monotonic()
+            with open(output_dir / "analysis.json", "w") as out:
+                write_analysis(analysis, out)
+            # File records are streamed from the analysis, spilled or not
+            project = {f.name: getattr(analysis, f.name) for f in fields(analysis)}
+            (output_dir / "WIKI.md").write_text(generate_wiki(project))
+            result["wiki_seconds"] = time.monotonic() - began
+            
+            result.update(status="ok", language=analysis.language, files=len(analysis.files))
+        except Exception as e:
+            print(f"Error: {e}", file=sys.stderr)
+            result.update(status="failed", error=f"{type(e).__name__}: {e}")
+    result["finished"] = time.time()
+    return result
+
+def peak_concurrency(results: list[dict]) -> int:
+    """Most repositories in flight at once, from their start/finish times."""
+    events = sorted([(r["started"], 1) for r in results if "started" in r] +
+                    [(r["finished"], -1) for r in results if "finished" in r])
+    peak = current = 0
+    for _, delta in events:
+        current += delta
+        peak = max(peak, current)
+    return peak
+
+def summarize_batch(results: list[dict], wall: float, jobs: int, options: AnalysisOptions) -> dict:
+    """Aggregate timing and throughput for the whole batch."""
+    done = [r for r in results if r.get("status") == "ok"]
+    busy = sum(r.get("analysis_seconds", 0) + r.get("wiki_seconds", 0) for r in results)
+    files = sum(r.get("files", 0) for r in done)
+    return {
+        "repositories": len(results),
+        "succeeded": len(done),
+        "failed": len(results) - len(done),
+        "wall_seconds": round(wall, 2),
+        "worker_seconds": round(busy, 2),
+        "files": files,
+        "files_per_second": round(files / wall, 1) if wall else 0.0,
+        "limits": {"jobs": jobs, "lsp_workers": options.lsp_workers, "daemon": options.daemon is not None},
+        "peak_concurrency": peak_concurrency(results),
+        "utilization": round(busy / (wall * jobs), 2) if wall and jobs else 0.0,
+        "slowest": [
+            {"path": r["path"], "seconds": round(r.get("analysis_seconds", 0) + r.get("wiki_seconds", 0), 2)}
+            for r in sorted(done, key=lambda r: -(r.get("analysis_seconds", 0) + r.get("wiki_seconds", 0)))[:5]
+        ]
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate WIKI.md for every repository in a manifest")
+    parser.add_argument("manifest", help="File listing one repository path per line")
+    parser.add_argument("--output-dir", "-o", default="wikis", help="Directory for per-repository output")
+    parser.add_argument("--jobs", "-j", type=int, default=min(4, os.cpu_count() or 1),
+                        help="Repositories analyzed in parallel (worker processes)")
+    parser.add_argument("--no-lsp", action="store_true", help="Skip LSP, use fallback analyzers")
+    add_analysis_arguments(parser)
+    args = parser.parse_args()
+    
+    manifest = Path(args.manifest)
+    if not manifest.exists():
+        print(f"Error: {manifest} does not exist", file=sys.stderr)
+        sys.exit(1)
+    entries = read_manifest(manifest)
+    roots = [root for root in entries if root.is_dir()]
+    
+    options = options_from_args(args)
+    jobs = max(1, min(args.jobs, len(roots) or 1))
+    output_dir = Path(args.output_dir)
+    slugs = output_slugs(roots)
+    
+    # One daemon for all workers, started before they race to spawn it
+    if options.daemon is not None and not args.no_lsp:
+        socket_path = Path(options.daemon) if options.daemon else default_daemon_socket()
+        if not spawn_daemon(socket_path):
+            print(f"[WARN] Could not start the LSP daemon at {socket_path}", file=sys.stderr)
+    
+    print(f"[INFO] {len(entries)} repositories, {jobs} workers", file=sys.stderr)
+    # Entries that are not directories fail without taking a worker
+    results = []
+    for root in entries:
+        if not root.is_dir():
+            error = "not a directory" if root.exists() else "not found"
+            results.append({"path": str(root), "status": "failed", "error": error})
+            print(f"  ✗ [{len(results)}/{len(entries)}] {root}: {error}", file=sys.stderr)
+    began = time.monotonic()
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        futures = {
+            executor.submit(document_repository, root, output_dir / slugs[root], not args.no_lsp, options): root
+            for root in roots
+        }
+        for future in as_completed(futures):
+            root = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:  # worker died (OOM kill, segfault in a native extension...)
+                result = {"path": str(root), "status": "failed", "error": f"{type(e).__name__}: {e}"}
+            results.append(result)
+            seconds = result.get("analysis_seconds", 0) + result.get("wiki_seconds", 0)
+            status = "✓" if result["status"] == "ok" else "✗"
+            print(f"  {status} [{len(results)}/{len(entries)}] {root} ({seconds:.1f}s)"
+                  + (f": {result['error']}" if result["status"] != "ok" else ""), file=sys.stderr)
+    wall = time.monotonic() - began
+    
+    summary = summarize_batch(results, wall, jobs, options)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    report = {"summary": summary, "repositories": sorted(results, key=lambda r: r["path"])}
+    (output_dir / "batch-report.json").write_text(json.dumps(report, indent=2))
+    
+    print(f"\n✓ Documented {summary['succeeded']}/{summary['repositories']} repositories "
+          f"in {summary['wall_seconds']:.1f}s", file=sys.stderr)
+    print(f"  - Worker time: {summary['worker_seconds']:.1f}s across {jobs} workers "
+          f"(utilization {summary['utilization']:.0%}, peak {summary['peak_concurrency']} in flight)",
+          file=sys.stderr)
+    print(f"  - Files: {summary['files']} ({summary['files_per_second']}/s)", file=sys.stderr)
+    print(f"  - Report: {output_dir / 'batch-report.json'}", file=sys.stderr)
+    if summary["failed"]:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
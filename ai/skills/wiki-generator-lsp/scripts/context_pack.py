@@ -0,0 +1,352 @@
+#!/usr/bin/env python3
+"""
+Build a token-budgeted context pack from LSP analysis output.
+
+The pack is one JSON file with three tiers of markdown entries: a project
+summary, one outline per module and one detail entry per top-level
+symbol. Every entry carries an importance score and a token estimate, and
+entries are stored in rank order: each prefix is the most valuable
+content for its size, and a symbol never comes before its module outline.
+A bucketed budget index maps any token budget to its prefix in constant
+time, so an agent can take N tokens without reading the rest.
+
+Usage:
+    python context_pack.py analysis.json -o context-pack.json
+    python context_pack.py context-pack.json --budget 4000
+"""
+
+import sys
+import json
+import heapq
+import argparse
+from pathlib import Path
+
+from generate_wiki import page_module, symbol_count
+
+PACK_FORMAT = "wiki-generator-lsp/context-pack"
+PACK_VERSION = 1
+CHARS_PER_TOKEN = 4  # rough estimate for code-heavy English text
+BUDGET_BUCKET = 64  # tokens per budget index slot
+
+SUMMARY_MODULES = 15
+MODULE_FILES = 20
+MODULE_SYMBOLS = 30
+SYMBOL_LINKS = 10  # callers / callees listed per symbol
+DOCSTRING_CHARS = 800
+TIERS = ("summary", "module", "symbol")
+SYMBOL_KINDS = ("class", "interface", "struct", "enum", "function", "method", "type", "trait", "constant")
+
+def estimate_tokens(text: str) -> int:
+    """Token estimate from the character count; no tokenizer needed."""
+    return max(1, -(-len(text) // CHARS_PER_TOKEN))
+
+def clip(text: str, limit: int) -> str:
+    text = text.strip()
+    return text if len(text) <= limit else text[:limit].rstrip() + " …"
+
+def listing(names: list, limit: int) -> str:
+    """Comma-separated names, with a count of the ones left out."""
+    shown = ", ".join(names[:limit])
+    return shown + (f", … {len(names) - limit} more" if len(names) > limit else "")
+
+# ============================================================================
+# Collection
+# ============================================================================
+
+class ContextPackBuilder:
+    """Folds file records into compact symbol summaries as they arrive.
+    
+    Only what the pack renders is kept per file, so file records can be
+    dropped once added (the same contract as WikiAggregator.add_file).
+    """
+    
+    def __init__(self):
+        self.modules = {}  # module -> {"files": [(path, symbols)], "symbols": [...]}
+    
+    def add_file(self, f: dict):
+        if f.get("skipped"):
+            return
+        module = self.modules.setdefault(page_module(f["path"]), {"files": [], "symbols": []})
+        module["files"].append((f["path"], symbol_count(f)))
+        seen = set()
+        for sym in f.get("symbols", []):
+            if sym.get("kind") not in SYMBOL_KINDS:
+                continue
+            children = sym.get("children", [])
+            key = f"{f['path']}:{sym['name']}"
+            # Same-named definitions (Go methods, overloads) are told apart by line
+            entry_key = key if key not in seen else f"{key}@{sym.get('line')}"
+            seen.add(entry_key)
+            module["symbols"].append({
+                "key": key,  # call-graph key
+                "entry_key": entry_key,
+                "name": sym["name"],
+                "kind": sym["kind"],
+                "path": f["path"],
+                "line": sym.get("line"),
+                "end_line": sym.get("end_line"),
+                "detail": sym.get("detail", ""),
+                "docstring": clip(sym.get("docstring", ""), DOCSTRING_CHARS),
+                "references": sym.get("reference_count", 0) + sum(c.get("reference_count", 0) for c in children),
+                "members": [c["name"] for c in children]
+            })
+    
+    def build(self, analysis: dict) -> dict:
+        """The pack for the collected files and the project-level fields."""
+        call_graph = analysis.get("call_graph", {})
+        callers = {}
+        for caller, callees in call_graph.items():
+            for callee in callees:
+                callers.setdefault(callee, []).append(caller)
+        
+        def linked(graph: dict, key: str) -> list:
+            """Graph entries for a symbol and its members (`key.member`)."""
+            found = set(graph.get(key, []))
+            for member in member_keys.get(key, []):
+                found.update(graph.get(member, []))
+            return sorted(found)
+        
+        # Call graph keys of class members, grouped under their class key
+        member_keys = {}
+        for key in set(call_graph) | set(callers):
+            path, _, name = key.rpartition(":")
+            if "." in name:
+                member_keys.setdefault(f"{path}:{name.split('.')[0]}", []).append(key)
+        
+        module_of = {path: name for name, module in self.modules.items() for path, _ in module["files"]}
+        uses = {name: set() for name in self.modules}
+        importers = {name: 0 for name in self.modules}
+        for source, targets in analysis.get("module_graph", {}).get("edges", {}).items():
+            for target in targets:
+                a, b = module_of.get(source), module_of.get(target)
+                if a and b and a != b:
+                    uses[a].add(b)
+                    importers[b] += 1
+        used_by = {name: sorted(a for a in self.modules if name in uses[a]) for name in self.modules}
+        
+        entries = {}
+        children = {}  # module entry id -> symbol entry ids
+        module_scores = {}
+        for name, module in self.modules.items():
+            symbol_ids = []
+            for sym in module["symbols"]:
+                sym["callers"] = linked(callers, sym["key"])
+                sym["calls"] = linked(call_graph, sym["key"])
+                score = 1 + sym["references"] + len(sym["callers"])
+                sym["score"] = score / 2 if sym["name"].startswith("_") else score
+                entry = symbol_entry(sym)
+                entries[entry["id"]] = entry
+                symbol_ids.append(entry["id"])
+            module["symbols"].sort(key=lambda s: (-s["score"], s["entry_key"]))
+            module_scores[name] = sum(s["score"] for s in module["symbols"]) + importers[name]
+            entry = module_entry(name, module, sorted(uses[name]), used_by[name], module_scores[name])
+            entries[entry["id"]] = entry
+            children[entry["id"]] = symbol_ids
+        
+        summary = summary_entry(analysis, self.modules, module_scores)
+        return assemble_pack(analysis.get("name", "Project"), summary, entries, children)
+
+# ============================================================================
+# Entries
+# ============================================================================
+
+def make_entry(entry_id: str, tier: str, title: str, importance: float, text: str) -> dict:
+    return {
+        "id": entry_id,
+        "tier": tier,
+        "title": title,
+        "importance": round(importance, 2),
+        "tokens": estimate_tokens(text),
+        "text": text
+    }
+
+def summary_entry(analysis: dict, modules: dict, module_scores: dict) -> dict:
+    """Tier 1: what the project is and where its weight lies."""
+    name = analysis.get("name", "Project")
+    files = sum(len(m["files"]) for m in modules.values())
+    symbols = sum(count for m in modules.values() for _, count in m["files"])
+    language = analysis.get("language", "unknown")
+    framework = analysis.get("framework")
+    lines = [
+        f"# {name}",
+        "",
+        f"{language.title()} project{f' ({framework})' if framework else ''}: "
+        f"{files:,} files, {symbols:,} symbols in {len(modules):,} modules."
+    ]
+    languages = sorted(analysis.get("languages", {}).items(), key=lambda item: (-item[1], item[0]))
+    if languages:
+        lines.append("Languages: " + ", ".join(f"{lang} ({count})" for lang, count in languages))
+    if analysis.get("entry_points"):
+        lines.append("Entry points: " + listing(analysis["entry_points"], 10))
+    runtime = analysis.get("dependencies", {}).get("runtime", [])
+    if runtime:
+        lines.append("Dependencies: " + listing(runtime, 15))
+    
+    ranked = sorted(modules, key=lambda m: (-module_scores[m], m))
+    if ranked:
+        lines += ["", "Modules, most important first:"]
+        for module in ranked[:SUMMARY_MODULES]:
+            lines.append(f"- `{module}`: {len(modules[module]['files'])} files, "
+                         f"{len(modules[module]['symbols'])} definitions")
+        if len(ranked) > SUMMARY_MODULES:
+            lines.append(f"- … {len(ranked) - SUMMARY_MODULES} more")
+    return make_entry("summary", "summary", name, float("inf"), "\n".join(lines) + "\n")
+
+def module_entry(name: str, module: dict, uses: list, used_by: list, score: float) -> dict:
+    """Tier 2: a module's files, dependencies and ranked definitions."""
+    files = sorted(module["files"])
+    lines = [f"## Module `{name}`", ""]
+    lines.append("Files: " + listing([f"{path} ({count})" for path, count in files], MODULE_FILES))
+    if uses:
+        lines.append("Uses: " + listing([f"`{m}`" for m in uses], 10))
+    if used_by:
+        lines.append("Used by: " + listing([f"`{m}`" for m in used_by], 10))
+    symbols = module["symbols"]
+    if symbols:
+        lines.append("")
+        for sym in symbols[:MODULE_SYMBOLS]:
+            summary = sym["docstring"].split("\n\n")[0].replace("\n", " ")
+            lines.append(f"- {sym['kind']} `{sym['name']}` ({sym['path']}:{sym['line']})"
+                         + (f": {clip(summary, 120)}" if summary else ""))
+        if len(symbols) > MODULE_SYMBOLS:
+            lines.append(f"- … {len(symbols) - MODULE_SYMBOLS} more")
+    return make_entry(f"module:{name}", "module", name, score, "\n".join(lines) + "\n")
+
+def symbol_entry(sym: dict) -> dict:
+    """Tier 3: one definition with its signature, docs and call links."""
+    span = f"{sym['line']}-{sym['end_line']}" if sym.get("end_line") not in (None, sym["line"]) else f"{sym['line']}"
+    lines = [f"### {sym['kind']} `{sym['name']}` ({sym['path']}:{span})"]
+    if sym["detail"]:
+        lines += ["", f"`{sym['detail']}`"]
+    if sym["docstring"]:
+        lines += ["", sym["docstring"]]
+    lines.append("")
+    if sym["members"]:
+        lines.append("Members: " + listing(sym["members"], 20))
+    if sym["calls"]:
+        lines.append("Calls: " + listing(sym["calls"], SYMBOL_LINKS))
+    if sym["callers"]:
+        lines.append("Called by: " + listing(sym["callers"], SYMBOL_LINKS))
+    if sym["references"]:
+        lines.append(f"References: {sym['references']}")
+    return make_entry(f"symbol:{sym['entry_key']}", "symbol", sym["name"], sym["score"], "\n".join(lines).rstrip() + "\n")
+
+# ============================================================================
+# Ranking and Budget Index
+# ============================================================================
+
+def rank_entries(summary: dict, entries: dict, children: dict) -> list:
+    """Entries in rank order: most important available entry first.
+    
+    The summary leads; module outlines are available from the start and
+    each one makes its symbols available once placed, so every prefix of
+    the order is coherent. Each id is placed once.
+    """
+    ranked = [summary]
+    placed = {summary["id"]}
+    heap = [(-entries[entry_id]["importance"], entry_id) for entry_id in children]
+    heapq.heapify(heap)
+    while heap:
+        _, entry_id = heapq.heappop(heap)
+        if entry_id in placed:
+            continue
+        placed.add(entry_id)
+        ranked.append(entries[entry_id])
+        for child in children.get(entry_id, []):
+            heapq.heappush(heap, (-entries[child]["importance"], child))
+    return ranked
+
+def budget_index(offsets: list, bucket: int) -> list:
+    """Slot k holds how many leading entries fit in k * bucket tokens."""
+    index = []
+    n = 0
+    for k in range(-(-offsets[-1] // bucket) + 1):
+        while n + 1 < len(offsets) and offsets[n + 1] <= k * bucket:
+            n += 1
+        index.append(n)
+    return index
+
+def assemble_pack(project: str, summary: dict, entries: dict, children: dict) -> dict:
+    ranked = rank_entries(summary, entries, children)
+    summary["importance"] = ranked[1]["importance"] if len(ranked) > 1 else 1.0  # JSON has no infinity
+    offsets = [0]
+    for entry in ranked:
+        offsets.append(offsets[-1] + entry["tokens"])
+    tiers = {tier: {"entries": 0, "tokens": 0, "positions": []} for tier in TIERS}
+    for position, entry in enumerate(ranked):
+        tiers[entry["tier"]]["entries"] += 1
+        tiers[entry["tier"]]["tokens"] += entry["tokens"]
+        tiers[entry["tier"]]["positions"].append(position)
+    return {
+        "format": PACK_FORMAT,
+        "version": PACK_VERSION,
+        "project": project,
+        "chars_per_token": CHARS_PER_TOKEN,
+        "total_tokens": offsets[-1],
+        "tiers": tiers,
+        "bucket": BUDGET_BUCKET,
+        "budget_index": budget_index(offsets, BUDGET_BUCKET),
+        "offsets": offsets,
+        "positions": {entry["id"]: position for position, entry in enumerate(ranked)},
+        "entries": ranked
+    }
+
+def select_budget(pack: dict, budget: int) -> list:
+    """The longest ranked prefix within `budget` tokens.
+    
+    One index lookup lands within a bucket of the answer; the few entries
+    that fit in the rest of that bucket are added by stepping forward.
+    """
+    index, offsets, bucket = pack["budget_index"], pack["offsets"], pack["bucket"]
+    n = index[min(max(budget, 0) // bucket, len(index) - 1)]
+    while n + 1 < len(offsets) and offsets[n + 1] <= budget:
+        n += 1
+    return pack["entries"][:n]
+
+def build_pack(analysis: dict) -> dict:
+    builder = ContextPackBuilder()
+    for f in analysis.get("files", []):
+        builder.add_file(f)
+    return builder.build(analysis)
+
+# ============================================================================
+# CLI
+# ============================================================================
+
+def main():
+    parser = argparse.ArgumentParser(description="Build a token-budgeted context pack from analysis")
+    parser.add_argument("input", help="Analysis JSON, or a context pack to select from")
+    parser.add_argument("--output", "-o", default="context-pack.json", help="Output pack file")
+    parser.add_argument("--budget", type=int, metavar="TOKENS",
+                        help="Print the highest-ranked entries that fit in TOKENS instead of writing the pack")
+    args = parser.parse_args()
+    
+    input_path = Path(args.input)
+    if not input_path.exists():
+        print(f"Error: {input_path} not found", file=sys.stderr)
+        sys.exit(1)
+    
+    data = json.loads(input_path.read_text())
+    if data.get("format") == PACK_FORMAT:
+        if data.get("version") != PACK_VERSION:
+            print(f"Error: unsupported context pack version {data.get('version')}", file=sys.stderr)
+            sys.exit(1)
+        pack = data
+    else:
+        pack = build_pack(data)
+    
+    if args.budget is not None:
+        selected = select_budget(pack, args.budget)
+        sys.stdout.write("\n".join(entry["text"] for entry in selected))
+        print(f"[INFO] {len(selected)} of {len(pack['entries'])} entries, "
+              f"~{sum(e['tokens'] for e in selected):,} of {args.budget:,} tokens", file=sys.stderr)
+        return
+    
+    output_path = Path(args.output)
+    output_path.write_text(json.dumps(pack, indent=2))
+    counts = ", ".join(f"{tier} {info['entries']} (~{info['tokens']:,} tokens)"
+                       for tier, info in pack["tiers"].items())
+    print(f"[INFO] Context pack saved to {output_path}: {counts}", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""
+Plan Mermaid diagrams that stay small enough to render.
+
+Large graphs are partitioned into clusters (label propagation seeded by
+directory), and each diagram keeps only the most connected nodes and
+strongest edges under a node/edge budget. A graph that does not fit in
+one diagram becomes an overview of its clusters plus one detail diagram
+per cluster, linked from the overview.
+"""
+
+import re
+from dataclasses import dataclass, field
+from typing import Callable, Optional
+
+MAX_NODES = 25  # per diagram; Mermaid layouts slow down sharply past a few dozen
+MAX_EDGES = 50
+MAX_DETAILS = 8  # detail diagrams per plan, largest clusters first
+DIRECTORY_AFFINITY = 1.5  # pull toward a node's own directory cluster, in edge weights
+PROPAGATION_ROUNDS = 10
+
+# ============================================================================
+# Plans
+# ============================================================================
+
+@dataclass
+class Diagram:
+    """Nodes and edges selected for one diagram."""
+    nodes: list  # node ids, most connected first
+    edges: list  # (source, target, weight), strongest first
+    total_nodes: int = 0  # before the budget was applied
+    total_edges: int = 0
+
+@dataclass
+class Cluster:
+    name: str
+    anchor: str
+    members: list
+    diagram: Diagram
+
+@dataclass
+class DiagramPlan:
+    """A single diagram, or an overview of clusters with detail diagrams."""
+    single: Optional[Diagram] = None
+    overview: Optional[Diagram] = None  # nodes are cluster names
+    clusters: list = field(default_factory=list)  # Cluster with a detail diagram, largest first
+    sizes: dict = field(default_factory=dict)  # cluster name -> member count
+    omitted_clusters: int = 0  # clusters without a detail diagram
+
+# ============================================================================
+# Clustering
+# ============================================================================
+
+def undirected(edges: dict) -> dict:
+    """Adjacency with summed weights in both directions."""
+    adjacency = {}
+    for (source, target), weight in edges.items():
+        if source == target:
+            continue
+        adjacency.setdefault(source, {})
+        adjacency.setdefault(target, {})
+        adjacency[source][target] = adjacency[source].get(target, 0) + weight
+        adjacency[target][source] = adjacency[target].get(source, 0) + weight
+    return adjacency
+
+def cluster_nodes(nodes: list, edges: dict, group_of: Callable[[str], str]) -> dict:
+    """Partition nodes into clusters; returns node -> cluster name.
+    
+    Every node starts in its group's cluster (its directory, say). Then,
+    for a few rounds, each node moves to the cluster its neighbors weigh
+    most toward, with a bonus for staying with its own group, so files
+    only leave their directory when their imports clearly point elsewhere.
+    Nodes are visited most connected first and ties break by name, so the
+    result is deterministic.
+    """
+    adjacency = undirected(edges)
+    home = {node: group_of(node) for node in nodes}
+    label = dict(home)
+    order = sorted(nodes, key=lambda n: (-sum(adjacency.get(n, {}).values()), n))
+    
+    for _ in range(PROPAGATION_ROUNDS):
+        changed = 0
+        for node in order:
+            scores = {home[node]: DIRECTORY_AFFINITY}
+            for neighbor, weight in adjacency.get(node, {}).items():
+                scores[label[neighbor]] = scores.get(label[neighbor], 0) + weight
+            best = min(scores, key=lambda name: (-scores[name], name != label[node], name))
+            if best != label[node]:
+                label[node] = best
+                changed += 1
+        if not changed:
+            break
+    return label
+
+# ============================================================================
+# Selection
+# ============================================================================
+
+def select(nodes: list, edges: dict, weights: dict, max_nodes: int, max_edges: int) -> Diagram:
+    """Most connected nodes (degree plus node weight) and their strongest edges."""
+    members = set(nodes)
+    inner = {(s, t): w for (s, t), w in edges.items() if s in members and t in members and s != t}
+    degree = {}
+    for (source, target), weight in inner.items():
+        degree[source] = degree.get(source, 0) + weight
+        degree[target] = degree.get(target, 0) + weight
+    ranked = sorted(nodes, key=lambda n: (-(degree.get(n, 0) + weights.get(n, 0)), n))
+    kept = set(ranked[:max_nodes])
+    kept_edges = sorted(((s, t, w) for (s, t), w in inner.items() if s in kept and t in kept),
+                        key=lambda e: (-e[2], e[0], e[1]))
+    return Diagram(
+        nodes=ranked[:max_nodes],
+        edges=kept_edges[:max_edges],
+        total_nodes=len(nodes),
+        total_edges=len(inner)
+    )
+
+def heading_anchor(text: str) -> str:
+    """GitHub-style anchor for a markdown heading."""
+    return re.sub(r"[^\w\- ]", "", text.strip().lower()).replace(" ", "-")
+
+def plan_diagrams(nodes: list, edges: dict, group_of: Callable[[str], str],
+                  weights: Optional[dict] = None, title: str = "Group",
+                  max_nodes: int = MAX_NODES, max_edges: int = MAX_EDGES) -> DiagramPlan:
+    """Fit a graph into diagrams under the node/edge budget.
+    
+    `edges` maps (source, target) to a weight; `weights` adds per-node
+    importance (reference counts, say). Detail headings are
+    "{title}: {cluster}", and their anchors are precomputed for linking.
+    """
+    weights = weights or {}
+    if len(nodes) <= max_nodes:
+        return DiagramPlan(single=select(nodes, edges, weights, max_nodes, max_edges))
+    
+    label = cluster_nodes(nodes, edges, group_of)
+    members = {}
+    for node in nodes:
+        members.setdefault(label[node], []).append(node)
+    
+    # Cluster graph: sizes plus summed weights of edges between clusters
+    cluster_edges = {}
+    for (source, target), weight in edges.items():
+        a, b = label.get(source), label.get(target)
+        if a and b and a != b:
+            cluster_edges[(a, b)] = cluster_edges.get((a, b), 0) + weight
+    cluster_weight = {name: len(group) + sum(weights.get(n, 0) for n in group)
+                      for name, group in members.items()}
+    overview = select(list(members), cluster_edges, cluster_weight, max_nodes, max_edges)
+    
+    plan = DiagramPlan(overview=overview, sizes={name: len(group) for name, group in members.items()})
+    shown = sorted(overview.nodes, key=lambda name: (-len(members[name]), name))
+    for name in shown[:MAX_DETAILS]:
+        group = members[name]
+        if len(group) < 2:
+            continue
+        plan.clusters.append(Cluster(
+            name=name,
+            anchor=heading_anchor(f"{title}: {name}"),
+            members=group,
+            diagram=select(group, edges, weights, max_nodes, max_edges)
+        ))
+    plan.omitted_clusters = len(members) - len(plan.clusters)
+    return plan
+
+# ============================================================================
+# Mermaid Helpers
+# ============================================================================
+
+def mermaid_label(text: str) -> str:
+    """Text safe inside a quoted Mermaid label."""
+    return text.replace('"', "#quot;").replace("\n", " ")
+
+def mermaid_ids(names: list, prefix: str = "n") -> dict:
+    """Stable, syntax-safe Mermaid ids for arbitrary node names."""
+    return {name: f"{prefix}{i}" for i, name in enumerate(names)}
+
+def flowchart(diagram: Diagram, label: Callable[[str], str], direction: str = "LR",
+              links: Optional[dict] = None) -> str:
+    """Render a Diagram as a Mermaid flowchart; `links` maps nodes to anchors."""
+    ids = mermaid_ids(diagram.nodes)
+    lines = ["```mermaid", f"flowchart {direction}"]
+    for node in diagram.nodes:
+        lines.append(f'    {ids[node]}["{mermaid_label(label(node))}"]')
+    for source, target, weight in diagram.edges:
+        arrow = f"-->|{weight}|" if weight > 1 else "-->"
+        lines.append(f"    {ids[source]} {arrow} {ids[target]}")
+    for node, anchor in (links or {}).items():
+        if node in ids:
+            lines.append(f'    click {ids[node]} href "#{anchor}"')
+    lines.append("```")
+    return "\n".join(lines)
+
+def budget_note(diagram: Diagram, noun: str) -> str:
+    """A line saying what the budget left out, or "" when nothing was."""
+    hidden_nodes = diagram.total_nodes - len(diagram.nodes)
+    hidden_edges = diagram.total_edges - len(diagram.edges)
+    if hidden_nodes <= 0 and hidden_edges <= 0:
+        return ""
+    parts = []
+    if hidden_nodes > 0:
+        parts.append(f"{len(diagram.nodes)} of {diagram.total_nodes} {noun}")
+    if hidden_edges > 0:
+        parts.append(f"{len(diagram.edges)} of {diagram.total_edges} links")
+    return f"_Showing the most connected: {', '.join(parts)}._"
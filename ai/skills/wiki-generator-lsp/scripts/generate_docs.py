@@ -2,21 +2,120 @@
 """
 One-shot wiki generator: analyze project and generate WIKI.md in one command.
 Usage: python generate_docs.py /path/to/project [--output WIKI.md]
+
+Analysis and rendering overlap: file records stream from the analyzer
+into the wiki section aggregators (and the --save-analysis writer) while
+later files are still being analyzed. Only final assembly waits for the
+last file.
 """
 
+import os
 import sys
 import json
+import queue
 import argparse
 import tempfile
+import threading
 from pathlib import Path
+from typing import Optional
 
 # Import from sibling scripts
 script_dir = Path(__file__).parent
 sys.path.insert(0, str(script_dir))
 
-from lsp_analyzer import analyze_project
-from generate_wiki import generate_wiki
-from dataclasses import asdict
+from lsp_analyzer import add_analysis_arguments, add_incremental_arguments, run_analysis, default_cache_dir
+from generate_wiki import WikiAggregator, write_pages, write_wiki
+from context_pack import ContextPackBuilder
+from wiki_template import TemplateError, load_plan
+from dataclasses import fields
+
+RECORD_QUEUE_SIZE = 1024  # file records in flight between analysis and rendering
+RECORD_PUT_TIMEOUT = 0.5  # seconds between checks that the consumer is still running
+
+class AnalysisWriter:
+    """Writes analysis JSON incrementally: file records as they arrive,
+    the project-level fields once analysis is done.
+    
+    The output holds the same fields as json.dumps(asdict(analysis)), with
+    "files" first and file records in the order analysis finished them.
+    It is written next to the target and replaces it only on close, so a
+    failed run leaves the previous analysis in place.
+    """
+    
+    def __init__(self, path: Path):
+        self.path = path
+        self._temp = path.with_suffix(path.suffix + ".tmp")
+        self._out = open(self._temp, "w")
+        self._out.write('{\n  "files": [')
+        self._count = 0
+    
+    def add_file(self, record: dict):
+        body = json.dumps(record, indent=2).replace("\n", "\n    ")
+        self._out.write(("," if self._count else "") + "\n    " + body)
+        self._count += 1
+    
+    def close(self, project: dict):
+        self._out.write("\n  ]" if self._count else "]")
+        for key, value in project.items():
+            body = json.dumps(value, indent=2).replace("\n", "\n  ")
+            self._out.write(f",\n  {json.dumps(key)}: {body}")
+        self._out.write("\n}")
+        self._out.close()
+        os.replace(self._temp, self.path)
+    
+    def discard(self):
+        self._out.close()
+        try:
+            self._temp.unlink()
+        except OSError:
+            pass
+
+class RenderingFailed(RuntimeError):
+    """The record consumer stopped; analysis has nowhere to send records."""
+
+class RecordConsumer:
+    """Feeds streamed file records to the aggregator, writer and pack on a
+    thread of its own.
+    
+    An exception in any of them is kept in `error` and stops the producer:
+    put() raises RenderingFailed instead of blocking on a queue nobody
+    drains any more.
+    """
+    
+    def __init__(self, sinks: list):
+        self.sinks = sinks
+        self.error = None
+        self._records = queue.Queue(maxsize=RECORD_QUEUE_SIZE)  # backpressure if rendering falls behind
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+    
+    def _run(self):
+        try:
+            while True:
+                record = self._records.get()
+                if record is None:
+                    return
+                for sink in self.sinks:
+                    sink.add_file(record)
+        except BaseException as e:
+            self.error = e
+    
+    def put(self, record: Optional[dict]):
+        while self.error is None:
+            try:
+                self._records.put(record, timeout=RECORD_PUT_TIMEOUT)
+                return
+            except queue.Full:
+                continue
+        raise RenderingFailed(f"{type(self.error).__name__}: {self.error}") from self.error
+    
+    def close(self):
+        """Wait until every queued record is consumed, or the consumer failed."""
+        try:
+            self.put(None)
+        except RenderingFailed:
+            pass
+        self._thread.join()
 
 def main():
     parser = argparse.ArgumentParser(
@@ -26,6 +125,16 @@ def main():
     parser.add_argument("--output", "-o", default="WIKI.md", help="Output file path")
     parser.add_argument("--no-lsp", action="store_true", help="Skip LSP, use fallback analyzer")
     parser.add_argument("--save-analysis", help="Also save analysis JSON to this path")
+    parser.add_argument("--pages", metavar="DIR",
+                        help="Write a multi-page wiki to DIR instead: an index plus one page per module")
+    parser.add_argument("--jobs", "-j", type=int, default=0,
+                        help="Worker processes rendering --pages (default: one per CPU)")
+    parser.add_argument("--template", metavar="PATH",
+                        help="Markdown file with a wiki-template block (default: references/wiki-template.md)")
+    parser.add_argument("--context-pack", metavar="PATH",
+                        help="Also write a token-budgeted context pack for agents to PATH")
+    add_analysis_arguments(parser)
+    add_incremental_arguments(parser)
     args = parser.parse_args()
     
     project_path = Path(args.path).resolve()
@@ -34,23 +143,63 @@ def main():
         print(f"Error: {project_path} does not exist", file=sys.stderr)
         sys.exit(1)
     
+    # Compile the template up front: a broken one should fail before analysis
+    template = Path(args.template) if args.template else None
+    try:
+        load_plan(template, default_cache_dir())
+    except TemplateError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+    
+    aggregator = WikiAggregator(pages=bool(args.pages))
+    writer = AnalysisWriter(Path(args.save_analysis)) if args.save_analysis else None
+    pack = ContextPackBuilder() if args.context_pack else None
+    consumer = RecordConsumer([sink for sink in (aggregator, writer, pack) if sink])
+    
     print(f"[1/2] Analyzing {project_path}...", file=sys.stderr)
-    analysis = analyze_project(project_path, use_lsp=not args.no_lsp)
-    analysis_dict = asdict(analysis)
+    try:
+        analysis = run_analysis(project_path, args, on_file=consumer.put)
+    except BaseException:
+        if consumer.error is None:
+            if writer:
+                writer.discard()
+            raise
+        # Stopped by the consumer's failure, reported below
+    finally:
+        consumer.close()
+    if consumer.error:
+        if writer:
+            writer.discard()
+        print(f"Error: rendering failed: {type(consumer.error).__name__}: {consumer.error}", file=sys.stderr)
+        sys.exit(1)
+    
+    # Project-level fields only; the file records were consumed above
+    project = {f.name: getattr(analysis, f.name) for f in fields(analysis) if f.name != "files"}
     
     # Optionally save analysis
-    if args.save_analysis:
-        Path(args.save_analysis).write_text(json.dumps(analysis_dict, indent=2))
+    if writer:
+        writer.close(project)
         print(f"      Analysis saved to {args.save_analysis}", file=sys.stderr)
+    if pack:
+        Path(args.context_pack).write_text(json.dumps(pack.build(project), indent=2))
+        print(f"      Context pack saved to {args.context_pack}", file=sys.stderr)
     
     print(f"[2/2] Generating documentation...", file=sys.stderr)
-    wiki_content = generate_wiki(analysis_dict)
-    
-    # Write output
-    output_path = Path(args.output)
-    output_path.write_text(wiki_content)
+    # Names and filters are only checked as the template renders
+    try:
+        if args.pages:
+            counts = write_pages(aggregator, project, Path(args.pages), args.jobs, template)
+        else:
+            write_wiki(aggregator, project, Path(args.output), template)
+    except TemplateError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
     
-    print(f"\n✓ Generated {output_path}", file=sys.stderr)
+    if args.pages:
+        print(f"\n✓ Generated {args.pages} ({counts['pages']} pages: {counts['written']} written, "
+              f"{counts['unchanged']} unchanged, {counts['removed']} removed)", file=sys.stderr)
+    else:
+        print(f"\n✓ Generated {args.output}", file=sys.stderr)
     print(f"  - Language: {analysis.language}", file=sys.stderr)
     if analysis.framework:
         print(f"  - Framework: {analysis.framework}", file=sys.stderr)
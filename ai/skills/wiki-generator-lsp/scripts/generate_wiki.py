@@ -4,59 +4,44 @@ Generate WIKI.md documentation from LSP analysis output.
 Creates comprehensive documentation with Mermaid diagrams.
 """
 
-import json
+import os
+import re
 import sys
+import io
+import json
+import heapq
+import hashlib
 import argparse
+import threading
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from dataclasses import dataclass
-from typing import Optional
-from collections import defaultdict
-
-# ============================================================================
-# Template Sections
-# ============================================================================
-
-WIKI_HEADER = """# {name} Documentation
+from dataclasses import dataclass, field
+from typing import Optional, TextIO
 
-> Auto-generated documentation using LSP-based code analysis
-
-## Table of Contents
-
-- [Project Overview](#project-overview)
-- [Architecture Overview](#architecture-overview)
-- [Project Structure](#project-structure)
-- [Core Components](#core-components)
-- [Data Flow](#data-flow)
-- [Data Model](#data-model)
-- [API Reference](#api-reference)
-- [Configuration](#configuration)
-- [Getting Started](#getting-started)
-- [Development Guide](#development-guide)
-
----
-"""
+from diagram_planner import Diagram, DiagramPlan, plan_diagrams, flowchart, budget_note
+from wiki_template import TemplateError, load_plan, render_plan
+from lsp_analyzer import default_cache_dir
 
 # ============================================================================
 # Mermaid Diagram Generators
 # ============================================================================
 
-def generate_architecture_diagram(files: list, framework: str) -> str:
-    """Generate architecture flowchart from file structure."""
+FRONTEND_FRAMEWORKS = ("React", "Next.js", "Vue")
+BACKEND_FRAMEWORKS = ("Express", "FastAPI", "Flask", "Fastify")
+FRAMEWORK_LAYERS = FRONTEND_FRAMEWORKS + BACKEND_FRAMEWORKS  # have a canned layer diagram
+
+def generate_architecture_diagram(dirs: dict, framework: str) -> str:
+    """Generate architecture flowchart from file structure.
     
-    # Group files by directory
-    dirs = defaultdict(list)
-    for f in files:
-        path = Path(f["path"])
-        if len(path.parts) > 1:
-            dirs[path.parts[0]].append(path.name)
-        else:
-            dirs["root"].append(path.name)
+    `dirs` maps each top-level directory ("root" for top-level files)
+    to its first file names in path order.
+    """
     
     # Build diagram
     lines = ["```mermaid", "flowchart TB"]
     
     # Add framework-specific structure
-    if framework in ("React", "Next.js", "Vue"):
+    if framework in FRONTEND_FRAMEWORKS:
         lines.append("    subgraph Frontend")
         lines.append("        UI[UI Components]")
         lines.append("        State[State Management]")
@@ -65,7 +50,7 @@ def generate_architecture_diagram(files: list, framework: str) -> str:
         lines.append("    UI --> State")
         lines.append("    State --> API")
     
-    elif framework in ("Express", "FastAPI", "Flask", "Fastify"):
+    elif framework in BACKEND_FRAMEWORKS:
         lines.append("    subgraph Backend")
         lines.append("        Routes[Routes/Controllers]")
         lines.append("        Services[Services/Logic]")
@@ -151,85 +136,349 @@ def generate_sequence_diagram(entry_points: list, framework: str) -> str:
     lines.append("```")
     return "\n".join(lines)
 
-def generate_class_diagram(files: list) -> str:
-    """Generate class diagram from symbols."""
-    
+CLASS_DIAGRAM_NODES = 12  # class boxes are tall: fewer per diagram
+ER_DIAGRAM_NODES = 10
+
+def class_entries(f: dict) -> list:
+    """Class diagram entries for one file's symbols."""
     classes = []
-    for f in files:
-        for sym in f.get("symbols", []):
-            if sym.get("kind") in ("class", "interface", "struct"):
-                classes.append({
-                    "name": sym["name"],
-                    "kind": sym["kind"],
-                    "methods": [c["name"] for c in sym.get("children", []) if c.get("kind") == "method"],
-                    "properties": [c["name"] for c in sym.get("children", []) if c.get("kind") in ("property", "field")]
-                })
+    for sym in f.get("symbols", []):
+        if sym.get("kind") in ("class", "interface", "struct"):
+            children = sym.get("children", [])
+            classes.append({
+                "key": f"{f['path']}:{sym['name']}",  # call-graph key prefix of its methods
+                "name": sym["name"],
+                "kind": sym["kind"],
+                "methods": [c["name"] for c in children if c.get("kind") == "method"][:5],
+                "properties": [c["name"] for c in children if c.get("kind") in ("property", "field")][:5],
+                "score": sym.get("reference_count", 0) + sum(c.get("reference_count", 0) for c in children)
+            })
+    return classes
+
+def class_edges(classes: list, call_graph: dict) -> dict:
+    """Class -> class edges weighted by the calls between their members."""
+    keys = {cls["key"] for cls in classes}
+    
+    def owner(key: str) -> Optional[str]:
+        path, _, qualified = key.rpartition(":")
+        candidate = f"{path}:{qualified.split('.')[0]}"
+        return candidate if candidate in keys else None
+    
+    edges = {}
+    for caller, callees in call_graph.items():
+        source = owner(caller)
+        if not source:
+            continue
+        for callee in callees:
+            target = owner(callee)
+            if target and target != source:
+                edges[(source, target)] = edges.get((source, target), 0) + 1
+    return edges
+
+def directory_of(key: str) -> str:
+    """Directory of a `path:name` key or a path; "(root)" at the top."""
+    path = key.split(":", 1)[0]
+    return path.rsplit("/", 1)[0] if "/" in path else "(root)"
+
+def render_planned(plan: DiagramPlan, title: str, noun: str, render, overview_label) -> str:
+    """Markdown for a plan: its single diagram, or a linked overview plus details."""
+    if plan.single:
+        note = budget_note(plan.single, noun)
+        return render(plan.single) + (f"\n\n{note}" if note else "")
+    
+    links = {cluster.name: cluster.anchor for cluster in plan.clusters}
+    parts = [
+        flowchart(plan.overview, lambda name: f"{overview_label(name)} ({plan.sizes[name]} {noun})",
+                  links=links),
+        "\n".join(f"- [{cluster.name}](#{cluster.anchor}) ({len(cluster.members)} {noun})"
+                  for cluster in plan.clusters)
+    ]
+    note = budget_note(plan.overview, "groups")
+    if note:
+        parts.append(note)
+    if plan.omitted_clusters:
+        parts.append(f"_{plan.omitted_clusters} smaller groups are not broken out._")
+    for cluster in plan.clusters:
+        parts.append(f"#### {title}: {cluster.name}")
+        parts.append(render(cluster.diagram))
+        note = budget_note(cluster.diagram, noun)
+        if note:
+            parts.append(note)
+    return "\n\n".join(parts)
+
+def generate_class_diagram(classes: list, call_graph: Optional[dict] = None) -> str:
+    """Generate class diagrams for the best-connected classes, with call relations."""
     
     if not classes:
         return "_No classes detected in codebase._"
     
-    lines = ["```mermaid", "classDiagram"]
+    by_key = {cls["key"]: cls for cls in classes}
+    edges = class_edges(classes, call_graph or {})
+    plan = plan_diagrams(list(by_key), edges, directory_of,
+                         weights={key: cls["score"] for key, cls in by_key.items()},
+                         title="Class group", max_nodes=CLASS_DIAGRAM_NODES)
     
-    for cls in classes[:10]:  # Limit to 10 classes
-        safe_name = cls["name"].replace("-", "_")
-        lines.append(f"    class {safe_name} {{")
-        
-        for prop in cls.get("properties", [])[:5]:
-            lines.append(f"        +{prop}")
-        
-        for method in cls.get("methods", [])[:5]:
-            lines.append(f"        +{method}()")
-        
-        lines.append("    }")
+    def render(diagram: Diagram) -> str:
+        # Class ids are their names, made unique where two files share one
+        names = {}
+        for key in diagram.nodes:
+            base = by_key[key]["name"].replace("-", "_")
+            names[key] = base if base not in names.values() else f"{base}_{len(names)}"
+        lines = ["```mermaid", "classDiagram"]
+        for key in diagram.nodes:
+            cls = by_key[key]
+            lines.append(f"    class {names[key]} {{")
+            for prop in cls.get("properties", [])[:5]:
+                lines.append(f"        +{prop}")
+            for method in cls.get("methods", [])[:5]:
+                lines.append(f"        +{method}()")
+            lines.append("    }")
+        for source, target, _ in diagram.edges:
+            lines.append(f"    {names[source]} --> {names[target]} : calls")
+        lines.append("```")
+        return "\n".join(lines)
     
-    lines.append("```")
-    return "\n".join(lines)
+    return render_planned(plan, "Class group", "classes", render, lambda name: name)
 
-def generate_er_diagram(files: list, language: str) -> str:
-    """Generate entity relationship diagram from data models."""
-    
+def entity_entries(f: dict) -> list:
+    """Data model entities declared in one file."""
     entities = []
-    for f in files:
-        # Look for model files
-        path_lower = f["path"].lower()
-        is_model = any(x in path_lower for x in ["model", "schema", "entity", "type"])
-        
-        for sym in f.get("symbols", []):
-            if sym.get("kind") in ("class", "interface", "struct", "type"):
-                if is_model or sym["name"].endswith(("Model", "Entity", "Schema", "Type")):
-                    entities.append({
-                        "name": sym["name"],
-                        "fields": [c["name"] for c in sym.get("children", []) 
-                                  if c.get("kind") in ("property", "field")]
-                    })
+    # Look for model files
+    path_lower = f["path"].lower()
+    is_model = any(x in path_lower for x in ["model", "schema", "entity", "type"])
+    
+    for sym in f.get("symbols", []):
+        if sym.get("kind") in ("class", "interface", "struct", "type"):
+            if is_model or sym["name"].endswith(("Model", "Entity", "Schema", "Type")):
+                entities.append({
+                    "key": f"{f['path']}:{sym['name']}",
+                    "name": sym["name"],
+                    "fields": [c["name"] for c in sym.get("children", []) 
+                              if c.get("kind") in ("property", "field")]
+                })
+    return entities
+
+def entity_stem(name: str) -> str:
+    """Comparable stem of an entity or field name: `UserModel`, `user_id` -> `user`."""
+    stem = name.lower()
+    for suffix in ("model", "entity", "schema", "type", "_ids", "_id", "ids", "id"):
+        if stem.endswith(suffix) and len(stem) > len(suffix):
+            stem = stem[:-len(suffix)]
+            break
+    return stem.rstrip("_s")
+
+def entity_relations(entities: list) -> dict:
+    """Entity -> entity edges for fields named after another entity (`user_id`, `orders`)."""
+    by_stem = {}
+    for entity in entities:
+        by_stem.setdefault(entity_stem(entity["name"]), entity["key"])
+    edges = {}
+    for entity in entities:
+        for field in entity.get("fields", []):
+            target = by_stem.get(entity_stem(field))
+            if target and target != entity["key"]:
+                edges[(entity["key"], target)] = edges.get((entity["key"], target), 0) + 1
+    return edges
+
+def generate_er_diagram(entities: list, language: str) -> str:
+    """Generate entity relationship diagrams from data models."""
     
     if not entities:
         return "_No data models detected. Add models in a `models/` or `schemas/` directory._"
     
-    lines = ["```mermaid", "erDiagram"]
+    by_key = {entity["key"]: entity for entity in entities}
+    plan = plan_diagrams(list(by_key), entity_relations(entities), directory_of,
+                         weights={key: len(entity["fields"]) / 10 for key, entity in by_key.items()},
+                         title="Entity group", max_nodes=ER_DIAGRAM_NODES)
     
-    for entity in entities[:8]:  # Limit to 8 entities
-        safe_name = entity["name"].replace("-", "_")
-        lines.append(f"    {safe_name} {{")
-        for field in entity.get("fields", [])[:6]:
-            safe_field = field.replace("-", "_")
-            lines.append(f"        string {safe_field}")
-        lines.append("    }")
+    def render(diagram: Diagram) -> str:
+        names = {}
+        for key in diagram.nodes:
+            base = by_key[key]["name"].replace("-", "_")
+            names[key] = base if base not in names.values() else f"{base}_{len(names)}"
+        lines = ["```mermaid", "erDiagram"]
+        for key in diagram.nodes:
+            lines.append(f"    {names[key]} {{")
+            for field in by_key[key].get("fields", [])[:6]:
+                safe_field = field.replace("-", "_")
+                lines.append(f"        string {safe_field}")
+            lines.append("    }")
+        for source, target, _ in diagram.edges:
+            lines.append(f'    {names[source]} }}o--|| {names[target]} : "references"')
+        lines.append("```")
+        return "\n".join(lines)
     
-    lines.append("```")
+    return render_planned(plan, "Entity group", "entities", render, lambda name: name)
+
+MODULE_GROUP_DEPTH = 2  # directory levels that name a module group
+
+def module_group(path: str) -> str:
+    """Directory group of a file, at most MODULE_GROUP_DEPTH levels deep."""
+    parts = path.split("/")[:-1][:MODULE_GROUP_DEPTH]
+    return "/".join(parts) or "(root)"
+
+def generate_module_diagrams(module_graph: dict) -> str:
+    """Import-graph diagrams: one if the graph fits, else a group overview plus details."""
+    edges = {(source, target): 1 for source, targets in module_graph.get("edges", {}).items()
+             for target in targets if source != target}
+    if not edges:
+        return ""
+    nodes = sorted({node for edge in edges for node in edge})
+    plan = plan_diagrams(nodes, edges, module_group, title="Module group")
+    
+    def render(diagram: Diagram) -> str:
+        return flowchart(diagram, lambda path: path)
+    
+    return render_planned(plan, "Module group", "files", render, lambda name: name + "/")
+
+def generate_cycle_list(module_graph: dict, limit: int = 5) -> str:
+    """Largest import cycles, as a short list."""
+    cycles = module_graph.get("cycles", [])
+    if not cycles:
+        return ""
+    lines = [f"**Import cycles:** {len(cycles)}", ""]
+    for cycle in cycles[:limit]:
+        shown = ", ".join(f"`{path}`" for path in cycle[:6])
+        lines.append(f"- {shown}" + (f" and {len(cycle) - 6} more" if len(cycle) > 6 else ""))
     return "\n".join(lines)
 
+# ============================================================================
+# Directory Tree
+# ============================================================================
+
+TREE_LINES = 30  # line budget for the rendered tree
+TREE_ENTRIES = 10  # entries listed per directory, including its "more" line
+
+@dataclass
+class TreeNode:
+    """One directory: totals for its whole subtree, and its densest files."""
+    name: str
+    files: int = 0
+    symbols: int = 0
+    dirs: dict = field(default_factory=dict)  # name -> TreeNode
+    top_files: list = field(default_factory=list)  # ((-symbols, name), name), first TREE_ENTRIES
+    own_files: int = 0
+    
+    def density(self) -> tuple:
+        """Sort key: most symbols first, then most files, then name."""
+        return (-self.symbols, -self.files, self.name)
+
+class PathTrie:
+    """Path trie with file and symbol counts per directory, built in one pass.
+    
+    Each directory keeps only its TREE_ENTRIES densest files, so memory
+    grows with the number of directories rather than files.
+    """
+    
+    def __init__(self):
+        self.root = TreeNode("")
+    
+    def add(self, path: str, symbols: int):
+        parts = path.split("/")
+        node = self.root
+        node.files += 1
+        node.symbols += symbols
+        for part in parts[:-1]:
+            node = node.dirs.setdefault(part, TreeNode(part))
+            node.files += 1
+            node.symbols += symbols
+        node.own_files += 1
+        keep_first(node.top_files, parts[-1], (-symbols, parts[-1]), TREE_ENTRIES)
+    
+    def render(self, budget: int = TREE_LINES) -> list:
+        """Tree lines within `budget`, densest directories first.
+        
+        Directories are expanded best-first by symbol count while their
+        entries fit in the budget; the rest stay collapsed as one summary
+        line. Chains of single-directory parents are joined (`src/main/java/`).
+        """
+        expanded = set()
+        used = 0
+        heap = [(self.root.density(), 0, self.root)]
+        tie = 1
+        while heap:
+            _, _, node = heapq.heappop(heap)
+            node = self._chain(node)[-1]
+            cost = min(len(node.dirs) + node.own_files, TREE_ENTRIES)
+            if node is not self.root and used + cost > budget:
+                continue
+            expanded.add(id(node))
+            used += cost
+            for child in node.dirs.values():
+                heapq.heappush(heap, (child.density(), tie, child))
+                tie += 1
+        
+        lines = []
+        self._render_entries(self.root, "", expanded, lines)
+        return lines
+    
+    def _chain(self, node: TreeNode) -> list:
+        """`node` and its descendants while each is a directory's only entry."""
+        chain = [node]
+        while len(node.dirs) == 1 and not node.own_files and node is not self.root:
+            node = next(iter(node.dirs.values()))
+            chain.append(node)
+        return chain
+    
+    def _render_entries(self, node: TreeNode, prefix: str, expanded: set, lines: list):
+        """Append the listing of an expanded directory."""
+        entries = [("dir", child) for child in sorted(node.dirs.values(), key=TreeNode.density)]
+        entries += [("file", name) for _, name in node.top_files]
+        hidden_files = node.own_files - len(node.top_files)
+        if len(entries) > TREE_ENTRIES or hidden_files:
+            shown = entries[:TREE_ENTRIES - 1]
+            rest = entries[TREE_ENTRIES - 1:]
+            more_files = sum(child.files for kind, child in rest if kind == "dir") + \
+                sum(1 for kind, _ in rest if kind == "file") + hidden_files
+            entries = shown + [("more", f"… {more_files:,} more files")]
+        
+        for i, (kind, entry) in enumerate(entries):
+            last = i == len(entries) - 1
+            branch = "└── " if last else "├── "
+            if kind != "dir":
+                lines.append(f"{prefix}{branch}{entry}")
+                continue
+            chain = self._chain(entry)
+            name = "/".join(part.name for part in chain) + "/"
+            tail = chain[-1]
+            if id(tail) in expanded:
+                lines.append(f"{prefix}{branch}{name}")
+                self._render_entries(tail, prefix + ("    " if last else "│   "), expanded, lines)
+            else:
+                lines.append(f"{prefix}{branch}{name} … {tail.files:,} files")
+
+def symbol_count(f: dict) -> int:
+    """Symbols declared in a file, nested ones included."""
+    count = 0
+    stack = list(f.get("symbols", []))
+    while stack:
+        sym = stack.pop()
+        count += 1
+        stack.extend(sym.get("children", []))
+    return count
+
 # ============================================================================
 # Section Generators
 # ============================================================================
 
-def generate_project_overview(analysis: dict) -> str:
+def generate_project_overview(analysis: dict, file_count: int) -> str:
     """Generate project overview section."""
     
     deps = analysis.get("dependencies", {})
     runtime_deps = deps.get("runtime", [])[:10]
     dev_deps = deps.get("dev", [])[:10]
     
+    languages = analysis.get("languages", {})
+    language_row = ""
+    if len(languages) > 1:
+        mix = ", ".join(f"{lang.title()} ({count})" for lang, count
+                        in sorted(languages.items(), key=lambda item: -item[1]))
+        language_row = f"\n| Languages | {mix} |"
+    
+    skipped = analysis.get("metadata", {}).get("skipped", {})
+    if skipped:
+        language_row += "\n| Skipped | " + ", ".join(f"{n} {reason}" for reason, n in skipped.items()) + " |"
+    
     return f"""## Project Overview
 
 ### Purpose
@@ -240,9 +489,9 @@ def generate_project_overview(analysis: dict) -> str:
 
 | Category | Technology |
 |----------|------------|
-| Language | {analysis['language'].title()} |
+| Language | {analysis['language'].title()} |{language_row}
 | Framework | {analysis.get('framework') or 'N/A'} |
-| Files | {len(analysis.get('files', []))} source files |
+| Files | {file_count} source files |
 
 ### Key Dependencies
 
@@ -255,13 +504,23 @@ def generate_project_overview(analysis: dict) -> str:
 ---
 """
 
-def generate_architecture_section(analysis: dict) -> str:
+def generate_architecture_section(analysis: dict, dirs: dict) -> str:
     """Generate architecture overview section."""
     
-    diagram = generate_architecture_diagram(
-        analysis.get("files", []),
-        analysis.get("framework", "")
-    )
+    module_graph = analysis.get("module_graph", {})
+    modules = generate_module_diagrams(module_graph)
+    framework = analysis.get("framework", "")
+    if modules and framework not in FRAMEWORK_LAYERS:
+        # The import graph replaces the directory listing
+        diagram = modules
+        modules = ""
+    else:
+        diagram = generate_architecture_diagram(dirs, framework)
+    if modules:
+        modules = "### Module Dependencies\n\n" + modules + "\n"
+    cycles = generate_cycle_list(module_graph)
+    if cycles:
+        modules += "\n" + cycles + "\n"
     
     return f"""## Architecture Overview
 
@@ -269,6 +528,7 @@ def generate_architecture_section(analysis: dict) -> str:
 
 {diagram}
 
+{modules}
 ### Design Patterns
 
 Based on the codebase structure, the following patterns are observed:
@@ -287,32 +547,10 @@ Based on the codebase structure, the following patterns are observed:
 ---
 """
 
-def generate_project_structure(analysis: dict) -> str:
-    """Generate project structure section."""
-    
-    files = analysis.get("files", [])
+def generate_project_structure(analysis: dict, tree: PathTrie) -> str:
+    """Generate project structure section from the path trie."""
     
-    # Build tree structure
-    tree_lines = []
-    dirs_seen = set()
-    
-    for f in sorted(files, key=lambda x: x["path"]):
-        path = Path(f["path"])
-        parts = path.parts
-        
-        # Add directories
-        for i, part in enumerate(parts[:-1]):
-            dir_path = "/".join(parts[:i+1])
-            if dir_path not in dirs_seen:
-                indent = "    " * i
-                tree_lines.append(f"{indent}├── {part}/")
-                dirs_seen.add(dir_path)
-        
-        # Add file
-        indent = "    " * (len(parts) - 1)
-        tree_lines.append(f"{indent}├── {path.name}")
-    
-    tree = "\n".join(tree_lines[:30])  # Limit output
+    tree = "\n".join(tree.render())
     
     entry_points = analysis.get("entry_points", [])
     
@@ -341,56 +579,65 @@ def generate_project_structure(analysis: dict) -> str:
 ---
 """
 
-def generate_components_section(analysis: dict) -> str:
-    """Generate core components section."""
-    
-    files = analysis.get("files", [])
-    components = []
-    
-    for f in files:
-        symbols = f.get("symbols", [])
-        if symbols:
-            main_symbols = [s for s in symbols if s.get("kind") in ("class", "function", "interface")]
-            if main_symbols:
-                components.append({
-                    "file": f["path"],
-                    "symbols": main_symbols[:5]
-                })
-    
-    sections = []
-    for comp in components[:10]:  # Limit to 10 components
-        file_path = comp["file"]
-        sections.append(f"### `{file_path}`\n")
+def slim_symbol(sym: dict) -> dict:
+    """The symbol fields component docs render; drops reference lists."""
+    return {
+        "name": sym.get("name", ""),
+        "kind": sym.get("kind", "unknown"),
+        "line": sym.get("line"),
+        "detail": sym.get("detail", ""),
+        "docstring": sym.get("docstring", ""),
+        "reference_count": sym.get("reference_count", 0),
+        "references_estimated": sym.get("references_estimated", False),
+        "children": [{"name": c.get("name", ""), "kind": c.get("kind", ""), "line": c.get("line", "N/A")}
+                     for c in sym.get("children", [])]
+    }
+
+def component_entry(f: dict) -> Optional[dict]:
+    """Core component summary for one file, if it defines any."""
+    symbols = f.get("symbols", [])
+    main_symbols = [s for s in symbols if s.get("kind") in ("class", "function", "interface")]
+    if not main_symbols:
+        return None
+    # Most referenced first; stable sort keeps source order on ties
+    main_symbols.sort(key=lambda s: -s.get("reference_count", 0))
+    return {
+        "file": f["path"],
+        "symbols": [slim_symbol(s) for s in main_symbols[:5]],
+        "score": sum(s.get("reference_count", 0) for s in main_symbols)
+    }
+
+def component_markdown(comp: dict) -> list:
+    """Markdown lines documenting one component."""
+    sections = [f"### `{comp['file']}`\n"]
+    for sym in comp["symbols"]:
+        kind = sym.get("kind", "unknown")
+        name = sym.get("name", "")
+        docstring = sym.get("docstring", "")
         
-        for sym in comp["symbols"]:
-            kind = sym.get("kind", "unknown")
-            name = sym.get("name", "")
-            docstring = sym.get("docstring", "")
-            
+        refs = sym.get("reference_count", 0)
+        if refs:
+            approx = "~" if sym.get("references_estimated") else ""
+            sections.append(f"**{kind.title()}:** `{name}` ({approx}{refs} references)\n")
+        else:
             sections.append(f"**{kind.title()}:** `{name}`\n")
-            if docstring:
-                sections.append(f"> {docstring[:200]}...\n" if len(docstring) > 200 else f"> {docstring}\n")
-            
-            # Methods
-            children = sym.get("children", [])
-            methods = [c for c in children if c.get("kind") == "method"]
-            if methods:
-                sections.append("\n| Method | Line |\n|--------|------|")
-                for m in methods[:5]:
-                    sections.append(f"| `{m['name']}()` | {m.get('line', 'N/A')} |")
-                sections.append("")
+        detail = sym.get("detail", "")
+        if detail:
+            sections.append(f"```\n{detail}\n```\n")
+        if docstring:
+            sections.append(f"> {docstring[:200]}...\n" if len(docstring) > 200 else f"> {docstring}\n")
         
-        sections.append("")
-    
-    if not sections:
-        sections = ["_No major components detected. Run with LSP enabled for better analysis._"]
+        # Methods
+        children = sym.get("children", [])
+        methods = [c for c in children if c.get("kind") == "method"]
+        if methods:
+            sections.append("\n| Method | Line |\n|--------|------|")
+            for m in methods[:5]:
+                sections.append(f"| `{m['name']}()` | {m.get('line', 'N/A')} |")
+            sections.append("")
     
-    return f"""## Core Components
-
-{chr(10).join(sections)}
-
----
-"""
+    sections.append("")
+    return sections
 
 def generate_data_flow_section(analysis: dict) -> str:
     """Generate data flow section."""
@@ -418,28 +665,6 @@ The application follows these patterns:
 ---
 """
 
-def generate_data_model_section(analysis: dict) -> str:
-    """Generate data model section."""
-    
-    class_diagram = generate_class_diagram(analysis.get("files", []))
-    er_diagram = generate_er_diagram(
-        analysis.get("files", []),
-        analysis.get("language", "")
-    )
-    
-    return f"""## Data Model
-
-### Class Structure
-
-{class_diagram}
-
-### Entity Relationships
-
-{er_diagram}
-
----
-"""
-
 def generate_api_section(analysis: dict) -> str:
     """Generate API reference section."""
     
@@ -643,24 +868,377 @@ _Generated by wiki-generator-lsp_
 # Main Generator
 # ============================================================================
 
-def generate_wiki(analysis: dict) -> str:
+def keep_first(entries: list, entry, key, limit: int):
+    """Insert into a list kept sorted by key, dropping entries past limit."""
+    entries.append((key, entry))
+    entries.sort(key=lambda item: item[0])
+    del entries[limit:]
+
+class WikiAggregator:
+    """Incremental state for the file-driven wiki sections.
+    
+    Files may arrive in any order, e.g. streamed while analysis is still
+    running. Each section keeps only the bounded slice it renders, keyed
+    by path, so render() matches a render of the sorted file list.
+    add_file is thread-safe.
+    """
+    
+    DIR_FILES = 5
+    COMPONENTS = 10
+    CLASSES = 200  # candidates; the diagram planner picks the best connected
+    ENTITIES = 100
+    
+    def __init__(self, pages: bool = False):
+        self.modules = ModuleCollector() if pages else None  # per-module page inputs
+        self.file_count = 0
+        self.dirs = {}  # top-level directory -> [(path, file name)], first DIR_FILES
+        self.tree = PathTrie()
+        self.components = []
+        self.classes = []
+        self.entities = []
+        self._lock = threading.Lock()
+    
+    def add_file(self, f: dict):
+        """Fold one file record into every section."""
+        path = Path(f["path"])
+        component = component_entry(f)
+        classes = class_entries(f)[:self.CLASSES]
+        entities = entity_entries(f)[:self.ENTITIES]
+        symbols = symbol_count(f)
+        if self.modules is not None:
+            self.modules.add_file(f, component, classes, symbols)
+        
+        with self._lock:
+            self.file_count += 1
+            top = path.parts[0] if len(path.parts) > 1 else "root"
+            keep_first(self.dirs.setdefault(top, []), path.name, f["path"], self.DIR_FILES)
+            self.tree.add(f["path"], symbols)
+            if component:
+                keep_first(self.components, component, (-component["score"], f["path"]), self.COMPONENTS)
+            for i, cls in enumerate(classes):
+                keep_first(self.classes, cls, (-cls["score"], f["path"], i), self.CLASSES)
+            for i, entity in enumerate(entities):
+                keep_first(self.entities, entity, (-len(entity["fields"]), f["path"], i), self.ENTITIES)
+    
+    def context(self, analysis: dict, modules: Optional[list] = None) -> dict:
+        """Template bindings; sections and diagrams are generated when reached."""
+        # Directories appear in the order of their first file
+        dirs = {top: [name for _, name in entries]
+                for top, entries in sorted(self.dirs.items(), key=lambda item: item[1][0][0])}
+        classes = [cls for _, cls in self.classes]
+        entities = [entity for _, entity in self.entities]
+        
+        return {
+            "project": analysis,
+            "modules": modules,
+            "components": [comp for _, comp in self.components][:10],
+            "sections": {
+                "overview": lambda: generate_project_overview(analysis, self.file_count),
+                "architecture": lambda: generate_architecture_section(analysis, dirs),
+                "structure": lambda: generate_project_structure(analysis, self.tree),
+                "modules": lambda: generate_modules_section(modules or []),
+                "data_flow": lambda: generate_data_flow_section(analysis),
+                "api": lambda: generate_api_section(analysis),
+                "config": lambda: generate_config_section(analysis),
+                "getting_started": lambda: generate_getting_started(analysis),
+                "dev_guide": lambda: generate_dev_guide(analysis)
+            },
+            "diagrams": {
+                "classes": lambda: generate_class_diagram(classes, analysis.get("call_graph", {})) + "\n",
+                "entities": lambda: generate_er_diagram(entities, analysis.get("language", "")) + "\n"
+            }
+        }
+    
+    def write(self, out: TextIO, analysis: dict, modules: Optional[list] = None,
+              template: Optional[Path] = None):
+        """Stream the wiki to `out`; `analysis` supplies the project-level fields.
+        
+        The layout comes from the wiki template (references/wiki-template.md
+        unless `template` is given). With `modules` (page summaries from
+        write_pages) the wiki is the index of a multi-page wiki.
+        """
+        plan = load_plan(template, default_cache_dir())
+        render_plan(plan, self.context(analysis, modules), out, TEMPLATE_FILTERS)
+    
+    def render(self, analysis: dict, modules: Optional[list] = None,
+               template: Optional[Path] = None) -> str:
+        """The wiki as a string."""
+        out = io.StringIO()
+        self.write(out, analysis, modules, template)
+        return out.getvalue()
+
+TEMPLATE_FILTERS = {
+    "component": lambda comp: "\n".join(component_markdown(comp)),
+    "title": lambda value: str(value).title()
+}
+
+def generate_wiki(analysis: dict, template: Optional[Path] = None) -> str:
     """Generate complete WIKI.md from analysis."""
+    aggregator = WikiAggregator()
+    for f in analysis.get("files", []):
+        aggregator.add_file(f)
+    return aggregator.render(analysis, template=template)
+
+def write_wiki(aggregator: WikiAggregator, analysis: dict, output_path: Path,
+               template: Optional[Path] = None):
+    """Stream the single-page wiki to output_path.
     
-    sections = [
-        WIKI_HEADER.format(name=analysis.get("name", "Project")),
-        generate_project_overview(analysis),
-        generate_architecture_section(analysis),
-        generate_project_structure(analysis),
-        generate_components_section(analysis),
-        generate_data_flow_section(analysis),
-        generate_data_model_section(analysis),
-        generate_api_section(analysis),
-        generate_config_section(analysis),
-        generate_getting_started(analysis),
-        generate_dev_guide(analysis)
-    ]
+    Rendering goes to a temporary file that replaces output_path only
+    once it succeeds, so a template error keeps the previous wiki.
+    """
+    temp = output_path.with_suffix(output_path.suffix + ".tmp")
+    try:
+        with open(temp, "w") as out:
+            aggregator.write(out, analysis, template=template)
+    except BaseException:
+        temp.unlink(missing_ok=True)
+        raise
+    os.replace(temp, output_path)
+
+# ============================================================================
+# Multi-Page Output
+# ============================================================================
+
+SOURCE_ROOTS = ("src", "lib", "libs", "packages", "apps", "pkg", "internal", "cmd", "modules")
+MODULE_TREE_LINES = 60
+PAGE_MANIFEST = ".wiki-manifest.json"
+INDEX_PAGE = "WIKI.md"
+
+def page_module(path: str) -> str:
+    """Top-level module a file is documented under.
+    
+    Files under a conventional source root (`src/`, `packages/`, ...) are
+    grouped by the directory below it; root-level files form "(root)".
+    """
+    parts = path.split("/")
+    if len(parts) == 1:
+        return "(root)"
+    if parts[0] in SOURCE_ROOTS and len(parts) > 2:
+        return "/".join(parts[:2])
+    return parts[0]
+
+def page_slugs(names: list) -> dict:
+    """A distinct file name stem per module."""
+    slugs = {}
+    used = set()
+    for name in sorted(names):
+        slug = re.sub(r"[^\w.-]+", "-", name).strip("-.") or "root"
+        candidate, n = slug, 1
+        while candidate in used:
+            n += 1
+            candidate = f"{slug}-{n}"
+        used.add(candidate)
+        slugs[name] = candidate
+    return slugs
+
+class ModuleCollector:
+    """Per-module page inputs, folded from file records as they arrive."""
+    
+    def __init__(self):
+        self.modules = {}  # module -> {"files": [(path, symbols)], "components": [...], "classes": [...]}
+        self._lock = threading.Lock()
+    
+    def add_file(self, f: dict, component: Optional[dict], classes: list, symbols: int):
+        with self._lock:
+            module = self.modules.setdefault(page_module(f["path"]),
+                                             {"files": [], "components": [], "classes": []})
+            module["files"].append((f["path"], symbols))
+            if component:
+                module["components"].append(component)
+            module["classes"].extend(classes)
+    
+    def page_inputs(self, analysis: dict) -> list:
+        """One self-contained input per module page, in a canonical order.
+        
+        Everything a page renders is in its input, so equal inputs mean an
+        unchanged page.
+        """
+        slugs = page_slugs(list(self.modules))
+        module_of = {path: name for name, module in self.modules.items() for path, _ in module["files"]}
+        
+        # Module-level dependencies, from the file import graph
+        uses = {name: {} for name in self.modules}
+        for source, targets in analysis.get("module_graph", {}).get("edges", {}).items():
+            for target in targets:
+                a, b = module_of.get(source), module_of.get(target)
+                if a and b and a != b:
+                    uses[a][b] = uses[a].get(b, 0) + 1
+        used_by = {name: {} for name in self.modules}
+        for a, targets in uses.items():
+            for b, count in targets.items():
+                used_by[b][a] = count
+        
+        # Call graph split by module, keeping calls within the module
+        calls = {name: {} for name in self.modules}
+        for caller, callees in analysis.get("call_graph", {}).items():
+            module = module_of.get(caller.rpartition(":")[0])
+            if module:
+                inner = sorted(c for c in callees if module_of.get(c.rpartition(":")[0]) == module)
+                if inner:
+                    calls[module][caller] = inner
+        
+        def links(counts: dict) -> list:
+            return [[name, slugs[name], count]
+                    for name, count in sorted(counts.items(), key=lambda item: (-item[1], item[0]))]
+        
+        inputs = []
+        for name in sorted(self.modules):
+            module = self.modules[name]
+            inputs.append({
+                "project": analysis.get("name", "Project"),
+                "name": name,
+                "slug": slugs[name],
+                "files": sorted(module["files"]),
+                "components": sorted(module["components"], key=lambda c: (-c["score"], c["file"])),
+                "classes": sorted(module["classes"], key=lambda c: (-c["score"], c["key"])),
+                "uses": links(uses[name]),
+                "used_by": links(used_by[name]),
+                "call_graph": dict(sorted(calls[name].items()))
+            })
+        return inputs
+
+def render_module_page(page: dict) -> str:
+    """Markdown for one module page."""
+    tree = PathTrie()
+    prefix = "" if page["name"] == "(root)" else page["name"] + "/"
+    for path, symbols in page["files"]:
+        tree.add(path[len(prefix):], symbols)
+    symbols = sum(count for _, count in page["files"])
     
-    return "\n".join(sections)
+    def module_links(entries: list) -> str:
+        if not entries:
+            return "- _None_"
+        return "\n".join(f"- [{name}]({slug}.md) ({count} imports)" for name, slug, count in entries)
+    
+    components = []
+    for comp in page["components"]:
+        components.extend(component_markdown(comp))
+    
+    return f"""# {page['name']}
+
+[← {page['project']} index](../{INDEX_PAGE})
+
+| Files | Symbols |
+|-------|---------|
+| {len(page['files']):,} | {symbols:,} |
+
+## Structure
+
+```
+{page['name']}/
+{chr(10).join(tree.render(MODULE_TREE_LINES))}
+```
+
+## Dependencies
+
+**Uses:**
+{module_links(page['uses'])}
+
+**Used by:**
+{module_links(page['used_by'])}
+
+## Components
+
+{chr(10).join(components) if components else '_No components detected in this module._'}
+
+## Class Structure
+
+{generate_class_diagram(page['classes'], page['call_graph'])}
+
+---
+
+_Generated by wiki-generator-lsp_
+"""
+
+def write_module_page(path: Path, page: dict) -> str:
+    """Render and write one page; runs in a worker process."""
+    path.write_text(render_module_page(page))
+    return str(path)
+
+def generate_modules_section(modules: list) -> str:
+    """Index table linking to every module page."""
+    rows = "\n".join(f"| [{m['name']}](modules/{m['slug']}.md) | {m['files']:,} | {m['symbols']:,} |"
+                     for m in modules)
+    return f"""## Modules
+
+| Module | Files | Symbols |
+|--------|-------|---------|
+{rows}
+
+---
+"""
+
+def renderer_fingerprint() -> str:
+    """Digest of the rendering code; a change invalidates every page."""
+    digest = hashlib.sha256()
+    for name in ("generate_wiki.py", "diagram_planner.py", "wiki_template.py"):
+        digest.update((Path(__file__).parent / name).read_bytes())
+    return digest.hexdigest()[:16]
+
+def content_digest(value) -> str:
+    """Short digest of a page's text or of its JSON input."""
+    data = value if isinstance(value, str) else json.dumps(value, sort_keys=True, default=str)
+    return hashlib.sha256(data.encode()).hexdigest()[:16]
+
+def write_pages(aggregator: WikiAggregator, analysis: dict, output_dir: Path, jobs: int = 0,
+                template: Optional[Path] = None) -> dict:
+    """Write a multi-page wiki: an index plus one page per module.
+    
+    A manifest of page input digests in the output directory lets a later
+    run skip pages whose inputs are unchanged; pages of modules that no
+    longer exist are removed. Changed pages render across `jobs` worker
+    processes (default: one per CPU). Returns page counts.
+    """
+    (output_dir / "modules").mkdir(parents=True, exist_ok=True)
+    manifest_path = output_dir / PAGE_MANIFEST
+    renderer = renderer_fingerprint()
+    try:
+        manifest = json.loads(manifest_path.read_text())
+    except (OSError, ValueError):
+        manifest = {}
+    previous = manifest.get("pages", {}) if manifest.get("renderer") == renderer else {}
+    pages = {}
+    
+    inputs = aggregator.modules.page_inputs(analysis)
+    stale = []
+    for page in inputs:
+        name = f"modules/{page['slug']}.md"
+        pages[name] = content_digest(page)
+        if previous.get(name) != pages[name] or not (output_dir / name).exists():
+            stale.append((output_dir / name, page))
+    
+    jobs = min(jobs or os.cpu_count() or 1, len(stale))
+    if jobs > 1:
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            paths, page_list = zip(*stale)
+            list(executor.map(write_module_page, paths, page_list,
+                              chunksize=max(1, len(stale) // (jobs * 4))))
+    else:
+        for path, page in stale:
+            write_module_page(path, page)
+    
+    summaries = [{"name": page["name"], "slug": page["slug"], "files": len(page["files"]),
+                  "symbols": sum(count for _, count in page["files"])} for page in inputs]
+    index = aggregator.render(analysis, modules=summaries, template=template)
+    pages[INDEX_PAGE] = content_digest(index)
+    index_changed = previous.get(INDEX_PAGE) != pages[INDEX_PAGE] or not (output_dir / INDEX_PAGE).exists()
+    if index_changed:
+        (output_dir / INDEX_PAGE).write_text(index)
+    
+    removed = 0
+    for name in manifest.get("pages", {}):
+        if name not in pages and name.startswith("modules/"):
+            try:
+                (output_dir / name).unlink()
+                removed += 1
+            except OSError:
+                pass
+    
+    temp = manifest_path.with_suffix(".tmp")
+    temp.write_text(json.dumps({"renderer": renderer, "pages": pages}, indent=2))
+    temp.replace(manifest_path)
+    written = len(stale) + index_changed
+    return {"pages": len(pages), "written": written, "unchanged": len(pages) - written, "removed": removed}
 
 # ============================================================================
 # CLI
@@ -670,6 +1248,12 @@ def main():
     parser = argparse.ArgumentParser(description="Generate WIKI.md from analysis")
     parser.add_argument("analysis", help="Path to analysis JSON file")
     parser.add_argument("--output", "-o", default="WIKI.md", help="Output file")
+    parser.add_argument("--pages", metavar="DIR",
+                        help="Write a multi-page wiki to DIR: an index plus one page per module")
+    parser.add_argument("--jobs", "-j", type=int, default=0,
+                        help="Worker processes for --pages (default: one per CPU)")
+    parser.add_argument("--template", metavar="PATH",
+                        help="Markdown file with a wiki-template block (default: references/wiki-template.md)")
     args = parser.parse_args()
     
     # Load analysis
@@ -678,15 +1262,33 @@ def main():
         print(f"Error: {analysis_path} not found", file=sys.stderr)
         sys.exit(1)
     
+    template = Path(args.template) if args.template else None
+    try:
+        load_plan(template, default_cache_dir())
+    except TemplateError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+    
     analysis = json.loads(analysis_path.read_text())
+    aggregator = WikiAggregator(pages=bool(args.pages))
+    for f in analysis.get("files", []):
+        aggregator.add_file(f)
     
-    # Generate wiki
-    wiki_content = generate_wiki(analysis)
+    # Names and filters are only checked as the template renders
+    try:
+        if args.pages:
+            counts = write_pages(aggregator, analysis, Path(args.pages), args.jobs, template)
+        else:
+            write_wiki(aggregator, analysis, Path(args.output), template)
+    except TemplateError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
     
-    # Write output
-    output_path = Path(args.output)
-    output_path.write_text(wiki_content)
-    print(f"[INFO] Generated {output_path}", file=sys.stderr)
+    if args.pages:
+        print(f"[INFO] Generated {args.pages}: {counts['pages']} pages, {counts['written']} written, "
+              f"{counts['unchanged']} unchanged, {counts['removed']} removed", file=sys.stderr)
+    else:
+        print(f"[INFO] Generated {args.output}", file=sys.stderr)
 
 if __name__ == "__main__":
     main()
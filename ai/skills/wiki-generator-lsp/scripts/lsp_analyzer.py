@@ -4,6 +4,7 @@ LSP-based codebase analyzer for documentation generation.
 Extracts symbols, references, call hierarchies, and type information.
 """
 
+import io
 import json
 import subprocess
 import sys
@@ -11,10 +12,23 @@ import os
 import re
 import time
 import socket
+import hashlib
+import heapq
+import threading
+import mmap
+import shutil
+import tempfile
+import weakref
+from array import array
+from bisect import bisect_right
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor, wait, FIRST_COMPLETED
+from concurrent.futures import TimeoutError as FutureTimeout
 from pathlib import Path
-from dataclasses import dataclass, asdict, field
-from typing import Optional
+from dataclasses import dataclass, asdict, field, fields, replace
+from typing import Callable, Optional
 import argparse
+import contextlib
 
 # ============================================================================
 # Data Structures
@@ -27,9 +41,12 @@ class Symbol:
     file: str
     line: int
     end_line: int
+    column: int = 0  # 0-based character of the symbol name (LSP position)
     detail: str = ""
     children: list = field(default_factory=list)
-    references: list = field(default_factory=list)
+    references: list = field(default_factory=list)  # "path:line", capped sample
+    reference_count: int = 0
+    references_estimated: bool = False  # True when reference_count is not an LSP count
     calls: list = field(default_factory=list)
     called_by: list = field(default_factory=list)
     docstring: str = ""
@@ -41,84 +58,419 @@ class FileInfo:
     symbols: list = field(default_factory=list)
     imports: list = field(default_factory=list)
     exports: list = field(default_factory=list)
+    skipped: str = ""  # generated, minified or oversized: full analysis was skipped
 
 @dataclass
 class ProjectAnalysis:
     name: str
     root: str
-    language: str
+    language: str  # primary language
     framework: str = ""
+    framework_evidence: dict = field(default_factory=dict)  # framework -> weight
+    languages: dict = field(default_factory=dict)  # language -> file count
     entry_points: list = field(default_factory=list)
     files: list = field(default_factory=list)
     dependencies: dict = field(default_factory=dict)
     call_graph: dict = field(default_factory=dict)
+    module_graph: dict = field(default_factory=dict)  # file-level imports and their cycles
+    metadata: dict = field(default_factory=dict)
+
+@dataclass
+class AnalysisOptions:
+    """Tuning knobs for a single analysis run."""
+    hover_budget: float = 30.0  # wall-clock seconds for hover enrichment, 0 disables
+    reference_budget: float = 30.0  # wall-clock seconds for reference counts, 0 disables
+    lsp_workers: int = 8  # concurrent LSP requests in flight
+    max_file_size: int = 2 << 20  # bytes; larger files only get a streamed outline
+    use_ignore_files: bool = True  # honor .gitignore/.agentignore during the walk
+    shard: Optional[tuple] = None  # (index, count), 1-based: analyze only that slice
+    cache_dir: Optional[str] = ""  # "": default user cache, None: no persistent cache
+    mode: str = "auto"  # "auto": LSP when a server exists; "hybrid": fallback plus targeted LSP
+    lsp_budget: float = 60.0  # hybrid: wall-clock seconds per server, startup included
+    daemon: Optional[str] = None  # None: spawn servers per run; "": default daemon socket
+    resume: bool = False  # reuse records from an interrupted run's checkpoint journal
+    progress: str = "auto"  # "auto": tty line or JSON lines by stderr, "tty", "json", "off"
+    max_memory: int = 0  # bytes; nonzero spills finished file records to disk to stay under it
+    time_budget: float = 0.0  # wall-clock seconds for the whole run, 0: unlimited
+    deadline: Optional[float] = None  # monotonic time the run stops; set from time_budget at start
+    outline: bool = False  # Python fallback: lexer outline instead of a full AST (no call names)
+
+# ============================================================================
+# Source Contents
+# ============================================================================
+
+class ContentStore:
+    """Per-run store that reads each source file once.
+    
+    Files above `mmap_threshold` bytes are memory-mapped rather than read,
+    so byte-oriented scanners run directly on the mapping. Raw bytes,
+    mappings and decoded text are kept in an LRU bounded by `max_bytes`,
+    each charged its size. Raw contents are borrowed through `lease`: an
+    evicted mapping is closed, after its last lease ends if still leased.
+    """
+    
+    def __init__(self, mmap_threshold: int = 1 << 20, max_bytes: int = 128 << 20):
+        self.mmap_threshold = mmap_threshold
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # (kind, path) -> [value, cost, leases, evicted]
+        self._digests = {}
+        self._size = 0
+        self._lock = threading.Lock()  # languages are analyzed concurrently
+    
+    def _get(self, key, lease: bool = False):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            entry[2] += lease
+            return entry
+    
+    def _put(self, key, value, cost: int, lease: bool = False):
+        with self._lock:
+            if key in self._entries:
+                entry = self._entries[key]
+                entry[2] += lease
+                if isinstance(value, mmap.mmap):
+                    value.close()
+                return entry
+            entry = self._entries[key] = [value, cost, int(lease), False]
+            self._size += cost
+            while self._size > self.max_bytes and len(self._entries) > 1:
+                _, old = self._entries.popitem(last=False)
+                self._size -= old[1]
+                old[3] = True
+                if not old[2]:
+                    self._close(old)
+            return entry
+    
+    @staticmethod
+    def _close(entry: list):
+        if isinstance(entry[0], mmap.mmap):
+            try:
+                entry[0].close()
+            except BufferError:
+                pass  # a buffer export outlived its lease; the mapping goes with it
+    
+    def _release(self, entry: list):
+        with self._lock:
+            entry[2] -= 1
+            if entry[3] and not entry[2]:
+                self._close(entry)
+    
+    @contextlib.contextmanager
+    def lease(self, file_path: Path):
+        """Raw contents as bytes, or a read-only mmap for large files.
+        
+        The value is only valid inside the block.
+        """
+        key = ("data", str(file_path))
+        entry = self._get(key, lease=True)
+        if entry is None:
+            with open(file_path, "rb") as f:
+                size = os.fstat(f.fileno()).st_size
+                if size >= self.mmap_threshold:
+                    value = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                else:
+                    value = f.read()
+            entry = self._put(key, value, size, lease=True)
+        try:
+            yield entry[0]
+        finally:
+            self._release(entry)
+    
+    def head(self, file_path: Path, limit: int) -> bytes:
+        """The first `limit` bytes, read once with the rest of the file.
+        
+        Small files are loaded into the cache for the analyzer that
+        follows; a large file's head comes from a mapping that is not
+        cached, so an oversized file never displaces cached sources.
+        """
+        if self._get(("data", str(file_path))) is None:
+            with open(file_path, "rb") as f:
+                if os.fstat(f.fileno()).st_size >= self.mmap_threshold:
+                    with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapping:
+                        return mapping[:limit]
+        with self.lease(file_path) as data:
+            return bytes(data[:limit])
+    
+    def size(self, file_path: Path) -> int:
+        with self.lease(file_path) as data:
+            return len(data)
+    
+    def text(self, file_path: Path) -> str:
+        """Decoded contents; the same str object is returned while cached."""
+        key = ("text", str(file_path))
+        entry = self._get(key)
+        if entry is not None:
+            return entry[0]
+        with self.lease(file_path) as data:
+            text = str(memoryview(data), "utf-8", "ignore")
+        return self._put(key, text, len(text))[0]
+    
+    def digest(self, file_path: Path) -> str:
+        """Content hash used to key cached per-file results."""
+        path = str(file_path)
+        if path not in self._digests:
+            with self.lease(file_path) as data:
+                self._digests[path] = hashlib.sha1(data).hexdigest()
+        return self._digests[path]
+
+class LineIndex:
+    """Maps offsets in a buffer to 1-based line numbers."""
+    
+    def __init__(self, data):
+        self.data = data
+        self._starts = None
+    
+    def line_of(self, offset: int) -> int:
+        if self._starts is None:
+            newline = "\n" if isinstance(self.data, str) else b"\n"
+            self._starts = array("q", (m.end() for m in re.finditer(newline, self.data)))
+        return bisect_right(self._starts, offset) + 1
+    
+    def column_of(self, offset: int) -> int:
+        """0-based column of an offset, in buffer units."""
+        line = self.line_of(offset)
+        return offset - (self._starts[line - 2] if line > 1 else 0)
 
 # ============================================================================
 # Project Detection
 # ============================================================================
 
-def detect_project_type(root: Path) -> tuple[str, str, str]:
-    """Detect primary language, LSP server, and framework."""
+def detect_project_type(root: Path) -> tuple[str, str]:
+    """Detect primary language and LSP server from config files."""
     
     # TypeScript/JavaScript
     if (root / "package.json").exists():
         pkg = json.loads((root / "package.json").read_text())
         deps = {**pkg.get("dependencies", {}), **pkg.get("devDependencies", {})}
         
-        framework = ""
-        if "next" in deps: framework = "Next.js"
-        elif "react" in deps: framework = "React"
-        elif "vue" in deps: framework = "Vue"
-        elif "express" in deps: framework = "Express"
-        elif "fastify" in deps: framework = "Fastify"
-        
         if "typescript" in deps or (root / "tsconfig.json").exists():
-            return "typescript", "typescript-language-server", framework
-        return "javascript", "typescript-language-server", framework
+            return "typescript", "typescript-language-server"
+        return "javascript", "typescript-language-server"
     
     # Python
     if any((root / f).exists() for f in ["pyproject.toml", "setup.py", "requirements.txt"]):
-        framework = ""
-        for f in root.rglob("*.py"):
-            content = f.read_text(errors="ignore")
-            if "from fastapi" in content or "import fastapi" in content:
-                framework = "FastAPI"; break
-            if "from django" in content or "import django" in content:
-                framework = "Django"; break
-            if "from flask" in content or "import flask" in content:
-                framework = "Flask"; break
-        return "python", "pylsp", framework
+        return "python", "pylsp"
     
     # Go
     if (root / "go.mod").exists():
-        return "go", "gopls", ""
+        return "go", "gopls"
     
     # Rust
     if (root / "Cargo.toml").exists():
-        return "rust", "rust-analyzer", ""
+        return "rust", "rust-analyzer"
     
     # Java
     if (root / "pom.xml").exists() or (root / "build.gradle").exists():
-        return "java", "jdtls", ""
+        return "java", "jdtls"
     
     # C/C++
     if (root / "CMakeLists.txt").exists() or (root / "Makefile").exists():
-        return "cpp", "clangd", ""
+        return "cpp", "clangd"
+    
+    return "unknown", ""
+
+# Listed in precedence order: ties in evidence go to the earlier entry
+FRAMEWORK_SIGNATURES = [
+    ("Next.js", "next"),
+    ("React", "react"),
+    ("Vue", "vue"),
+    ("Express", "express"),
+    ("Fastify", "fastify"),
+    ("FastAPI", "fastapi"),
+    ("Django", "django"),
+    ("Flask", "flask"),
+]
+
+DEPENDENCY_EVIDENCE = 3.0  # a declared dependency outweighs a few stray imports
+IMPORT_EVIDENCE = 1.0  # per importing file
+
+def import_root(module: str) -> str:
+    """Package an import belongs to: `flask.views` -> `flask`, `@a/b/c` -> `@a/b`."""
+    if module.startswith("@"):
+        return "/".join(module.split("/")[:2])
+    return re.split(r"[./]", module, maxsplit=1)[0]
+
+def detect_frameworks(files: list[FileInfo], dependencies: dict) -> dict[str, float]:
+    """Weigh framework evidence from collected imports and declared dependencies.
+    
+    Returns framework -> weight, strongest first.
+    """
+    packages = {name: framework for framework, name in FRAMEWORK_SIGNATURES}
+    evidence = {}
     
-    return "unknown", "", ""
+    for kind in ("runtime", "dev"):
+        for dep in dependencies.get(kind, []):
+            name = re.split(r"[\[<>=!~;\s]", dep, maxsplit=1)[0].lower()
+            if name in packages:
+                framework = packages[name]
+                evidence[framework] = evidence.get(framework, 0.0) + DEPENDENCY_EVIDENCE
+    
+    for info in files:
+        for name in {import_root(module) for module in info.imports}:
+            if name in packages:
+                framework = packages[name]
+                evidence[framework] = evidence.get(framework, 0.0) + IMPORT_EVIDENCE
+    
+    order = {framework: i for i, (framework, _) in enumerate(FRAMEWORK_SIGNATURES)}
+    return dict(sorted(evidence.items(), key=lambda item: (-item[1], order[item[0]])))
+
+IMPORT_HEADER_LIMIT = 64 * 1024  # never scan further than this for imports
+
+def scan_import_header(lines, language: str) -> list[str]:
+    """Collect imports from the top of a file, stopping after the import block.
+    
+    `lines` may be any iterable of lines (an open file works), so reading
+    ends at the first statement that cannot belong to the import header.
+    """
+    imports = []
+    scanned = 0
+    pending = ""  # multi-line import statement being accumulated
+    in_docstring = ""
+    
+    for raw in lines:
+        scanned += len(raw)
+        if scanned > IMPORT_HEADER_LIMIT:
+            break
+        line = raw.strip()
+        
+        if language == "python":
+            if in_docstring:
+                if in_docstring in line:
+                    in_docstring = ""
+                continue
+            if pending:
+                pending += " " + line
+                if ")" not in line:
+                    continue
+                line, pending = pending, ""
+            if not line or line.startswith("#"):
+                continue
+            if line[:3] in ('"""', "'''"):
+                if line.count(line[:3]) == 1:
+                    in_docstring = line[:3]
+                continue
+            if line.startswith("from ") and "(" in line and ")" not in line:
+                pending = line
+                continue
+            match = re.match(r"from\s+(\.*[\w.]*)\s+import\b(.*)", line)
+            if match:
+                module = match.group(1)
+                names = match.group(2).split("#")[0].strip().strip("()").split(",")
+                if module.strip(".") or "*" in match.group(2):
+                    imports.append(module)
+                else:
+                    imports.extend(module + name.split(" as ")[0].strip() for name in names if name.strip())
+                continue
+            match = re.match(r"import\s+(.+)", line)
+            if match:
+                imports.extend(part.split(" as ")[0].strip() for part in match.group(1).split(","))
+                continue
+            if raw[:1] in (" ", "\t") or re.match(r"(try|except|else|finally|if TYPE_CHECKING)\b", line) \
+                    or line.startswith("__"):
+                continue  # guarded imports and module dunders
+            break
+        
+        elif language in ("typescript", "javascript"):
+            if pending:
+                pending += " " + line
+                match = re.search(r'from\s+[\'"](.+?)[\'"]', pending)
+                if match:
+                    imports.append(match.group(1))
+                    pending = ""
+                continue
+            if not line or line.startswith(("//", "/*", "*", "'use ", '"use ')):
+                continue
+            match = re.search(r'(?:from|require\()\s*[\'"](.+?)[\'"]', line) \
+                or re.match(r'import\s+[\'"](.+?)[\'"]', line)
+            if match and re.match(r"(import|export|const|let|var)\b", line):
+                imports.append(match.group(1))
+                continue
+            if line.startswith(("import", "export {", "export *")):
+                pending = line
+                continue
+            break
+        
+        elif language == "go":
+            if pending:
+                if line.startswith(")"):
+                    pending = ""
+                    continue
+                match = re.search(r'"([^"]+)"', line)
+                if match:
+                    imports.append(match.group(1))
+                continue
+            if not line or line.startswith(("//", "package ")):
+                continue
+            if line.startswith("import ("):
+                pending = line
+                continue
+            match = re.match(r'import\s+(?:\w+\s+)?"([^"]+)"', line)
+            if match:
+                imports.append(match.group(1))
+                continue
+            break
+        
+        else:
+            break
+    
+    return imports
 
 # ============================================================================
 # LSP Client (Simplified)
 # ============================================================================
 
+def write_frame(stream, message: dict):
+    """Write one Content-Length framed JSON-RPC message and flush."""
+    content = json.dumps(message).encode()
+    stream.write(f"Content-Length: {len(content)}\r\n\r\n".encode() + content)
+    stream.flush()
+
+def read_frame(stream) -> Optional[dict]:
+    """Read one framed message; None once the stream is closed or broken."""
+    try:
+        # Read headers
+        headers = {}
+        while True:
+            line = stream.readline().decode()
+            if not line:
+                return None  # peer closed its output
+            if line == "\r\n":
+                break
+            if ":" in line:
+                key, value = line.split(":", 1)
+                headers[key.strip()] = value.strip()
+        
+        # Read content
+        length = int(headers.get("Content-Length", 0))
+        if length:
+            return json.loads(stream.read(length).decode())
+    except Exception:
+        return None
+    return {}
+
 class LSPClient:
-    """Minimal LSP client for code analysis."""
+    """Minimal LSP client for code analysis.
     
-    def __init__(self, server_cmd: list, root: Path):
+    A background reader thread dispatches responses by request id, so
+    requests may be issued concurrently from several threads.
+    """
+    
+    def __init__(self, server_cmd: list, root: Path, timeout: float = 10.0):
         self.root = root
         self.request_id = 0
         self.process = None
         self.server_cmd = server_cmd
+        self.timeout = timeout
+        self._pending = {}
+        self._pending_lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._reader = None
+        self._in = None  # byte streams the messages travel over
+        self._out = None
+        self.capabilities = {}
         
     def start(self) -> bool:
         """Start the LSP server process."""
@@ -127,26 +479,39 @@ class LSPClient:
                 self.server_cmd,
                 stdin=subprocess.PIPE,
                 stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
+                stderr=subprocess.DEVNULL,  # an unread PIPE stalls chatty servers
                 cwd=str(self.root)
             )
-            return self._initialize()
         except FileNotFoundError:
             return False
+        self._in, self._out = self.process.stdout, self.process.stdin
+        self._reader = threading.Thread(target=self._read_loop, daemon=True)
+        self._reader.start()
+        return self._initialize()
     
     def stop(self):
         """Shutdown the LSP server."""
         if self.process:
-            self._send_notification("shutdown", {})
-            self._send_notification("exit", {})
+            try:
+                self._send_notification("shutdown", {})
+                self._send_notification("exit", {})
+            except OSError:
+                pass
             self.process.terminate()
     
     def _send_request(self, method: str, params: dict) -> Optional[dict]:
         """Send a JSON-RPC request and get response."""
-        self.request_id += 1
+        response = self._send_request_response(method, params)
+        return response.get("result") if response else None
+    
+    def _send_request_response(self, method: str, params: dict) -> Optional[dict]:
+        """Send a JSON-RPC request; the whole response, None on timeout."""
+        with self._pending_lock:
+            self.request_id += 1
+            request_id = self.request_id
         message = {
             "jsonrpc": "2.0",
-            "id": self.request_id,
+            "id": request_id,
             "method": method,
             "params": params
         }
@@ -161,46 +526,74 @@ class LSPClient:
         }
         self._write_message(message)
     
+    def alive(self) -> bool:
+        """Whether the server connection is still up."""
+        return self._reader is not None and self._reader.is_alive()
+    
+    def pending_count(self) -> int:
+        """Requests sent and not yet answered."""
+        with self._pending_lock:
+            return len(self._pending)
+    
+    def request(self, method: str, params: dict) -> Optional[dict]:
+        """Send any request and wait for its result (None on timeout)."""
+        return self._send_request(method, params)
+    
+    def request_response(self, method: str, params: dict) -> Optional[dict]:
+        """Send any request and wait for its response message (None on timeout)."""
+        return self._send_request_response(method, params)
+    
+    def notify(self, method: str, params: dict):
+        """Send any notification."""
+        self._send_notification(method, params)
+    
     def _write_message(self, message: dict):
         """Write a message to the LSP server."""
-        content = json.dumps(message)
-        header = f"Content-Length: {len(content)}\r\n\r\n"
-        self.process.stdin.write(header.encode() + content.encode())
-        self.process.stdin.flush()
+        with self._write_lock:
+            write_frame(self._out, message)
     
     def _read_message(self) -> Optional[dict]:
         """Read a message from the LSP server."""
-        try:
-            # Read headers
-            headers = {}
-            while True:
-                line = self.process.stdout.readline().decode()
-                if line == "\r\n":
-                    break
-                if ":" in line:
-                    key, value = line.split(":", 1)
-                    headers[key.strip()] = value.strip()
-            
-            # Read content
-            length = int(headers.get("Content-Length", 0))
-            if length:
-                content = self.process.stdout.read(length).decode()
-                return json.loads(content)
-        except Exception:
-            pass
-        return None
+        return read_frame(self._in)
     
-    def _communicate(self, message: dict) -> Optional[dict]:
-        """Send request and wait for response."""
-        self._write_message(message)
+    def _read_loop(self):
+        """Dispatch server messages to the requests waiting on them."""
+        while True:
+            message = self._read_message()
+            if message is None:
+                break
+            if "method" in message:
+                # Server-to-client request (configuration, progress...): an
+                # empty reply keeps servers that wait on it from stalling.
+                if "id" in message:
+                    try:
+                        self._write_message({"jsonrpc": "2.0", "id": message["id"], "result": None})
+                    except OSError:
+                        break
+                continue
+            with self._pending_lock:
+                future = self._pending.pop(message.get("id"), None)
+            if future:
+                future.set_result(message)
         
-        # Wait for response with matching ID
-        start = time.time()
-        while time.time() - start < 10:  # 10s timeout
-            response = self._read_message()
-            if response and response.get("id") == message["id"]:
-                return response.get("result")
-        return None
+        # Server is gone: release every waiting request
+        with self._pending_lock:
+            pending, self._pending = self._pending, {}
+        for future in pending.values():
+            future.set_result(None)
+    
+    def _communicate(self, message: dict) -> Optional[dict]:
+        """Send request and wait for the response message."""
+        future = Future()
+        with self._pending_lock:
+            self._pending[message["id"]] = future
+        try:
+            self._write_message(message)
+            return future.result(timeout=self.timeout)
+        except (FutureTimeout, OSError):
+            with self._pending_lock:
+                self._pending.pop(message["id"], None)
+            return None
     
     def _initialize(self) -> bool:
         """Initialize the LSP connection."""
@@ -218,18 +611,21 @@ class LSPClient:
             }
         })
         if result:
+            self.capabilities = result.get("capabilities", {})
             self._send_notification("initialized", {})
             return True
         return False
     
-    def open_file(self, file_path: Path, language: str):
+    def open_file(self, file_path: Path, language: str, text: Optional[str] = None):
         """Notify server that a file is open."""
+        if text is None:
+            text = file_path.read_text(errors="ignore")
         self._send_notification("textDocument/didOpen", {
             "textDocument": {
                 "uri": f"file://{file_path}",
                 "languageId": language,
                 "version": 1,
-                "text": file_path.read_text(errors="ignore")
+                "text": text
             }
         })
     
@@ -240,14 +636,16 @@ class LSPClient:
         })
         return result or []
     
-    def get_references(self, file_path: Path, line: int, char: int) -> list:
-        """Get all references to a symbol."""
-        result = self._send_request("textDocument/references", {
+    def get_references(self, file_path: Path, line: int, char: int) -> Optional[list]:
+        """Get all references to a symbol; None when the server did not answer."""
+        response = self._send_request_response("textDocument/references", {
             "textDocument": {"uri": f"file://{file_path}"},
             "position": {"line": line, "character": char},
             "context": {"includeDeclaration": False}
         })
-        return result or []
+        if response is None or "error" in response:
+            return None
+        return response.get("result") or []
     
     def get_hover(self, file_path: Path, line: int, char: int) -> Optional[str]:
         """Get hover information (type info, docs)."""
@@ -264,31 +662,181 @@ class LSPClient:
             if isinstance(contents, list):
                 return "\n".join(c.get("value", c) if isinstance(c, dict) else c for c in contents)
         return None
+    
+    def get_call_hierarchy(self, file_path: Path, line: int, char: int) -> Optional[list[str]]:
+        """Names of the functions a symbol calls, or None if unsupported."""
+        items = self._send_request("textDocument/prepareCallHierarchy", {
+            "textDocument": {"uri": f"file://{file_path}"},
+            "position": {"line": line, "character": char}
+        })
+        if not items:
+            return None
+        calls = self._send_request("callHierarchy/outgoingCalls", {"item": items[0]})
+        if calls is None:
+            return None
+        names = []
+        for call in calls:
+            name = call.get("to", {}).get("name", "")
+            if name and name not in names:
+                names.append(name)
+        return names
+
+def default_daemon_socket() -> Path:
+    """Socket of the shared server daemon (see lsp_daemon.py)."""
+    return default_cache_dir() / "lsp-daemon.sock"
+
+class DaemonLSPClient(LSPClient):
+    """LSPClient for a warm server owned by lsp_daemon.py.
+    
+    The daemon keeps one server per (workspace, command) alive across
+    runs: `initialize` is answered from its cache and documents it has
+    already seen are only re-sent when their content changed.
+    """
+    
+    def __init__(self, server_cmd: list, root: Path, socket_path: Path, timeout: float = 10.0):
+        super().__init__(server_cmd, root, timeout)
+        self.socket_path = socket_path
+        self.sock = None
+        self.connected = False  # reached the daemon, even if attaching failed
+        self.warm = False
+    
+    def start(self) -> bool:
+        """Attach to the daemon; False when it is not running or the server failed."""
+        try:
+            self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.sock.connect(str(self.socket_path))
+        except OSError:
+            self.sock.close()
+            self.sock = None
+            return False
+        self.connected = True
+        self._in, self._out = self.sock.makefile("rb"), self.sock.makefile("wb")
+        self._reader = threading.Thread(target=self._read_loop, daemon=True)
+        self._reader.start()
+        
+        # Server startup can take minutes on first attach
+        timeout, self.timeout = self.timeout, max(self.timeout, 600.0)
+        result = self._send_request("daemon/attach", {"root": str(self.root), "command": self.server_cmd})
+        self.timeout = timeout
+        if not result:
+            self.stop()
+            return False
+        self.warm = bool(result.get("warm"))
+        return self._initialize()
+    
+    def stop(self):
+        """Detach; the server stays up in the daemon."""
+        if self.sock:
+            try:
+                self._send_notification("exit", {})
+            except OSError:
+                pass
+            try:
+                self.sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            self.sock.close()
+            self.sock = None
+
+_spawn_lock = threading.Lock()  # language groups start their clients concurrently
+
+def spawn_daemon(socket_path: Path, wait: float = 5.0) -> bool:
+    """Start lsp_daemon.py in the background and wait for its socket.
+    
+    A socket file nobody listens on, left by a daemon that died, is
+    removed first.
+    """
+    script = Path(__file__).with_name("lsp_daemon.py")
+    if socket_path.exists():
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(str(socket_path))
+            return True  # another thread got there first
+        except ConnectionRefusedError:
+            socket_path.unlink(missing_ok=True)
+        except OSError:
+            return False
+        finally:
+            probe.close()
+    try:
+        subprocess.Popen(
+            [sys.executable, str(script), "--socket", str(socket_path)],
+            stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+            start_new_session=True  # outlives this run
+        )
+    except OSError:
+        return False
+    deadline = time.monotonic() + wait
+    while time.monotonic() < deadline:
+        if socket_path.exists():
+            return True
+        time.sleep(0.05)
+    return False
+
+def start_lsp_client(cmd: list, root: Path, options: "AnalysisOptions") -> Optional[LSPClient]:
+    """A started client: through the daemon when enabled, else a fresh server."""
+    if options.daemon is not None:
+        socket_path = Path(options.daemon) if options.daemon else default_daemon_socket()
+        client = DaemonLSPClient(cmd, root, socket_path)
+        if not client.start() and not client.connected:
+            with _spawn_lock:
+                spawned = spawn_daemon(socket_path)
+            if spawned:
+                client = DaemonLSPClient(cmd, root, socket_path)
+                client.start()
+        if client.connected:
+            # The daemon answered: a server it cannot start will not start here either
+            return client if client.sock else None
+        status(f"[WARN] LSP daemon unavailable at {socket_path}, starting {cmd[0]} directly")
+    
+    client = LSPClient(cmd, root)
+    return client if client.start() else None
 
 # ============================================================================
 # Fallback Analyzers (No LSP)
 # ============================================================================
 
-def analyze_python_file(file_path: Path) -> FileInfo:
+def python_call_names(node) -> list[str]:
+    """Names called inside a function body, in first-call order."""
+    import ast
+    
+    names = []
+    for child in ast.walk(node):
+        if isinstance(child, ast.Call):
+            func = child.func
+            name = func.id if isinstance(func, ast.Name) else getattr(func, "attr", None)
+            if name and name not in names:
+                names.append(name)
+    return names
+
+def analyze_python_file(file_path: Path, store: Optional[ContentStore] = None) -> FileInfo:
     """Analyze Python file using AST."""
     import ast
     
     info = FileInfo(path=str(file_path), language="python")
-    content = file_path.read_text(errors="ignore")
+    content = (store or ContentStore()).text(file_path)
     
     try:
         tree = ast.parse(content)
     except SyntaxError:
         return info
     
+    # Functions directly in a class body are methods, reported with their class
+    methods = {id(item) for node in ast.walk(tree) if isinstance(node, ast.ClassDef)
+               for item in node.body}
+    
     for node in ast.walk(tree):
         # Imports
         if isinstance(node, ast.Import):
             for alias in node.names:
                 info.imports.append(alias.name)
         elif isinstance(node, ast.ImportFrom):
+            # Relative imports keep their dots; `from . import x` names module .x
+            prefix = "." * node.level
             if node.module:
-                info.imports.append(node.module)
+                info.imports.append(prefix + node.module)
+            elif prefix:
+                info.imports.extend(prefix + alias.name for alias in node.names)
         
         # Classes
         elif isinstance(node, ast.ClassDef):
@@ -309,279 +857,2057 @@ def analyze_python_file(file_path: Path) -> FileInfo:
                         file=str(file_path),
                         line=item.lineno,
                         end_line=item.end_lineno or item.lineno,
-                        docstring=ast.get_docstring(item) or ""
+                        docstring=ast.get_docstring(item) or "",
+                        calls=python_call_names(item)
                     ))
             info.symbols.append(sym)
         
         # Functions (top-level)
-        elif isinstance(node, ast.FunctionDef) and not any(
-            isinstance(p, ast.ClassDef) for p in ast.walk(tree) 
-            if hasattr(p, 'body') and node in getattr(p, 'body', [])
-        ):
+        elif isinstance(node, ast.FunctionDef) and id(node) not in methods:
             info.symbols.append(Symbol(
                 name=node.name,
                 kind="function",
                 file=str(file_path),
                 line=node.lineno,
                 end_line=node.end_lineno or node.lineno,
-                docstring=ast.get_docstring(node) or ""
+                docstring=ast.get_docstring(node) or "",
+                calls=python_call_names(node)
             ))
     
     return info
 
-def analyze_typescript_file(file_path: Path) -> FileInfo:
-    """Analyze TypeScript/JavaScript file using regex patterns."""
-    info = FileInfo(path=str(file_path), language="typescript")
-    content = file_path.read_text(errors="ignore")
-    lines = content.split("\n")
-    
-    # Imports
-    for match in re.finditer(r'import\s+.*?\s+from\s+[\'"](.+?)[\'"]', content):
-        info.imports.append(match.group(1))
-    
-    # Exports
-    for match in re.finditer(r'export\s+(?:default\s+)?(?:class|function|const|interface|type)\s+(\w+)', content):
-        info.exports.append(match.group(1))
-    
-    # Classes
-    for match in re.finditer(r'(?:export\s+)?class\s+(\w+)', content):
-        line_num = content[:match.start()].count("\n") + 1
-        info.symbols.append(Symbol(
-            name=match.group(1),
-            kind="class",
-            file=str(file_path),
-            line=line_num,
-            end_line=line_num  # Simplified
-        ))
-    
-    # Functions
-    for match in re.finditer(r'(?:export\s+)?(?:async\s+)?function\s+(\w+)', content):
-        line_num = content[:match.start()].count("\n") + 1
-        info.symbols.append(Symbol(
-            name=match.group(1),
-            kind="function",
-            file=str(file_path),
-            line=line_num,
-            end_line=line_num
-        ))
+# Python outline: a lexer that only sees strings, comments, brackets and
+# line breaks finds logical lines; their indentation opens and closes
+# blocks, and only lines starting with def/class/@/import/from (and the
+# docstring right after a header) are read further. No AST is built.
+
+PYTHON_OUTLINE_LEXER = re.compile(rb"""
+    (?P<string>'''(?:\\.|[^\\])*?'''|\"\"\"(?:\\.|[^\\])*?\"\"\"
+        |'(?:\\.|[^'\\\n])*'|"(?:\\.|[^"\\\n])*")
+    |(?P<unterminated>['"])
+    |(?P<comment>\#[^\n]*)
+    |(?P<group>\([^()\[\]{}'"\#\\\n]*\)|\[[^()\[\]{}'"\#\\\n]*\]|\{[^()\[\]{}'"\#\\\n]*\})
+    |(?P<open>[(\[{])
+    |(?P<close>[)\]}])
+    |(?P<continuation>\\\r?\n)
+    |(?P<newline>\n)
+""", re.VERBOSE | re.DOTALL)
+
+PYTHON_LINE_HEAD = re.compile(rb"[ \t\f]*(?:(?P<blank>\#|\r?\n|\r?$)|(?P<keyword>@|(?:async[ \t]+)?def\b|class\b|import\b|from\b))?")
+PYTHON_DEFINITION = re.compile(rb"(?:async\s+)?(def|class)\s+(\w+)")
+PYTHON_STRING_PREFIX = re.compile(rb"[rRbBuUfF]{0,2}(?=['\"])")
+PYTHON_LINE_REST = re.compile(rb"[ \t]*(?:\#[^\n]*)?(?:\r?\n|$)")
+
+class PythonOutlineError(ValueError):
+    """Source the outline lexer cannot follow (unterminated string, unbalanced brackets)."""
+
+def python_string_end(data, offset: int) -> Optional[int]:
+    """End of the string literal starting at offset, prefix included, or None."""
+    prefix = PYTHON_STRING_PREFIX.match(data, offset)
+    literal = prefix and PYTHON_OUTLINE_LEXER.match(data, prefix.end())
+    return literal.end() if literal and literal.lastgroup == "string" else None
+
+def python_docstring(literal: bytes) -> str:
+    """Docstring text of a string literal, cleaned like ast.get_docstring."""
+    import ast
+    import inspect
+    
+    try:
+        value = ast.literal_eval(literal.decode("utf-8", "replace"))
+    except (ValueError, SyntaxError):
+        return ""
+    return inspect.cleandoc(value) if isinstance(value, str) else ""
+
+def python_import_names(statement: bytes) -> list[str]:
+    """Modules named by an import statement, as analyze_python_file reports them."""
+    words = re.findall(rb"\.\.\.|[\w.]+|,|\*", re.sub(rb"\#[^\n]*", b"", statement))
+    words = [word.decode("utf-8", "replace") for word in words]
+    if words[0] == "import":
+        names, skip = [], False
+        for word in words[1:]:
+            if word == ",":
+                skip = False
+            elif word == "as":
+                skip = True
+            elif not skip:
+                names.append(word)
+        return names
+    
+    # from <dots><module> import <names>
+    if "import" not in words:
+        return []
+    split = words.index("import")
+    source = "".join(words[1:split])
+    module = source.lstrip(".")
+    if module:
+        return [source]
+    names, skip = [], False
+    for word in words[split + 1:]:
+        if word == ",":
+            skip = False
+        elif word == "as":
+            skip = True
+        elif not skip and word != "*":
+            names.append(source + word)
+    return names
+
+def outline_python_source(data, file: str) -> tuple[list, list]:
+    """(symbols, imports) of Python source bytes; raises PythonOutlineError.
+    
+    Top-level classes and functions, methods and nested classes get their
+    decorators (in `detail`), docstrings and end lines; definitions inside
+    function bodies are skipped. Imports are read at any depth.
+    """
+    symbols, imports = [], []
+    blocks = []  # (header indent, kind, Symbol or None), innermost last
+    decorators = []
+    doc_target = None  # symbol whose header was the previous logical line
+    depth = 0
+    line = 1
+    last_code_line = 0  # where the last logical line ended
+    start = 0  # offset of the current logical line
+    head = None  # (kind keyword, offset) when the current line is of interest
+    
+    def begin(offset: int):
+        """Classify the logical line starting at offset; False for blank lines."""
+        nonlocal head, doc_target
+        match = PYTHON_LINE_HEAD.match(data, offset)
+        if match.group("blank") is not None:
+            return False
+        indent = len(match.group(0)) - len(match.group("keyword") or b"")
+        while blocks and indent <= blocks[-1][0]:
+            _, _, closed = blocks.pop()
+            if closed:
+                closed.end_line = last_code_line
+        if match.group("keyword"):
+            head = (match.group("keyword").split()[0], offset + indent, indent)
+        else:
+            head = None
+        # A docstring is the first statement of the header's block
+        if doc_target is not None:
+            end = python_string_end(data, offset + indent)
+            if end and PYTHON_LINE_REST.match(data, end) and blocks and blocks[-1][2] is doc_target:
+                doc_target.docstring = python_docstring(bytes(data[offset + indent:end]))
+            doc_target = None
+        return True
+    
+    def finish(end: int):
+        """Act on the logical line that ends at offset `end`."""
+        nonlocal doc_target
+        if head is None:
+            decorators.clear()
+            return
+        keyword, offset, indent = head
+        statement = bytes(data[offset:end])
+        if keyword == b"@":
+            decorators.append(b" ".join(statement.split()).decode("utf-8", "replace"))
+            return
+        if keyword in (b"import", b"from"):
+            imports.extend(python_import_names(statement))
+            return
+        
+        definition = PYTHON_DEFINITION.match(statement)
+        found, kind = decorators[:], None
+        decorators.clear()
+        if not definition:
+            return
+        kind = "class" if definition.group(1) == b"class" else "function"
+        scopes = [block for block in blocks if block[1]]
+        if any(block[1] == "function" for block in scopes):
+            blocks.append((indent, kind, None))
+            return
+        parent = scopes[-1][2] if scopes else None
+        symbol = Symbol(
+            name=definition.group(2).decode("utf-8", "replace"),
+            kind="method" if kind == "function" and parent else kind,
+            file=file,
+            line=header_line,
+            end_line=line,
+            column=len(data[data.rfind(b"\n", 0, offset) + 1:offset]) + definition.start(2),
+            detail="\n".join(found)
+        )
+        if parent and kind == "function":
+            parent.children.append(symbol)
+        else:
+            symbols.append(symbol)
+        blocks.append((indent, kind, symbol))
+        doc_target = symbol
+        # A one-line body (`def f(): "doc"`) holds its own docstring
+        colon = python_header_colon(statement)
+        if colon is not None and not PYTHON_LINE_REST.fullmatch(statement, colon + 1):
+            body = statement[colon + 1:].strip()
+            if python_string_end(body, 0) == len(body):
+                symbol.docstring = python_docstring(body)
+            doc_target = None
+    
+    in_line = begin(0)
+    header_line = 1
+    for match in PYTHON_OUTLINE_LEXER.finditer(data):
+        group = match.lastgroup
+        if group == "string":
+            line += match.group().count(b"\n")
+        elif group == "open":
+            depth += 1
+        elif group == "close":
+            depth -= 1
+            if depth < 0:
+                raise PythonOutlineError(f"unbalanced {match.group().decode()!r} on line {line}")
+        elif group == "continuation":
+            line += 1
+        elif group == "newline":
+            if depth == 0:
+                if in_line:
+                    finish(match.start())
+                    last_code_line = line
+                line += 1
+                header_line = line
+                in_line = begin(match.end())
+            else:
+                line += 1
+        elif group == "unterminated":
+            raise PythonOutlineError(f"unterminated string on line {line}")
+    if depth:
+        raise PythonOutlineError("unclosed bracket at end of file")
+    if in_line:
+        finish(len(data))
+        last_code_line = line
+    for _, _, symbol in blocks:
+        if symbol:
+            symbol.end_line = last_code_line
+    return symbols, imports
+
+def python_header_colon(statement: bytes) -> Optional[int]:
+    """Offset of the colon ending a def/class header, outside brackets and strings."""
+    depth = 0
+    for match in re.finditer(rb"""\#[^\n]*|'(?:\\.|[^'\\])*'|"(?:\\.|[^"\\])*"|[(\[{]|[)\]}]|:""", statement):
+        token = match.group()
+        if token[:1] == b"#":
+            continue
+        if token in (b"(", b"[", b"{"):
+            depth += 1
+        elif token in (b")", b"]", b"}"):
+            depth -= 1
+        elif token == b":" and depth == 0:
+            return match.start()
+    return None
+
+def outline_python_file(file_path: Path, store: Optional[ContentStore] = None) -> FileInfo:
+    """Outline a Python file without building an AST; no call names.
+    
+    Files the outline lexer cannot follow fall back to ast.parse, walked
+    only through module and class bodies.
+    """
+    store = store or ContentStore()
+    info = FileInfo(path=str(file_path), language="python")
+    try:
+        with store.lease(file_path) as data:
+            info.symbols, info.imports = outline_python_source(data, str(file_path))
+    except PythonOutlineError:
+        info.symbols, info.imports = outline_python_ast(store.text(file_path), str(file_path))
+    return info
+
+def outline_python_ast(content: str, file: str) -> tuple[list, list]:
+    """The same outline from ast.parse, for sources the lexer rejects."""
+    import ast
+    
+    symbols, imports = [], []
+    try:
+        tree = ast.parse(content)
+    except SyntaxError:
+        return symbols, imports
+    
+    def visit(body: list, parent: Optional[Symbol]):
+        for node in body:
+            if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+                is_class = isinstance(node, ast.ClassDef)
+                symbol = Symbol(
+                    name=node.name,
+                    kind="class" if is_class else "method" if parent else "function",
+                    file=file,
+                    line=node.lineno,
+                    end_line=node.end_lineno or node.lineno,
+                    detail="\n".join("@" + ast.get_source_segment(content, d) for d in node.decorator_list),
+                    docstring=ast.get_docstring(node) or ""
+                )
+                if is_class:
+                    symbols.append(symbol)
+                    visit(node.body, symbol)
+                elif parent:
+                    parent.children.append(symbol)
+                else:
+                    symbols.append(symbol)
+            else:
+                # Compound statements at module or class level (if, try, with...)
+                for field_name in ("body", "handlers", "orelse", "finalbody"):
+                    visit(getattr(node, field_name, None) or [], parent)
     
+    visit(tree.body, None)
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            imports.extend(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom):
+            prefix = "." * node.level
+            if node.module:
+                imports.append(prefix + node.module)
+            elif prefix:
+                imports.extend(prefix + alias.name for alias in node.names)
+    return symbols, imports
+
+TYPESCRIPT_SYMBOL_PATTERNS = [
+    ("class", re.compile(rb'(?:export\s+)?class\s+(\w+)')),
+    ("function", re.compile(rb'(?:export\s+)?(?:async\s+)?function\s+(\w+)')),
     # Arrow functions assigned to const
-    for match in re.finditer(r'(?:export\s+)?const\s+(\w+)\s*=\s*(?:async\s+)?\([^)]*\)\s*(?::\s*\w+)?\s*=>', content):
-        line_num = content[:match.start()].count("\n") + 1
-        info.symbols.append(Symbol(
-            name=match.group(1),
-            kind="function",
-            file=str(file_path),
-            line=line_num,
-            end_line=line_num
-        ))
-    
-    # Interfaces
-    for match in re.finditer(r'(?:export\s+)?interface\s+(\w+)', content):
-        line_num = content[:match.start()].count("\n") + 1
-        info.symbols.append(Symbol(
-            name=match.group(1),
-            kind="interface",
-            file=str(file_path),
-            line=line_num,
-            end_line=line_num
-        ))
-    
-    # Types
-    for match in re.finditer(r'(?:export\s+)?type\s+(\w+)', content):
-        line_num = content[:match.start()].count("\n") + 1
-        info.symbols.append(Symbol(
-            name=match.group(1),
-            kind="type",
-            file=str(file_path),
-            line=line_num,
-            end_line=line_num
-        ))
+    ("function", re.compile(rb'(?:export\s+)?const\s+(\w+)\s*=\s*(?:async\s+)?\([^)]*\)\s*(?::\s*\w+)?\s*=>')),
+    ("interface", re.compile(rb'(?:export\s+)?interface\s+(\w+)')),
+    ("type", re.compile(rb'(?:export\s+)?type\s+(\w+)')),
+]
+
+TYPESCRIPT_IMPORT_PATTERN = re.compile(
+    rb'''\b(?:import|export)\s[^'";]*?\bfrom\s*['"]([^'"\n]+)['"]'''
+    rb'''|\bimport\s*\(?\s*['"]([^'"\n]+)['"]'''
+    rb'''|\brequire\(\s*['"]([^'"\n]+)['"]\s*\)'''
+)
+
+GO_SYMBOL_PATTERNS = [
+    ("function", re.compile(rb'func\s+(\w+)\s*\(')),
+    ("method", re.compile(rb'func\s+\([^)]+\)\s+(\w+)\s*\(')),
+    ("struct", re.compile(rb'type\s+(\w+)\s+struct')),
+    ("interface", re.compile(rb'type\s+(\w+)\s+interface')),
+]
+
+def scan_symbols(data, patterns: list, file_path: Path) -> list[Symbol]:
+    """Run (kind, pattern) scanners over a byte buffer or mmap."""
+    lines = LineIndex(data)
+    symbols = []
+    for kind, pattern in patterns:
+        for match in pattern.finditer(data):
+            line_num = lines.line_of(match.start())
+            symbols.append(Symbol(
+                name=match.group(1).decode(errors="ignore"),
+                kind=kind,
+                file=str(file_path),
+                line=line_num,
+                end_line=line_num  # Simplified
+            ))
+    return symbols
+
+def analyze_typescript_file(file_path: Path, store: Optional[ContentStore] = None) -> FileInfo:
+    """Analyze TypeScript/JavaScript file using regex patterns."""
+    info = FileInfo(path=str(file_path), language="typescript")
+    with (store or ContentStore()).lease(file_path) as data:
+        # Imports: `import ... from`, `export ... from`, side-effect imports, require()
+        for match in TYPESCRIPT_IMPORT_PATTERN.finditer(data):
+            info.imports.append(next(g for g in match.groups() if g).decode(errors="ignore"))
+        
+        # Exports
+        for match in re.finditer(rb'export\s+(?:default\s+)?(?:class|function|const|interface|type)\s+(\w+)', data):
+            info.exports.append(match.group(1).decode(errors="ignore"))
+        
+        # Classes, functions, interfaces, types
+        info.symbols = scan_symbols(data, TYPESCRIPT_SYMBOL_PATTERNS, file_path)
     
     return info
 
-def analyze_go_file(file_path: Path) -> FileInfo:
+def analyze_go_file(file_path: Path, store: Optional[ContentStore] = None) -> FileInfo:
     """Analyze Go file using regex patterns."""
     info = FileInfo(path=str(file_path), language="go")
-    content = file_path.read_text(errors="ignore")
-    
-    # Imports
-    for match in re.finditer(r'import\s+"([^"]+)"', content):
-        info.imports.append(match.group(1))
-    for match in re.finditer(r'import\s+\((.*?)\)', content, re.DOTALL):
-        for line in match.group(1).split("\n"):
-            if '"' in line:
-                pkg = re.search(r'"([^"]+)"', line)
-                if pkg:
-                    info.imports.append(pkg.group(1))
-    
-    # Functions
-    for match in re.finditer(r'func\s+(\w+)\s*\(', content):
-        line_num = content[:match.start()].count("\n") + 1
-        info.symbols.append(Symbol(
-            name=match.group(1),
-            kind="function",
-            file=str(file_path),
-            line=line_num,
-            end_line=line_num
-        ))
-    
-    # Methods
-    for match in re.finditer(r'func\s+\([^)]+\)\s+(\w+)\s*\(', content):
-        line_num = content[:match.start()].count("\n") + 1
-        info.symbols.append(Symbol(
-            name=match.group(1),
-            kind="method",
-            file=str(file_path),
-            line=line_num,
-            end_line=line_num
-        ))
-    
-    # Structs
-    for match in re.finditer(r'type\s+(\w+)\s+struct', content):
-        line_num = content[:match.start()].count("\n") + 1
-        info.symbols.append(Symbol(
-            name=match.group(1),
-            kind="struct",
-            file=str(file_path),
-            line=line_num,
-            end_line=line_num
-        ))
-    
-    # Interfaces
-    for match in re.finditer(r'type\s+(\w+)\s+interface', content):
-        line_num = content[:match.start()].count("\n") + 1
-        info.symbols.append(Symbol(
-            name=match.group(1),
-            kind="interface",
-            file=str(file_path),
-            line=line_num,
-            end_line=line_num
-        ))
+    with (store or ContentStore()).lease(file_path) as data:
+        # Imports
+        for match in re.finditer(rb'import\s+"([^"]+)"', data):
+            info.imports.append(match.group(1).decode(errors="ignore"))
+        for match in re.finditer(rb'import\s+\((.*?)\)', data, re.DOTALL):
+            for pkg in re.finditer(rb'"([^"]+)"', match.group(1)):
+                info.imports.append(pkg.group(1).decode(errors="ignore"))
+        
+        # Functions, methods, structs, interfaces
+        info.symbols = scan_symbols(data, GO_SYMBOL_PATTERNS, file_path)
     
     return info
 
-# ============================================================================
-# Main Analyzer
-# ============================================================================
+# Brace languages: a small lexer drops comments, strings and preprocessor
+# lines, then declaration headers (the tokens since the last `;`, `{` or
+# `}`) are classified as each block opens, so symbols get real end lines.
 
-EXCLUDE_DIRS = {
-    "node_modules", "venv", ".venv", "__pycache__", ".git", 
-    "dist", "build", ".next", "target", "vendor", ".idea", ".vscode"
+BRACE_LEXERS = {
+    "rust": re.compile(rb"""
+        (?P<skip>//[^\n]*|/\*.*?\*/
+            |b?r(?P<hashes>\#*)".*?"(?P=hashes)
+            |b?"(?:\\.|[^"\\])*"
+            |b?'(?:\\(?:x[0-9a-fA-F]{2}|u\{[0-9a-fA-F]+\}|.)|[^'\\\n])')
+        |(?P<ident>[A-Za-z_]\w*)
+        |(?P<punct>::|->|\S)
+    """, re.VERBOSE | re.DOTALL),
+    "java": re.compile(rb"""
+        (?P<skip>//[^\n]*|/\*.*?\*/
+            |\"\"\".*?\"\"\"
+            |"(?:\\.|[^"\\\n])*"
+            |'(?:\\.|[^'\\\n])*')
+        |(?P<ident>[A-Za-z_$][\w$]*)
+        |(?P<punct>->|\S)
+    """, re.VERBOSE | re.DOTALL),
+    "cpp": re.compile(rb"""
+        (?P<skip>//[^\n]*|/\*.*?\*/
+            |^[ \t]*\#(?:\\\r?\n|[^\n])*
+            |(?:u8|[uUL])?R"(?P<delim>[^(\s]{0,16})\(.*?\)(?P=delim)"
+            |(?:u8|[uUL])?"(?:\\.|[^"\\\n])*"
+            |'(?:\\.|[^'\\\n])*')
+        |(?P<ident>[A-Za-z_]\w*)
+        |(?P<punct>::|->|\S)
+    """, re.VERBOSE | re.DOTALL | re.MULTILINE),
 }
 
-LANGUAGE_EXTENSIONS = {
-    "python": [".py"],
-    "typescript": [".ts", ".tsx"],
-    "javascript": [".js", ".jsx", ".mjs"],
-    "go": [".go"],
-    "rust": [".rs"],
-    "java": [".java"],
-    "cpp": [".cpp", ".hpp", ".c", ".h", ".cc", ".cxx"]
+BRACE_IMPORT_PATTERNS = {
+    "rust": re.compile(rb"^\s*(?:pub(?:\([^)]*\))?\s+)?use\s+([\w:]+)", re.MULTILINE),
+    "java": re.compile(rb"^\s*import\s+(?:static\s+)?([\w.]+(?:\.\*)?)\s*;", re.MULTILINE),
+    "cpp": re.compile(rb'^\s*#\s*include\s*[<"]([^>"]+)[>"]', re.MULTILINE),
 }
 
-def find_source_files(root: Path, language: str) -> list[Path]:
-    """Find all source files for the given language."""
-    extensions = LANGUAGE_EXTENSIONS.get(language, [])
-    if language == "typescript":
-        extensions = LANGUAGE_EXTENSIONS["typescript"] + LANGUAGE_EXTENSIONS["javascript"]
+# Symbol kinds whose bodies hold further declarations
+BRACE_CONTAINERS = {
+    "rust": {"module", "object", "interface"},
+    "java": {"class", "interface", "enum"},
+    "cpp": {"namespace", "class", "struct"},
+}
+
+RUST_ITEM_KINDS = {
+    b"fn": "function", b"struct": "struct", b"enum": "enum", b"union": "struct",
+    b"trait": "interface", b"mod": "module", b"type": "type", b"impl": "object"
+}
+JAVA_TYPE_KINDS = {b"class": "class", b"interface": "interface", b"enum": "enum", b"record": "class"}
+CPP_TYPE_KINDS = {b"class": "class", b"struct": "struct", b"union": "struct", b"enum": "enum"}
+NOT_CALLABLE = {
+    b"if", b"for", b"while", b"switch", b"catch", b"return", b"sizeof", b"synchronized",
+    b"new", b"throw", b"do", b"else", b"try", b"alignof", b"decltype", b"static_assert"
+}
+
+# Header classification results besides a (kind, name, offset) declaration
+OPAQUE, TRANSPARENT, BRACE_INIT = "opaque", "transparent", "init"
+
+def is_ident(token: bytes) -> bool:
+    return token[:1].isalpha() or token[:1] in (b"_", b"$")
+
+def skip_balanced(header: list, i: int, open_tok: bytes, close_tok: bytes) -> int:
+    """Index just past the group opening at header[i]."""
+    depth = 0
+    while i < len(header):
+        if header[i][0] == open_tok:
+            depth += 1
+        elif header[i][0] == close_tok:
+            depth -= 1
+            if depth == 0:
+                return i + 1
+        i += 1
+    return i
+
+def strip_attributes(header: list) -> list:
+    """Drop `#[...]`, `@Annotation(...)` and `[[...]]` attribute tokens."""
+    stripped = []
+    i = 0
+    while i < len(header):
+        token = header[i][0]
+        following = header[i + 1][0] if i + 1 < len(header) else b""
+        if token == b"#" and following in (b"[", b"!"):
+            i = skip_balanced(header, i + (following == b"!") + 1, b"[", b"]")
+        elif token == b"@" and following != b"interface" and is_ident(following):
+            i += 2
+            while i + 1 < len(header) and header[i][0] == b"." and is_ident(header[i + 1][0]):
+                i += 2
+            if i < len(header) and header[i][0] == b"(":
+                i = skip_balanced(header, i, b"(", b")")
+        elif token == b"[" and following == b"[":
+            i = skip_balanced(header, i, b"[", b"]")
+        else:
+            stripped.append(header[i])
+            i += 1
+    return stripped
+
+def merge_operators(header: list) -> list:
+    """Fold `operator` and its symbol (`==`, `()`, `[]`...) into one token."""
+    merged = []
+    i = 0
+    while i < len(header):
+        token, offset = header[i]
+        if token == b"operator":
+            j = i + 1
+            if j + 1 < len(header) and header[j][0] == b"(" and header[j + 1][0] == b")":
+                j += 2
+            while j < len(header) and header[j][0] != b"(":
+                j += 1
+            token = b"".join(t for t, _ in header[i:j])
+            i = j
+        else:
+            i += 1
+        merged.append((token, offset))
+    return merged
+
+def call_name(header: list) -> Optional[tuple]:
+    """(index, name, offset) of the name before the parameter list, if any.
     
-    files = []
-    for ext in extensions:
-        for f in root.rglob(f"*{ext}"):
-            if not any(ex in f.parts for ex in EXCLUDE_DIRS):
-                files.append(f)
-    return sorted(files)
+    Qualified (`Foo::bar`) and destructor (`~Foo`) names are kept whole.
+    """
+    header = merge_operators(header)
+    if b"(" not in (token for token, _ in header):
+        return None
+    i = [token for token, _ in header].index(b"(")
+    if not i or not is_ident(header[i - 1][0]) or header[i - 1][0] in NOT_CALLABLE:
+        return None
+    start = i - 1
+    while start and header[start - 1][0] in (b"::", b"~"):
+        start -= 1
+        if header[start][0] != b"::":
+            continue
+        if start and header[start - 1][0] == b">":
+            # Template arguments on a qualifier: Stack<int>::push
+            depth = 0
+            while start:
+                start -= 1
+                depth += (header[start][0] == b">") - (header[start][0] == b"<")
+                if not depth:
+                    break
+        if start and is_ident(header[start - 1][0]):
+            start -= 1
+    if any(token == b"=" for token, _ in header[:start]):
+        return None  # initializer or lambda, not a declaration
+    name = b"".join(token for token, _ in header[start:i])
+    return start, name, header[start][1]
 
-def find_entry_points(root: Path, language: str) -> list[str]:
-    """Identify likely entry points."""
-    entry_patterns = {
-        "python": ["main.py", "app.py", "__main__.py", "cli.py", "manage.py"],
-        "typescript": ["index.ts", "main.ts", "app.ts", "server.ts", "index.tsx", "App.tsx"],
-        "javascript": ["index.js", "main.js", "app.js", "server.js", "index.jsx", "App.jsx"],
-        "go": ["main.go", "cmd/main.go"],
-        "rust": ["main.rs", "lib.rs"],
-        "java": ["Main.java", "Application.java"],
-        "cpp": ["main.cpp", "main.c"]
-    }
+def classify_rust(header: list, parent: Optional[Symbol], terminator: bytes):
+    header = strip_attributes(header)
+    if len(header) > 1 and header[1][0] == b"!":
+        # Macro invocation, or a macro_rules! definition
+        if header[0][0] == b"macro_rules" and len(header) > 2 and is_ident(header[2][0]):
+            return "macro", header[2][0].decode(), header[2][1]
+        return OPAQUE
+    for i, (token, offset) in enumerate(header):
+        if token == b"=":
+            return OPAQUE
+        kind = RUST_ITEM_KINDS.get(token)
+        if not kind:
+            continue
+        if token == b"impl":
+            return rust_impl_name(header[i + 1:], offset)
+        if i + 1 < len(header) and is_ident(header[i + 1][0]):
+            if kind == "function" and parent and parent.kind in ("object", "interface"):
+                kind = "method"
+            return kind, header[i + 1][0].decode(), header[i + 1][1]
+        return OPAQUE
+    if header and header[0][0] == b"extern":
+        return TRANSPARENT
+    return OPAQUE
+
+def rust_impl_name(rest: list, offset: int):
+    """`impl<T> Trait for Type<T>` is named like rust-analyzer does."""
+    if rest and rest[0][0] == b"<":
+        rest = rest[skip_balanced(rest, 0, b"<", b">"):]
+    name = b""
+    depth = 0
+    for token, _ in rest:
+        if token == b"where" and not depth:
+            break
+        depth += (token == b"<") - (token == b">")
+        if token == b"for" and not depth:
+            name += b" for "
+        elif token == b",":
+            name += b", "
+        else:
+            name += b" " + token if is_ident(token) and is_ident(name[-1:]) else token
+    return "object", "impl " + name.decode(errors="ignore"), offset
+
+def classify_java(header: list, parent: Optional[Symbol], terminator: bytes):
+    header = strip_attributes(header)
+    for i, (token, offset) in enumerate(header):
+        if token == b"=":
+            return OPAQUE
+        kind = JAVA_TYPE_KINDS.get(token)
+        if token == b"interface" and i and header[i - 1][0] == b"@":
+            kind = "interface"
+        if kind and i + 1 < len(header) and is_ident(header[i + 1][0]) and (
+                not i or header[i - 1][0] != b"."):
+            return kind, header[i + 1][0].decode(), header[i + 1][1]
+    if not parent or parent.kind not in BRACE_CONTAINERS["java"]:
+        return OPAQUE
+    found = call_name(header)
+    # Declarations need a return type or modifier: bare `NAME(...)` is an enum constant
+    if not found or (terminator == b";" and not found[0]):
+        return OPAQUE
+    name = found[1].decode(errors="ignore")
+    return ("constructor" if name == parent.name else "method"), name, found[2]
+
+def classify_cpp(header: list, parent: Optional[Symbol], terminator: bytes):
+    header = strip_attributes(header)
+    while len(header) > 1 and header[0][0] in (b"public", b"private", b"protected") \
+            and header[1][0] == b":":
+        header = header[2:]
+    if header and header[0][0] == b"template":
+        header = header[skip_balanced(header, 1, b"<", b">"):]
+    if not header:
+        return OPAQUE
     
-    patterns = entry_patterns.get(language, [])
-    entries = []
+    first = header[0][0]
+    if first in (b"namespace", b"inline") and terminator == b"{":
+        names = [token for token, _ in header if is_ident(token) and token not in (b"namespace", b"inline")]
+        if not names:
+            return TRANSPARENT
+        return "namespace", "::".join(name.decode() for name in names), header[-1][1]
+    if first == b"extern" and len(header) == 1:
+        return TRANSPARENT
     
-    for pattern in patterns:
-        for f in root.rglob(pattern):
-            if not any(ex in f.parts for ex in EXCLUDE_DIRS):
-                entries.append(str(f.relative_to(root)))
+    tokens = [token for token, _ in header]
+    if b"(" not in tokens and terminator == b"{":
+        for i, token in enumerate(tokens):
+            kind = CPP_TYPE_KINDS.get(token)
+            if kind:
+                j = i + 1
+                if j < len(tokens) and tokens[j] in (b"class", b"struct"):
+                    j += 1  # enum class
+                if j < len(tokens) and is_ident(tokens[j]) and tokens[j] not in (b"final", b"alignas"):
+                    return kind, tokens[j].decode(), header[j][1]
+                return OPAQUE
+        return OPAQUE
     
-    return entries
+    # Constructor initializer lists may hold `member{value}` brace groups
+    close = tokens.index(b")") if b")" in tokens else -1
+    if terminator == b"{" and close >= 0 and b":" in tokens[close:] and is_ident(tokens[-1]):
+        return BRACE_INIT
+    
+    found = call_name(header)
+    in_class = parent is not None and parent.kind in ("class", "struct")
+    # Outside classes a bare `NAME(...);` is a macro or call, not a prototype
+    if not found or (terminator == b";" and not found[0] and not in_class):
+        return OPAQUE
+    name = found[1].decode(errors="ignore")
+    kind = "method" if in_class or "::" in name else "function"
+    if in_class and name in (parent.name, "~" + parent.name):
+        kind = "constructor" if name == parent.name else "method"
+    return kind, name, found[2]
 
-def get_lsp_command(server: str) -> list[str]:
-    """Get the command to start an LSP server."""
-    commands = {
-        "typescript-language-server": ["typescript-language-server", "--stdio"],
-        "pylsp": ["pylsp"],
-        "gopls": ["gopls", "serve"],
-        "rust-analyzer": ["rust-analyzer"],
-        "clangd": ["clangd"],
-        "jdtls": ["jdtls"]
-    }
-    return commands.get(server, [])
+BRACE_CLASSIFIERS = {"rust": classify_rust, "java": classify_java, "cpp": classify_cpp}
 
-def analyze_with_lsp(root: Path, language: str, server: str) -> list[FileInfo]:
-    """Analyze project using LSP server."""
-    cmd = get_lsp_command(server)
-    if not cmd:
-        return []
+def outline_braces(data, language: str, file_path: Path) -> list[Symbol]:
+    """Outline a brace-language buffer with real start and end lines.
     
-    client = LSPClient(cmd, root)
-    if not client.start():
-        print(f"[WARN] Could not start LSP server {server}, falling back to regex", file=sys.stderr)
-        return []
+    Only declaration scopes (modules, types, impls, namespaces) are
+    descended into; function bodies and initializers are skipped whole.
+    """
+    lexer = BRACE_LEXERS[language]
+    classify = BRACE_CLASSIFIERS[language]
+    containers = BRACE_CONTAINERS[language]
+    lines = LineIndex(data)
     
-    files = []
-    try:
-        source_files = find_source_files(root, language)
-        for file_path in source_files:
-            info = FileInfo(path=str(file_path.relative_to(root)), language=language)
-            
-            # Open file
-            client.open_file(file_path, language)
-            time.sleep(0.1)  # Give server time to process
-            
-            # Get symbols
-            symbols = client.get_document_symbols(file_path)
-            for sym in symbols:
-                info.symbols.append(lsp_symbol_to_symbol(sym, file_path))
-            
-            files.append(info)
-            
-    finally:
-        client.stop()
+    def declare(decl, end_offset) -> Symbol:
+        kind, name, offset = decl
+        sym = Symbol(name=name, kind=kind, file=str(file_path),
+                     line=lines.line_of(offset), end_line=lines.line_of(end_offset),
+                     column=lines.column_of(offset))
+        target.append(sym)
+        return sym
     
-    return files
-
-def lsp_symbol_to_symbol(lsp_sym: dict, file_path: Path) -> Symbol:
-    """Convert LSP symbol to our Symbol dataclass."""
-    kind_map = {
-        1: "file", 2: "module", 3: "namespace", 4: "package",
-        5: "class", 6: "method", 7: "property", 8: "field",
-        9: "constructor", 10: "enum", 11: "interface", 12: "function",
-        13: "variable", 14: "constant", 15: "string", 16: "number",
-        17: "boolean", 18: "array", 19: "object", 20: "key",
-        21: "null", 22: "enummember", 23: "struct", 24: "event",
-        25: "operator", 26: "typeparameter"
-    }
+    symbols = []
+    # Open blocks: (symbol, children list or None when opaque, enclosing
+    # container, header to resume after a brace-init group)
+    stack = []
+    target, parent = symbols, None
+    header = []
     
-    range_info = lsp_sym.get("range", lsp_sym.get("location", {}).get("range", {}))
-    start = range_info.get("start", {})
-    end = range_info.get("end", {})
+    for match in lexer.finditer(data):
+        group = match.lastgroup
+        if group == "skip" or group in ("hashes", "delim"):
+            continue
+        token = match.group()
+        offset = match.start()
+        
+        if token == b"{":
+            decl = classify(header, parent, token) if target is not None else OPAQUE
+            if decl == BRACE_INIT:
+                stack.append((None, None, (target, parent), header + [(b"}", offset)]))
+                target = None
+            elif decl == TRANSPARENT:
+                stack.append((None, target, (target, parent), None))
+            elif decl == OPAQUE or decl is None:
+                stack.append((None, None, (target, parent), None))
+                target = None
+            else:
+                sym = declare(decl, offset)
+                children = sym.children if sym.kind in containers else None
+                stack.append((sym, children, (target, parent), None))
+                target, parent = children, (sym if children is not None else parent)
+            if decl != BRACE_INIT:
+                header = []
+        elif token == b"}":
+            if not stack:
+                header = []
+                continue
+            sym, _, (target, parent), resume = stack.pop()
+            if sym:
+                sym.end_line = lines.line_of(offset)
+            header = resume or []
+        elif token == b";":
+            if target is not None and header:
+                decl = classify(header, parent, token)
+                if isinstance(decl, tuple):
+                    declare(decl, offset)
+            header = []
+        else:
+            header.append((token, offset))
+    
+    return symbols
+
+def analyze_brace_file(file_path: Path, language: str,
+                       store: Optional[ContentStore] = None) -> FileInfo:
+    """Analyze a Rust, Java or C/C++ file with the brace outliner."""
+    info = FileInfo(path=str(file_path), language=language)
+    with (store or ContentStore()).lease(file_path) as data:
+        for match in BRACE_IMPORT_PATTERNS[language].finditer(data):
+            info.imports.append(match.group(1).decode(errors="ignore").rstrip(":"))
+        info.symbols = outline_braces(data, language, file_path)
+    
+    return info
+
+# ============================================================================
+# Ignore Rules
+# ============================================================================
+
+IGNORE_FILES = (".gitignore", ".agentignore")  # later files win within a directory
+
+def glob_to_regex(pattern: str) -> str:
+    """Translate one gitignore glob (without anchoring) into a regex."""
+    out = []
+    i, n = 0, len(pattern)
+    while i < n:
+        c = pattern[i]
+        if c == "*":
+            if pattern[i:i + 2] == "**":
+                i += 2
+                if pattern[i:i + 1] == "/":
+                    out.append("(?:.*/)?")  # "**/": zero or more directories
+                    i += 1
+                else:
+                    out.append(".*")
+                continue
+            out.append("[^/]*")
+        elif c == "?":
+            out.append("[^/]")
+        elif c == "[":
+            end = pattern.find("]", i + 2 if pattern[i + 1:i + 2] in ("!", "^") else i + 1)
+            if end == -1:
+                out.append(re.escape(c))
+            else:
+                body = pattern[i + 1:end].replace("\\", "\\\\")
+                if body[:1] in ("!", "^"):
+                    body = "^" + body[1:]
+                out.append(f"[{body}]")
+                i = end
+        elif c == "\\" and i + 1 < n:
+            i += 1
+            out.append(re.escape(pattern[i]))
+        else:
+            out.append(re.escape(c))
+        i += 1
+    return "".join(out)
+
+class IgnoreRules:
+    """Rules from the ignore files of one directory, compiled once.
+    
+    Consecutive rules of the same polarity are merged into a single
+    alternation, so matching costs one regex per run of rules rather than
+    one per rule. Runs are checked last-first: the last matching rule wins.
+    """
+    
+    def __init__(self, lines: list[str]):
+        runs = []  # [negated, any-path patterns, directory-only patterns]
+        for raw in lines:
+            line = raw.rstrip("\n")
+            if not line.endswith("\\ "):
+                line = line.rstrip()
+            if not line or line.startswith("#"):
+                continue
+            negated = line.startswith("!")
+            if negated or line.startswith(("\\!", "\\#")):
+                line = line[1:]
+            dir_only = line.endswith("/")
+            line = line.rstrip("/")
+            if not line:
+                continue
+            # A slash anywhere but the end anchors the pattern to this directory
+            anchored = "/" in line
+            regex = glob_to_regex(line.lstrip("/"))
+            if not anchored:
+                regex = "(?:.*/)?" + regex
+            if not runs or runs[-1][0] != negated:
+                runs.append([negated, [], []])
+            runs[-1][2 if dir_only else 1].append(regex)
+        
+        self.runs = [
+            (negated, self._compile(any_path), self._compile(dir_only))
+            for negated, any_path, dir_only in reversed(runs)
+        ]
+    
+    @staticmethod
+    def _compile(patterns: list[str]):
+        if not patterns:
+            return None
+        return re.compile("|".join(f"(?:{p})" for p in patterns), re.DOTALL)
+    
+    def match(self, rel_path: str, is_dir: bool) -> Optional[bool]:
+        """True if ignored, False if re-included, None if no rule applies."""
+        for negated, any_path, dir_only in self.runs:
+            if (any_path and any_path.fullmatch(rel_path)) or \
+                    (is_dir and dir_only and dir_only.fullmatch(rel_path)):
+                return not negated
+        return None
+
+class IgnoreMatcher:
+    """Hierarchical .gitignore/.agentignore matcher for one project root.
+    
+    Rules are loaded per directory as the walk reaches it; rules from
+    deeper directories take precedence, as in git. A path is only tested
+    against its own rules: callers prune ignored directories, so nothing
+    below them is ever visited.
+    """
+    
+    def __init__(self, root: Path):
+        self.root = root
+        self.levels = {}  # relative directory ("" for root) -> IgnoreRules
+        self.loaded = set()  # directories whose ignore files were read on demand
+    
+    def load_dir(self, rel_dir: str, filenames):
+        """Compile the ignore files present in a directory, if any."""
+        lines = []
+        for name in IGNORE_FILES:
+            if name in filenames:
+                try:
+                    lines.extend((self.root / rel_dir / name).read_text(errors="ignore").splitlines())
+                except OSError:
+                    continue
+        if lines:
+            rules = IgnoreRules(lines)
+            if rules.runs:
+                self.levels[rel_dir] = rules
+    
+    def is_ignored(self, rel_path: str, is_dir: bool = False) -> bool:
+        if not self.levels:
+            return False
+        parts = rel_path.split("/")
+        for depth in range(len(parts) - 1, -1, -1):
+            rules = self.levels.get("/".join(parts[:depth]))
+            if rules:
+                decision = rules.match("/".join(parts[depth:]), is_dir)
+                if decision is not None:
+                    return decision
+        return False
+
+# ============================================================================
+# File Classification
+# ============================================================================
+
+CLASSIFY_HEAD_BYTES = 8192
+MINIFIED_MEAN_LINE = 250  # bytes per line in the head
+# Generator banners, matched at the start of a comment line
+GENERATED_BANNER = re.compile(
+    rb"@generated\b"
+    rb"|Code generated .*DO NOT EDIT\."
+    rb"|Generated by the protocol buffer compiler\."
+)
+COMMENT_START = re.compile(rb"\s*(?:#|//+|/\*+|\*+|--|;+)\s*")
+
+def generated_banner(head: bytes) -> bool:
+    """Whether the leading comment block carries a generator banner.
+    
+    Only comment lines before the first line of code are read, so a
+    docstring or comment merely mentioning "do not edit" does not count.
+    """
+    in_block = False
+    for line in head[:2048].split(b"\n"):
+        if in_block:
+            text = line.lstrip(b" \t*")
+            in_block = b"*/" not in line
+        elif not line.strip():
+            continue
+        else:
+            match = COMMENT_START.match(line)
+            if not match:
+                return False
+            text = line[match.end():]
+            in_block = line.lstrip().startswith(b"/*") and b"*/" not in line
+        if GENERATED_BANNER.match(text):
+            return True
+    return False
+
+def classify_file(file_path: Path, max_size: int, store: ContentStore) -> str:
+    """Classify a file from its size and first few KB.
+    
+    Returns "" for ordinary source, otherwise "generated", "minified"
+    or "oversized".
+    """
+    try:
+        size = file_path.stat().st_size
+        head = store.head(file_path, CLASSIFY_HEAD_BYTES)
+    except OSError:
+        return ""
+    
+    # Generators announce themselves in the leading comment
+    if generated_banner(head):
+        return "generated"
+    
+    # Minified code packs everything into a few very long lines
+    if ".min." in file_path.name:
+        return "minified"
+    lines = head.count(b"\n")
+    if size > CLASSIFY_HEAD_BYTES and (lines < 2 or len(head) / lines > MINIFIED_MEAN_LINE):
+        return "minified"
+    
+    if size > max_size:
+        return "oversized"
+    return ""
+
+OUTLINE_CHUNK = 64 * 1024  # longest line fragment held in memory
+OUTLINE_KINDS = {
+    "class": "class", "def": "function", "fn": "function", "func": "function",
+    "function": "function", "interface": "interface", "type": "type",
+    "struct": "struct", "enum": "enum", "trait": "interface", "mod": "module",
+    "record": "class", "union": "struct"
+}
+OUTLINE_PATTERNS = {
+    "python": [
+        re.compile(rb"^(?:async\s+)?(?P<kw>class|def)\s+(?P<name>\w+)"),
+        re.compile(rb"^(?P<indent>\s+)(?:async\s+)?(?P<kw>def)\s+(?P<name>\w+)"),
+    ],
+    "typescript": [
+        re.compile(rb"^(?:export\s+)?(?:default\s+)?(?:abstract\s+|declare\s+)?"
+                   rb"(?P<kw>class|interface|function|type|enum)\s+(?P<name>\w+)"),
+    ],
+    "go": [
+        re.compile(rb"^(?P<kw>func)\s+(?:\([^)]*\)\s*)?(?P<name>\w+)"),
+        re.compile(rb"^type\s+(?P<name>\w+)\s+(?P<kw>struct|interface)"),
+    ],
+    "rust": [
+        re.compile(rb"^(?:pub(?:\([^)]*\))?\s+)?(?P<kw>fn|struct|enum|trait|mod|type)\s+(?P<name>\w+)"),
+    ],
+    # Patterns without a `kw` group match functions: methods when indented
+    "java": [
+        re.compile(rb"^(?:(?:public|protected|private|abstract|final|static|sealed|non-sealed|strictfp)\s+)*"
+                   rb"@?(?P<kw>class|interface|enum|record)\s+(?P<name>[\w$]+)"),
+        re.compile(rb"^(?P<indent>[ \t]+)(?!(?:return|new|throw|else|yield|case|assert)\b)"
+                   rb"(?:(?:public|protected|private|abstract|final|static|synchronized|native|default|strictfp)\s+)*"
+                   rb"(?:<[^>]*>\s*)?[\w.$]+(?:<[^()]*>)?(?:\[\])*\s+(?P<name>[\w$]+)\s*\("),
+        re.compile(rb"^(?P<indent>[ \t]+)(?:public|protected|private)\s+(?P<name>[A-Z][\w$]*)\s*\("),
+    ],
+    "cpp": [
+        re.compile(rb"^(?:typedef\s+)?(?:template\s*<[^>]*>\s*)?(?P<kw>class|struct|union|enum)"
+                   rb"(?:\s+(?:class|struct))?\s+(?P<name>\w+)(?=\s*(?:final\b\s*)?(?:[:{]|$))"),
+        # Definitions only: a `;` on the line marks a prototype or a call
+        re.compile(rb"^(?!(?:typedef|return|else|using)\b)(?:template\s*<[^>]*>\s*)?[\w:<>,*&~ ]*?\w[\w:<>,]*"
+                   rb"[\s*&]+(?P<name>~?\w+(?:::~?\w+)*)\s*\([^;]*$"),
+        # Out-of-class constructors and destructors have no return type
+        re.compile(rb"^(?P<name>\w+(?:<[^;()]*>)?(?:::~?\w+)+)\s*\([^;]*$"),
+    ],
+}
+OUTLINE_PATTERNS["javascript"] = OUTLINE_PATTERNS["typescript"]
+
+def outline_scan_chunked(file_path: Path, language: str) -> list[Symbol]:
+    """Outline top-level definitions by streaming the file line by line.
+    
+    Memory stays constant whatever the file size: lines longer than
+    OUTLINE_CHUNK are consumed in pieces and only line starts are matched.
+    A top-level symbol ends where the next one starts.
+    """
+    patterns = OUTLINE_PATTERNS.get(language, [])
+    symbols = []
+    line_num = 0
+    mid_line = False
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.readline(OUTLINE_CHUNK), b""):
+            if not mid_line:
+                line_num += 1
+                for pattern in patterns:
+                    match = pattern.match(chunk)
+                    if not match:
+                        continue
+                    name = match.group("name").decode(errors="ignore")
+                    if "kw" in pattern.groupindex:
+                        kind = OUTLINE_KINDS.get(match.group("kw").decode(), "unknown")
+                    else:
+                        kind = "method" if "::" in name else "function"
+                    sym = Symbol(name=name, kind=kind, file=str(file_path), line=line_num, end_line=line_num)
+                    if "indent" in pattern.groupindex:
+                        # Indented def: a method of the enclosing type, if any
+                        if symbols and symbols[-1].kind in ("class", "interface", "enum"):
+                            sym.kind = "constructor" if name == symbols[-1].name else "method"
+                            symbols[-1].children.append(sym)
+                    else:
+                        symbols.append(sym)
+                    break
+            mid_line = not chunk.endswith(b"\n")
+    
+    for sym, following in zip(symbols, symbols[1:]):
+        sym.end_line = max(sym.line, following.line - 1)
+    if symbols:
+        symbols[-1].end_line = line_num
+    return symbols
+
+def analyze_classified_file(root: Path, file_path: Path, reason: str) -> FileInfo:
+    """FileInfo for a file the classifier routed away from full analysis."""
+    language = language_for_path(file_path)
+    info = FileInfo(path=str(file_path.relative_to(root)), language=language, skipped=reason)
+    if reason == "oversized":
+        info.symbols = outline_scan_chunked(file_path, language)
+    return info
+
+# ============================================================================
+# LSP Enrichment
+# ============================================================================
+
+HOVER_KINDS = {
+    "class", "interface", "struct", "enum", "function", "method",
+    "constructor", "type", "module", "namespace"
+}
+
+def default_cache_dir() -> Path:
+    """User-level cache directory shared by all runs."""
+    base = os.environ.get("XDG_CACHE_HOME") or str(Path.home() / ".cache")
+    return Path(base) / "wiki-generator-lsp"
+
+def project_cache_dir(root: Path, cache_dir: Optional[str]) -> Optional[Path]:
+    """Per-project cache directory, or None when caching is disabled."""
+    if cache_dir is None:
+        return None
+    base = Path(cache_dir) if cache_dir else default_cache_dir()
+    digest = hashlib.sha1(str(root).encode()).hexdigest()[:12]
+    return base / f"{root.name}-{digest}"
+
+class HoverCache:
+    """Persistent hover responses keyed by file hash and position.
+    
+    Only entries looked up during the current run are written back, so
+    responses for edited or deleted files drop out on the next save.
+    """
+    
+    def __init__(self, path: Optional[Path]):
+        self.path = path
+        self.entries = {}
+        self.used = {}
+        if path and path.exists():
+            try:
+                self.entries = json.loads(path.read_text())
+            except (OSError, ValueError):
+                self.entries = {}
+    
+    @staticmethod
+    def key(file_hash: str, line: int, char: int) -> str:
+        return f"{file_hash}:{line}:{char}"
+    
+    def get(self, key: str) -> Optional[str]:
+        value = self.entries.get(key)
+        if value is not None:
+            self.used[key] = value
+        return value
+    
+    def put(self, key: str, value: str):
+        self.entries[key] = value
+        self.used[key] = value
+    
+    def save(self):
+        """Atomically write the entries used by this run."""
+        if not self.path:
+            return
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.path.with_suffix(".tmp")
+            tmp.write_text(json.dumps(self.used))
+            tmp.replace(self.path)
+        except OSError as e:
+            status(f"[WARN] Could not save hover cache: {e}")
+
+def split_hover(text: str) -> tuple[str, str]:
+    """Split hover markdown into a signature and its documentation."""
+    match = re.search(r"```[\w+-]*\n(.*?)```", text, re.DOTALL)
+    if not match:
+        return "", text.strip()
+    detail = match.group(1).strip()
+    doc = text[:match.start()] + text[match.end():]
+    doc = re.sub(r"^\s*-{3,}\s*$", "", doc, flags=re.MULTILINE).strip()
+    return detail, doc
+
+def apply_hover(sym: Symbol, text: str):
+    """Store hover signature and docs on a symbol."""
+    detail, doc = split_hover(text)
+    if detail:
+        sym.detail = detail
+    if doc and not sym.docstring:
+        sym.docstring = doc
+
+def entry_point_names(root: Path, entry_points: list[str], store: ContentStore) -> set[str]:
+    """Identifiers mentioned in entry point files."""
+    names = set()
+    for entry in entry_points:
+        try:
+            text = store.text(root / entry)
+        except OSError:
+            continue
+        names.update(IDENTIFIER_RE.findall(text))
+    return names
+
+def iter_symbols(symbols: list, depth: int = 0):
+    """Yield (symbol, depth) for a symbol tree, parents first."""
+    for sym in symbols:
+        yield sym, depth
+        yield from iter_symbols(sym.children, depth + 1)
+
+def enrichment_order(files: list[FileInfo], entry_names: set[str]) -> list[Symbol]:
+    """Symbols worth enriching, most valuable first.
+    
+    Public before private, top-level before nested, names used by entry
+    points before the rest; ties break on path and line so the order is
+    stable across runs.
+    """
+    ranked = []
+    for info in files:
+        for sym, depth in iter_symbols(info.symbols):
+            if sym.kind not in HOVER_KINDS:
+                continue
+            key = (
+                sym.name.startswith("_"),
+                depth > 0,
+                sym.name not in entry_names,
+                depth, info.path, sym.line
+            )
+            ranked.append((key, sym))
+    ranked.sort(key=lambda item: item[0])
+    return [sym for _, sym in ranked]
+
+def run_within_budget(jobs: list, request, deadline: float, workers: int, on_result) -> list:
+    """Run request(job) concurrently, in job order, until the deadline.
+    
+    on_result(job, result) is called on the calling thread as jobs
+    complete. Returns the jobs that did not finish in time, in order.
+    """
+    if not jobs:
+        return []
+    executor = ThreadPoolExecutor(max_workers=max(1, workers))
+    futures = {executor.submit(request, job): job for job in jobs}
+    pending = set(futures)
+    try:
+        while pending:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+            for future in done:
+                on_result(futures[future], future.result())
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+    return [job for future, job in futures.items() if future in pending]
+
+def enrich_with_hover(client: LSPClient, files: list[FileInfo], file_hashes: dict,
+                      entry_names: set[str], options: AnalysisOptions,
+                      cache: HoverCache) -> dict:
+    """Fill Symbol.detail/docstring from hover within the time budget.
+    
+    Cached responses are applied first; the misses are requested
+    concurrently in priority order until the budget runs out.
+    """
+    deadline = time.monotonic() + options.hover_budget
+    stats = {"cached": 0, "requested": 0, "skipped": 0}
+    
+    todo = []
+    for sym in enrichment_order(files, entry_names):
+        file_hash = file_hashes.get(sym.file)
+        if not file_hash:
+            continue
+        key = HoverCache.key(file_hash, sym.line - 1, sym.column)
+        cached = cache.get(key)
+        if cached is not None:
+            apply_hover(sym, cached)
+            stats["cached"] += 1
+        else:
+            todo.append((key, sym))
+    
+    def request(job):
+        _, sym = job
+        return client.get_hover(Path(sym.file), sym.line - 1, sym.column)
+    
+    def on_result(job, text):
+        key, sym = job
+        stats["requested"] += 1
+        if text is not None:
+            cache.put(key, text)
+            apply_hover(sym, text)
+    
+    skipped = run_within_budget(todo, request, deadline, options.lsp_workers, on_result)
+    stats["skipped"] = len(skipped)
+    return stats
+
+MAX_STORED_REFERENCES = 20
+IDENTIFIER_RE = re.compile(r"[A-Za-z_]\w*")
+IDENTIFIER_BYTES_RE = re.compile(rb"[A-Za-z_]\w*")
+
+def key_name(key: str) -> str:
+    """Symbol name of a `path:Class.method` key."""
+    return key.rsplit(":", 1)[1].split("@")[0].rsplit(".", 1)[-1]
+
+def reference_keys(files: list[FileInfo]) -> dict:
+    """Stable key per symbol: `path:Class.method`, plus `@line` for repeats."""
+    keys = {}
+    seen = set()
+    for info in files:
+        for key, sym in iter_keyed_symbols(info):
+            if key in seen:
+                key = f"{key}@{sym.line}"
+            seen.add(key)
+            keys[id(sym)] = key
+    return keys
+
+def estimate_reference_counts(root: Path, files: list[FileInfo], leftover: list,
+                              exact: dict, last_known: dict, store: ContentStore):
+    """Estimate reference counts for symbols the budget did not cover.
+    
+    A count from a previous run is reused when available, which keeps
+    rankings stable. Otherwise the name's textual occurrences are scaled
+    by the exact/textual ratio observed on the symbols that were counted.
+    """
+    names = {sym.name for _, sym in leftover} | {key_name(key) for key in exact}
+    textual = {}
+    for info in files:
+        try:
+            with store.lease(root / info.path) as data:
+                found = IDENTIFIER_BYTES_RE.findall(data)
+        except OSError:
+            continue
+        for name in found:
+            name = name.decode()
+            if name in names:
+                textual[name] = textual.get(name, 0) + 1
+    
+    # Each textual count includes the definition itself
+    observed = sum(exact.values())
+    occurrences = sum(max(textual.get(key_name(key), 0) - 1, 0) for key in exact)
+    ratio = observed / occurrences if observed and occurrences else 1.0
+    
+    for key, sym in leftover:
+        if key in last_known:
+            sym.reference_count = last_known[key]
+        else:
+            sym.reference_count = round(max(textual.get(sym.name, 0) - 1, 0) * ratio)
+        sym.references_estimated = True
+
+def harvest_references(client: LSPClient, root: Path, files: list[FileInfo], file_hashes: dict,
+                       entry_names: set[str], options: AnalysisOptions,
+                       cache_path: Optional[Path], store: ContentStore,
+                       fingerprint: Optional[str] = None, merge: bool = False) -> dict:
+    """Fill Symbol.reference_count from LSP references within the time budget.
+    
+    Counts are exact when the server answered in time. When no file has
+    changed since the cached run its exact counts are reused as-is;
+    symbols left over when the budget expires, or whose request timed
+    out or failed, get estimated counts. A batch of a larger language
+    passes the language-wide fingerprint and merges into the cache
+    instead of replacing it.
+    """
+    deadline = time.monotonic() + options.reference_budget
+    if fingerprint is None:
+        fingerprint = hashlib.sha1("".join(sorted(file_hashes.values())).encode()).hexdigest()
+    stats = {"exact": 0, "cached": 0, "estimated": 0}
+    
+    previous = {}
+    if cache_path and cache_path.exists():
+        try:
+            previous = json.loads(cache_path.read_text())
+        except (OSError, ValueError):
+            previous = {}
+    reusable = previous.get("exact", {}) if previous.get("fingerprint") == fingerprint else {}
+    
+    keys = reference_keys(files)
+    exact = {}
+    todo = []
+    for sym in enrichment_order(files, entry_names):
+        key = keys[id(sym)]
+        if key in reusable:
+            sym.reference_count = reusable[key]
+            exact[key] = reusable[key]
+            stats["cached"] += 1
+        else:
+            todo.append((key, sym))
+    
+    def request(job):
+        _, sym = job
+        return client.get_references(Path(sym.file), sym.line - 1, sym.column)
+    
+    failed = []
+    
+    def on_result(job, locations):
+        key, sym = job
+        if locations is None:
+            failed.append(job)
+            return
+        sym.reference_count = len(locations)
+        sym.references = [
+            f"{loc.get('uri', '').replace(f'file://{root}/', '')}:"
+            f"{loc.get('range', {}).get('start', {}).get('line', 0) + 1}"
+            for loc in locations[:MAX_STORED_REFERENCES]
+        ]
+        exact[key] = sym.reference_count
+        stats["exact"] += 1
+    
+    leftover = run_within_budget(todo, request, deadline, options.lsp_workers, on_result) + failed
+    if leftover:
+        estimate_reference_counts(root, files, leftover, exact, previous.get("last_known", {}), store)
+        stats["estimated"] = len(leftover)
+    
+    if cache_path:
+        wanted = {key for key, _ in todo} | set(exact)
+        last_known = {k: v for k, v in previous.get("last_known", {}).items() if merge or k in wanted}
+        last_known.update(exact)
+        if merge:
+            exact = {**reusable, **exact}
+        try:
+            cache_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = cache_path.with_suffix(".tmp")
+            tmp.write_text(json.dumps({"fingerprint": fingerprint, "exact": exact, "last_known": last_known}))
+            tmp.replace(cache_path)
+        except OSError as e:
+            status(f"[WARN] Could not save reference cache: {e}")
+    
+    return stats
+
+# ============================================================================
+# Checkpoint Journal
+# ============================================================================
+
+JOURNAL_VERSION = 1
+CHECKPOINT_INTERVAL = 5.0  # seconds between journal flushes
+
+class CheckpointJournal:
+    """Append-only JSONL journal of finished FileInfo records.
+    
+    Records are buffered and flushed to disk every CHECKPOINT_INTERVAL
+    seconds, so an interrupted run loses at most that much work. With
+    resume, records whose file hash still matches are handed back instead
+    of re-analyzing the file; a torn final line from a crash is ignored.
+    The first line fingerprints the settings, and a journal written
+    under other settings is discarded.
+    """
+    
+    def __init__(self, path: Optional[Path], fingerprint: str, resume: bool = False):
+        self.path = path
+        self.records = {}  # relative path -> (hash, FileInfo dict)
+        self.resumed = 0
+        self._buffer = []
+        self._last_flush = time.monotonic()
+        self._lock = threading.Lock()
+        self._file = None
+        self._valid_end = 0  # byte offset just past the last complete record
+        if not path:
+            return
+        header = {"version": JOURNAL_VERSION, "fingerprint": fingerprint}
+        if resume and path.exists():
+            self._load(header)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            self._file = open(path, "a" if self.records else "w")
+            if self.records:
+                # Drop a torn tail so new records start on a line of their own
+                self._file.truncate(self._valid_end)
+            else:
+                self._file.write(json.dumps(header) + "\n")
+                self._file.flush()
+        except OSError as e:
+            print(f"[WARN] Checkpointing disabled: {e}", file=sys.stderr)
+            self._file = None
+    
+    def _load(self, header: dict):
+        try:
+            with open(self.path, "rb") as f:
+                lines = iter(f)
+                first = next(lines, b"{}")
+                if json.loads(first) != header:
+                    print("[INFO] Checkpoint journal was written with other settings, starting over",
+                          file=sys.stderr)
+                    return
+                end = len(first)
+                for line in lines:
+                    if not line.endswith(b"\n"):
+                        break  # torn write at the moment of the crash
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        break
+                    self.records[entry["info"]["path"]] = (entry["hash"], entry["info"])
+                    end += len(line)
+                self._valid_end = end
+        except (OSError, ValueError, KeyError):
+            self.records = {}
+    
+    def lookup(self, rel_path: str, digest: str) -> Optional[FileInfo]:
+        """The journaled record for a file, if its content is unchanged."""
+        entry = self.records.get(rel_path)
+        if not entry or entry[0] != digest:
+            return None
+        with self._lock:
+            self.resumed += 1
+        return file_info_from_dict(entry[1])
+    
+    def record(self, info: FileInfo, digest: str):
+        """Queue a finished record; flushes when the interval has passed."""
+        if not self._file:
+            return
+        line = json.dumps({"hash": digest, "info": asdict(info)})
+        with self._lock:
+            self._buffer.append(line)
+            if time.monotonic() - self._last_flush >= CHECKPOINT_INTERVAL:
+                self._flush()
+    
+    def _flush(self):
+        if self._buffer and self._file:
+            self._file.write("\n".join(self._buffer) + "\n")
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._buffer = []
+        self._last_flush = time.monotonic()
+    
+    def complete(self):
+        """The run finished: the journal has nothing left to resume."""
+        with self._lock:
+            if self._file:
+                self._file.close()
+                self._file = None
+            if self.path:
+                try:
+                    self.path.unlink()
+                except OSError:
+                    pass
+    
+    def close(self):
+        """Flush what is buffered and keep the journal for --resume."""
+        with self._lock:
+            if self._file:
+                self._flush()
+                self._file.close()
+                self._file = None
+
+def open_journal(root: Path, use_lsp: bool, options: AnalysisOptions) -> CheckpointJournal:
+    """Checkpoint journal for this run, in the project's cache directory."""
+    cache_dir = project_cache_dir(root, options.cache_dir)
+    name = "journal.jsonl"
+    if options.shard:
+        name = f"journal-{options.shard[0]}-of-{options.shard[1]}.jsonl"
+    settings = {
+        "use_lsp": use_lsp, "mode": options.mode,
+        "max_file_size": options.max_file_size, "shard": options.shard, "outline": options.outline
+    }
+    fingerprint = hashlib.sha1(json.dumps(settings, sort_keys=True).encode()).hexdigest()
+    return CheckpointJournal(cache_dir / name if cache_dir else None, fingerprint, options.resume)
+
+# ============================================================================
+# Spill Store
+# ============================================================================
+
+# Shares of --max-memory; the rest is left for the interpreter, the call
+# graph, and the LSP batch being enriched
+SPILL_BUFFER_SHARE = 0.25  # serialized records held before writing a segment
+CONTENT_CACHE_SHARE = 0.25  # source bytes cached by the ContentStore
+LSP_BATCH_SHARE = 0.1  # source bytes of files enriched together on the LSP path
+
+def peak_rss() -> Optional[int]:
+    """Peak resident set size of this process in bytes, where known."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+class SpillStore:
+    """File records kept serialized, spilled to sorted on-disk segments.
+    
+    Records are held as compact JSON until `buffer_bytes` worth are
+    buffered, then written out as a segment sorted by path. Iteration
+    merges the segments and the buffer back in path order, decoding one
+    record at a time, so a consumer only ever holds the record it is on.
+    Segments live in a temporary directory removed with the store.
+    """
+    
+    def __init__(self, buffer_bytes: int):
+        self.buffer_bytes = max(buffer_bytes, 1)
+        self.segments = []
+        self.spilled = 0
+        self._buffer = []  # (path, json)
+        self._size = 0
+        self._count = 0
+        self._lock = threading.Lock()
+        self._dir = Path(tempfile.mkdtemp(prefix="wiki-generator-spill-"))
+        self._cleanup = weakref.finalize(self, shutil.rmtree, str(self._dir), True)
+    
+    def add(self, record: dict):
+        line = json.dumps(record, separators=(",", ":"))
+        with self._lock:
+            self._buffer.append((record["path"], line))
+            self._size += len(line)
+            self._count += 1
+            if self._size >= self.buffer_bytes:
+                self._spill()
+    
+    def _spill(self):
+        segment = self._dir / f"segment-{len(self.segments):05d}.jsonl"
+        self._buffer.sort(key=lambda item: item[0])
+        with open(segment, "w") as f:
+            for path, line in self._buffer:
+                f.write(json.dumps(path) + "\t" + line + "\n")
+        self.segments.append(segment)
+        self.spilled += len(self._buffer)
+        self._buffer = []
+        self._size = 0
+    
+    def __len__(self) -> int:
+        return self._count
+    
+    def __iter__(self):
+        """Records as dicts, in path order."""
+        with self._lock:
+            buffered = sorted(self._buffer, key=lambda item: item[0])
+            segments = list(self.segments)
+        streams = [self._read_segment(segment) for segment in segments] + [iter(buffered)]
+        for _, line in heapq.merge(*streams, key=lambda item: item[0]):
+            yield json.loads(line)
+    
+    @staticmethod
+    def _read_segment(segment: Path):
+        with open(segment) as f:
+            for line in f:
+                path, record = line.rstrip("\n").split("\t", 1)
+                yield json.loads(path), record
+    
+    def infos(self) -> "SpilledInfos":
+        """Re-iterable view decoding each record into a FileInfo."""
+        return SpilledInfos(self)
+    
+    def close(self):
+        self._cleanup()
+
+class SpilledInfos:
+    """FileInfo view over a SpillStore, for multi-pass consumers."""
+    
+    def __init__(self, store: SpillStore):
+        self.store = store
+    
+    def __iter__(self):
+        for record in self.store:
+            yield file_info_from_dict(record)
+
+def write_analysis(analysis: ProjectAnalysis, out):
+    """Write analysis JSON exactly as json.dumps(asdict(analysis), indent=2),
+    encoding file records one at a time so spilled records stream through."""
+    out.write("{")
+    for i, f in enumerate(fields(analysis)):
+        out.write(("," if i else "") + "\n  " + json.dumps(f.name) + ": ")
+        value = getattr(analysis, f.name)
+        if f.name != "files":
+            out.write(json.dumps(value, indent=2).replace("\n", "\n  "))
+            continue
+        count = 0
+        for record in value:
+            record = record if isinstance(record, dict) else asdict(record)
+            out.write(("," if count else "[") + "\n    " + json.dumps(record, indent=2).replace("\n", "\n    "))
+            count += 1
+        out.write("\n  ]" if count else "[]")
+    out.write("\n}")
+
+# ============================================================================
+# Progress Reporting
+# ============================================================================
+
+PROGRESS_TTY_INTERVAL = 1.0  # seconds between redraws of the status line
+PROGRESS_JSON_INTERVAL = 10.0  # seconds between JSON progress records
+PROGRESS_WINDOW = 30.0  # seconds of history behind the throughput figures
+SLOW_FILE_SECONDS = 5.0  # in-flight files older than this are reported
+
+def format_duration(seconds: float) -> str:
+    """H:MM:SS, or M:SS under an hour."""
+    minutes, secs = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02d}:{secs:02d}" if hours else f"{minutes}:{secs:02d}"
+
+class ProgressReporter:
+    """Live progress for a run: files done/total, throughput, ETA, the
+    slowest file in flight, LSP queue depth and each language's phase.
+    
+    Analyzers only bump counters under a lock (begin/done per file); a
+    background thread renders snapshots, as a refreshing status line on
+    a TTY or as JSON lines on stderr otherwise. JSON records appear only
+    once a run outlasts the first interval, so short runs stay quiet.
+    """
+    
+    def __init__(self, total: int, style: str):
+        self.total = total
+        self.style = style  # "tty" or "json"
+        self.done_files = 0
+        self.symbols = 0
+        self.in_flight = {}  # path -> monotonic start
+        self.phases = {}  # language -> current phase
+        self.clients = []
+        self.started = time.monotonic()
+        self.reports = 0
+        self._samples = [(self.started, 0, 0)]  # (time, files, symbols) per tick
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._stderr = None
+        self._line_shown = False
+        self._write_lock = threading.RLock()
+    
+    @classmethod
+    def create(cls, mode: str, total: int) -> Optional["ProgressReporter"]:
+        """Reporter for an options.progress mode; None when disabled."""
+        if mode == "off":
+            return None
+        if mode == "auto":
+            mode = "tty" if sys.stderr.isatty() else "json"
+        return cls(total, mode)
+    
+    def __enter__(self) -> "ProgressReporter":
+        global _status_line
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        if self.style == "tty":
+            # status() messages clear the line before printing
+            self._stderr = sys.stderr
+            _status_line = self
+        return self
+    
+    def __exit__(self, *exc):
+        global _status_line
+        try:
+            self._stop.set()
+            self._thread.join()
+        finally:
+            if _status_line is self:
+                _status_line = None
+            if self._stderr:
+                self._clear_line()
+        if self.style == "json" and self.reports:
+            self._write_json(self.snapshot(), final=True)
+        return False
+    
+    # Called by the analyzers
+    
+    def begin(self, path: str):
+        with self._lock:
+            self.in_flight[path] = time.monotonic()
+    
+    def done(self, info: FileInfo):
+        count = sum(1 for _ in iter_symbols(info.symbols))
+        with self._lock:
+            self.in_flight.pop(info.path, None)
+            self.done_files += 1
+            self.symbols += count
+    
+    def phase(self, language: str, name: str):
+        with self._lock:
+            self.phases[language] = name
+    
+    def watch(self, client: "LSPClient"):
+        """Count a client's unanswered requests in the queue depth."""
+        with self._lock:
+            self.clients.append(client)
+    
+    def unwatch(self, client: "LSPClient"):
+        with self._lock:
+            if client in self.clients:
+                self.clients.remove(client)
+    
+    # Rendering
+    
+    def snapshot(self) -> dict:
+        now = time.monotonic()
+        with self._lock:
+            done, symbols = self.done_files, self.symbols
+            slow = min(self.in_flight.items(), key=lambda item: item[1], default=None)
+            queue = sum(client.pending_count() for client in self.clients)
+            phases = dict(self.phases)
+            self._samples.append((now, done, symbols))
+            while len(self._samples) > 2 and now - self._samples[1][0] >= PROGRESS_WINDOW:
+                self._samples.pop(0)
+            then, done_then, symbols_then = self._samples[0]
+        window = now - then
+        files_rate = (done - done_then) / window if window > 0 else 0.0
+        remaining = max(self.total - done, 0)
+        snapshot = {
+            "elapsed": round(now - self.started, 1),
+            "files_done": done,
+            "files_total": self.total,
+            "files_per_sec": round(files_rate, 2),
+            "symbols_per_sec": round((symbols - symbols_then) / window, 1) if window > 0 else 0.0,
+            "eta_seconds": round(remaining / files_rate) if files_rate > 0 else None,
+            "lsp_queue": queue,
+            "slow_file": None,
+            "phases": phases
+        }
+        if slow and now - slow[1] >= SLOW_FILE_SECONDS:
+            snapshot["slow_file"] = {"path": slow[0], "seconds": round(now - slow[1], 1)}
+        return snapshot
+    
+    def _run(self):
+        interval = PROGRESS_TTY_INTERVAL if self.style == "tty" else PROGRESS_JSON_INTERVAL
+        while not self._stop.wait(interval):
+            snapshot = self.snapshot()
+            if self.style == "tty":
+                self._draw_line(snapshot)
+            else:
+                self._write_json(snapshot)
+    
+    def _write_json(self, snapshot: dict, final: bool = False):
+        self.reports += 1
+        record = {"event": "progress_done" if final else "progress", **snapshot}
+        print(json.dumps(record), file=sys.stderr, flush=True)
+    
+    def _draw_line(self, s: dict):
+        percent = f" ({s['files_done'] * 100 // s['files_total']}%)" if s["files_total"] else ""
+        parts = [
+            f"{s['files_done']}/{s['files_total']} files{percent}",
+            f"{s['files_per_sec']:.1f} files/s",
+            f"{s['symbols_per_sec']:.0f} symbols/s",
+            f"ETA {format_duration(s['eta_seconds'])}" if s["eta_seconds"] is not None else "ETA --"
+        ]
+        if s["lsp_queue"]:
+            parts.append(f"LSP queue {s['lsp_queue']}")
+        busy = {lang: name for lang, name in s["phases"].items() if name != "done"}
+        if busy:
+            parts.append(", ".join(f"{lang}: {name}" for lang, name in busy.items()))
+        if s["slow_file"]:
+            parts.append(f"slow: {s['slow_file']['path']} ({s['slow_file']['seconds']:.0f}s)")
+        line = "[progress] " + " | ".join(parts)
+        width = shutil.get_terminal_size().columns - 1
+        with self._write_lock:
+            self._stderr.write("\r" + line[:width] + "\x1b[K")
+            self._stderr.flush()
+            self._line_shown = True
+    
+    def _clear_line(self):
+        with self._write_lock:
+            if self._line_shown:
+                self._stderr.write("\r\x1b[K")
+                self._stderr.flush()
+                self._line_shown = False
+    
+    def write(self, message: str):
+        """Print a line to stderr, clearing the status line first."""
+        with self._write_lock:
+            self._clear_line()
+            print(message, file=self._stderr, flush=True)
+
+_status_line: Optional[ProgressReporter] = None  # TTY reporter drawing a status line
+
+def status(message: str):
+    """Print an [INFO]/[WARN] message to stderr during a run.
+    
+    Goes through the TTY progress reporter when one is drawing, so the
+    message is not written over its status line.
+    """
+    reporter = _status_line
+    if reporter:
+        reporter.write(message)
+    else:
+        print(message, file=sys.stderr)
+
+# ============================================================================
+# Main Analyzer
+# ============================================================================
+
+EXCLUDE_DIRS = {
+    "node_modules", "venv", ".venv", "__pycache__", ".git", 
+    "dist", "build", ".next", "target", "vendor", ".idea", ".vscode"
+}
+
+LANGUAGE_EXTENSIONS = {
+    "python": [".py"],
+    "typescript": [".ts", ".tsx"],
+    "javascript": [".js", ".jsx", ".mjs"],
+    "go": [".go"],
+    "rust": [".rs"],
+    "java": [".java"],
+    "cpp": [".cpp", ".hpp", ".c", ".h", ".cc", ".cxx"]
+}
+
+LANGUAGE_SERVERS = {
+    "python": "pylsp",
+    "typescript": "typescript-language-server",
+    "javascript": "typescript-language-server",
+    "go": "gopls",
+    "rust": "rust-analyzer",
+    "java": "jdtls",
+    "cpp": "clangd"
+}
+
+EXTENSION_LANGUAGES = {
+    ext: language for language, exts in LANGUAGE_EXTENSIONS.items() for ext in exts
+}
+
+def language_for_path(path: Path) -> str:
+    """Language of a source file, from its extension."""
+    return EXTENSION_LANGUAGES.get(path.suffix, "")
+
+def scan_source_inventory(root: Path, use_ignore_files: bool = True) -> dict[str, list[Path]]:
+    """Walk the tree once and bucket source files by language.
+    
+    Directories excluded by EXCLUDE_DIRS or by .gitignore/.agentignore
+    rules are pruned, so their subtrees are never walked.
+    """
+    matcher = IgnoreMatcher(root) if use_ignore_files else None
+    inventory = {}
+    for dirpath, dirnames, filenames in os.walk(root):
+        rel_dir = os.path.relpath(dirpath, root).replace(os.sep, "/")
+        rel_dir = "" if rel_dir == "." else rel_dir
+        prefix = rel_dir + "/" if rel_dir else ""
+        if matcher:
+            matcher.load_dir(rel_dir, filenames)
+        dirnames[:] = sorted(
+            d for d in dirnames
+            if d not in EXCLUDE_DIRS and not (matcher and matcher.is_ignored(prefix + d, True))
+        )
+        for name in filenames:
+            language = EXTENSION_LANGUAGES.get(os.path.splitext(name)[1])
+            if language and not (matcher and matcher.is_ignored(prefix + name)):
+                inventory.setdefault(language, []).append(Path(dirpath) / name)
+    for files in inventory.values():
+        files.sort()
+    return inventory
+
+def group_languages(inventory: dict[str, list[Path]]) -> dict[str, list[Path]]:
+    """Group inventory languages by the server that analyzes them.
+    
+    JavaScript joins TypeScript when both are present, since one
+    typescript-language-server handles both.
+    """
+    groups = {language: list(files) for language, files in inventory.items() if files}
+    if "typescript" in groups and "javascript" in groups:
+        groups["typescript"] = sorted(groups["typescript"] + groups.pop("javascript"))
+    return groups
+
+def find_source_files(root: Path, language: str, use_ignore_files: bool = True) -> list[Path]:
+    """Find all source files for the given language."""
+    inventory = scan_source_inventory(root, use_ignore_files)
+    files = list(inventory.get(language, []))
+    if language == "typescript":
+        files = sorted(files + inventory.get("javascript", []))
+    return files
+
+def find_entry_points(root: Path, language: str,
+                      source_files: Optional[list[Path]] = None) -> list[str]:
+    """Identify likely entry points."""
+    entry_patterns = {
+        "python": ["main.py", "app.py", "__main__.py", "cli.py", "manage.py"],
+        "typescript": ["index.ts", "main.ts", "app.ts", "server.ts", "index.tsx", "App.tsx"],
+        "javascript": ["index.js", "main.js", "app.js", "server.js", "index.jsx", "App.jsx"],
+        "go": ["main.go", "cmd/main.go"],
+        "rust": ["main.rs", "lib.rs"],
+        "java": ["Main.java", "Application.java"],
+        "cpp": ["main.cpp", "main.c"]
+    }
+    
+    patterns = entry_patterns.get(language, [])
+    if language == "typescript":
+        patterns = patterns + entry_patterns["javascript"]
+    if source_files is None:
+        source_files = find_source_files(root, language)
+    entries = []
+    
+    for f in source_files:
+        rel = f.relative_to(root).as_posix()
+        if any(rel == p or rel.endswith("/" + p) for p in patterns):
+            entries.append(rel)
+    
+    return entries
+
+def get_lsp_command(server: str) -> list[str]:
+    """Get the command to start an LSP server."""
+    commands = {
+        "typescript-language-server": ["typescript-language-server", "--stdio"],
+        "pylsp": ["pylsp"],
+        "gopls": ["gopls", "serve"],
+        "rust-analyzer": ["rust-analyzer"],
+        "clangd": ["clangd"],
+        "jdtls": ["jdtls"]
+    }
+    return commands.get(server, [])
+
+def analyze_with_lsp(root: Path, language: str, server: str,
+                     entry_points: Optional[list] = None,
+                     options: Optional[AnalysisOptions] = None,
+                     source_files: Optional[list[Path]] = None,
+                     store: Optional[ContentStore] = None,
+                     journal: Optional[CheckpointJournal] = None,
+                     resumed: Optional[list[FileInfo]] = None,
+                     progress: Optional[ProgressReporter] = None,
+                     on_file: Optional[Callable[[FileInfo], None]] = None) -> Optional[list[FileInfo]]:
+    """Analyze project using LSP server; None when no server could start.
+    
+    `resumed` records from a checkpoint skip the symbol pass but still
+    take part in hover and reference enrichment. With on_file and a
+    memory cap, files are enriched and handed to on_file in batches of
+    about LSP_BATCH_SHARE of the cap in source bytes, then dropped, and
+    an empty list is returned; the hover and reference budgets are
+    shared across the batches.
+    """
+    options = options or AnalysisOptions()
+    store = store or ContentStore()
+    cmd = get_lsp_command(server)
+    if not cmd:
+        return None
+    
+    client = start_lsp_client(cmd, root, options)
+    if not client:
+        status(f"[WARN] Could not start LSP server {server}, falling back to regex")
+        return None
+    if progress:
+        progress.watch(client)
+        progress.phase(language, "symbols")
+    
+    batch_bytes = int(options.max_memory * LSP_BATCH_SHARE) if on_file and options.max_memory else 0
+    files = []
+    file_hashes = {}
+    pending_bytes = 0
+    kept = []  # every record, when not batching
+    try:
+        if source_files is None:
+            source_files = find_source_files(root, language)
+        cache_dir = project_cache_dir(root, options.cache_dir)
+        entry_names = entry_point_names(root, entry_points or [], store)
+        hover_cache = HoverCache(cache_dir / f"hover-{server}.json" if cache_dir else None)
+        reference_cache = cache_dir / f"references-{server}.json" if cache_dir else None
+        spent = {"hover": 0.0, "references": 0.0}
+        totals = {"hover": {}, "references": {}}
+        fingerprint = None
+        if batch_bytes:
+            # Exact counts stay valid only while no file of the language changed
+            digests = sorted(store.digest(path) for path in source_files)
+            digests += sorted(store.digest(root / info.path) for info in resumed or [])
+            fingerprint = hashlib.sha1("".join(sorted(digests)).encode()).hexdigest()
+        
+        def add_stats(phase: str, stats: dict):
+            for key, value in stats.items():
+                totals[phase][key] = totals[phase].get(key, 0) + value
+        
+        def enrich(batch: list[FileInfo], hashes: dict):
+            # Signatures and docs from hover, highest-value symbols first
+            hover_budget = within_deadline(options, options.hover_budget - spent["hover"])
+            if hover_budget > 0:
+                if progress:
+                    progress.phase(language, "hover")
+                began = time.monotonic()
+                add_stats("hover", enrich_with_hover(client, batch, hashes, entry_names,
+                                                     replace(options, hover_budget=hover_budget), hover_cache))
+                spent["hover"] += time.monotonic() - began
+            
+            # Reference counts rank components in the generated wiki; once the
+            # budget is spent, later batches still get estimates
+            if within_deadline(options, options.reference_budget) > 0:
+                if progress:
+                    progress.phase(language, "references")
+                began = time.monotonic()
+                reference_budget = max(options.reference_budget - spent["references"], 0.0)
+                add_stats("references", harvest_references(
+                    client, root, batch, hashes, entry_names,
+                    replace(options, reference_budget=within_deadline(options, reference_budget)),
+                    reference_cache, store, fingerprint=fingerprint, merge=bool(batch_bytes)
+                ))
+                spent["references"] += time.monotonic() - began
+        
+        def flush():
+            nonlocal files, file_hashes, pending_bytes
+            if files:
+                enrich(files, file_hashes)
+                if batch_bytes:
+                    for info in files:
+                        on_file(info)
+                else:
+                    kept.extend(files)
+            files, file_hashes, pending_bytes = [], {}, 0
+            if progress:
+                progress.phase(language, "symbols")
+        
+        for file_path in source_files:
+            if past_deadline(options.deadline):
+                break
+            file_language = language_for_path(file_path) or language
+            info = FileInfo(path=str(file_path.relative_to(root)), language=file_language)
+            if progress:
+                progress.begin(info.path)
+            
+            # Open file
+            text = store.text(file_path)
+            client.open_file(file_path, file_language, text)
+            info.imports = scan_import_header(io.StringIO(text), file_language)
+            time.sleep(0.1)  # Give server time to process
+            
+            # Get symbols
+            symbols = client.get_document_symbols(file_path)
+            for sym in symbols:
+                info.symbols.append(lsp_symbol_to_symbol(sym, file_path))
+            
+            files.append(info)
+            if progress:
+                progress.done(info)
+            file_hashes[str(file_path)] = store.digest(file_path)
+            if journal and client.alive():
+                # A crashed server answers nothing: never checkpoint that
+                journal.record(info, file_hashes[str(file_path)])
+            pending_bytes += len(text)
+            if batch_bytes and pending_bytes >= batch_bytes:
+                flush()
+        
+        for info in resumed or []:
+            # Opened so references from and into them are still seen
+            text = store.text(root / info.path)
+            client.open_file(root / info.path, info.language, text)
+            files.append(info)
+            file_hashes[str(root / info.path)] = store.digest(root / info.path)
+            pending_bytes += len(text)
+            if batch_bytes and pending_bytes >= batch_bytes:
+                flush()
+        flush()
+        
+        hover_cache.save()
+        if totals["hover"]:
+            stats = totals["hover"]
+            status(f"[INFO] Hover: {stats['requested']} requested, {stats['cached']} cached, "
+                   f"{stats['skipped']} over budget")
+        if totals["references"]:
+            stats = totals["references"]
+            status(f"[INFO] References: {stats['exact']} exact, {stats['cached']} cached, "
+                   f"{stats['estimated']} estimated")
+            
+    finally:
+        client.stop()
+        if progress:
+            progress.unwatch(client)
+            progress.phase(language, "done")
+    
+    return kept
+
+def lsp_symbol_to_symbol(lsp_sym: dict, file_path: Path) -> Symbol:
+    """Convert LSP symbol to our Symbol dataclass."""
+    kind_map = {
+        1: "file", 2: "module", 3: "namespace", 4: "package",
+        5: "class", 6: "method", 7: "property", 8: "field",
+        9: "constructor", 10: "enum", 11: "interface", 12: "function",
+        13: "variable", 14: "constant", 15: "string", 16: "number",
+        17: "boolean", 18: "array", 19: "object", 20: "key",
+        21: "null", 22: "enummember", 23: "struct", 24: "event",
+        25: "operator", 26: "typeparameter"
+    }
+    
+    range_info = lsp_sym.get("range", lsp_sym.get("location", {}).get("range", {}))
+    start = range_info.get("start", {})
+    end = range_info.get("end", {})
+    # Hover and references need the position of the name, not the range start
+    name_start = lsp_sym.get("selectionRange", range_info).get("start", start)
     
     sym = Symbol(
         name=lsp_sym.get("name", ""),
         kind=kind_map.get(lsp_sym.get("kind", 0), "unknown"),
         file=str(file_path),
-        line=start.get("line", 0) + 1,
+        line=name_start.get("line", 0) + 1,
         end_line=end.get("line", 0) + 1,
+        column=name_start.get("character", 0),
         detail=lsp_sym.get("detail", "")
     )
     
@@ -591,24 +2917,58 @@ def lsp_symbol_to_symbol(lsp_sym: dict, file_path: Path) -> Symbol:
     
     return sym
 
-def analyze_with_fallback(root: Path, language: str) -> list[FileInfo]:
-    """Analyze project using regex-based fallback."""
+def analyze_with_fallback(root: Path, language: str,
+                          source_files: Optional[list[Path]] = None,
+                          store: Optional[ContentStore] = None,
+                          journal: Optional[CheckpointJournal] = None,
+                          on_file: Optional[Callable[[FileInfo], None]] = None,
+                          progress: Optional[ProgressReporter] = None,
+                          collect: bool = True,
+                          deadline: Optional[float] = None,
+                          outline: bool = False) -> list[FileInfo]:
+    """Analyze project using regex-based fallback.
+    
+    With collect unset, records only go to on_file and an empty list is
+    returned, so nothing accumulates. Files left when the deadline
+    passes are not analyzed. With outline, Python files get
+    outline_python_file instead of the AST analyzer.
+    """
+    store = store or ContentStore()
     files = []
-    source_files = find_source_files(root, language)
+    if source_files is None:
+        source_files = find_source_files(root, language)
+    if progress:
+        progress.phase(language, "fallback")
     
     for file_path in source_files:
+        if past_deadline(deadline):
+            break
+        if progress:
+            progress.begin(str(file_path.relative_to(root)))
         if language == "python":
-            info = analyze_python_file(file_path)
+            info = outline_python_file(file_path, store) if outline else analyze_python_file(file_path, store)
         elif language in ("typescript", "javascript"):
-            info = analyze_typescript_file(file_path)
+            info = analyze_typescript_file(file_path, store)
         elif language == "go":
-            info = analyze_go_file(file_path)
+            info = analyze_go_file(file_path, store)
+        elif language in BRACE_LEXERS:
+            info = analyze_brace_file(file_path, language, store)
         else:
             info = FileInfo(path=str(file_path), language=language)
         
         info.path = str(file_path.relative_to(root))
-        files.append(info)
+        info.language = language_for_path(file_path) or language
+        if collect:
+            files.append(info)
+        if progress:
+            progress.done(info)
+        if journal:
+            journal.record(info, store.digest(file_path))
+        if on_file:
+            on_file(info)
     
+    if progress:
+        progress.phase(language, "done")
     return files
 
 def get_dependencies(root: Path, language: str) -> dict:
@@ -658,38 +3018,327 @@ def get_dependencies(root: Path, language: str) -> dict:
     
     return deps
 
-def build_call_graph(files: list[FileInfo]) -> dict:
-    """Build a simplified call graph from analyzed files."""
+def get_all_dependencies(root: Path, languages: list[str]) -> dict:
+    """Merge the dependencies of every analyzed language, without duplicates."""
+    deps = {"runtime": [], "dev": []}
+    for language in languages:
+        for kind, names in get_dependencies(root, language).items():
+            for name in names:
+                if name not in deps[kind]:
+                    deps[kind].append(name)
+    return deps
+
+UNRESOLVED_CALL = "?"  # prefix of shard callees left for the merge to resolve
+
+def iter_keyed_symbols(info: FileInfo):
+    """Yield (call-graph key, symbol) for a file: `path:Class.method`."""
+    def walk(symbols, prefix):
+        for sym in symbols:
+            qualified = f"{prefix}{sym.name}"
+            yield f"{info.path}:{qualified}", sym
+            yield from walk(sym.children, qualified + ".")
+    yield from walk(info.symbols, "")
+
+def symbol_index(files: list[FileInfo]) -> dict[str, list[str]]:
+    """Map each symbol name to the call-graph keys defining it."""
+    index = {}
+    for info in files:
+        for key, sym in iter_keyed_symbols(info):
+            index.setdefault(sym.name, []).append(key)
+    return index
+
+def resolve_call(name: str, caller_path: str, index: dict, local_only: bool = False) -> Optional[str]:
+    """Resolve a callee name: same file first, then a unique definition."""
+    candidates = index.get(name, [])
+    for key in candidates:
+        if key.startswith(caller_path + ":"):
+            return key
+    if local_only:
+        return None
+    return candidates[0] if len(candidates) == 1 else None
+
+def resolve_edges(key: str, sym: Symbol, path: str, index: dict,
+                  keep_unresolved: bool = False) -> list[str]:
+    """Call-graph edges of one symbol, from the names it calls.
+    
+    With keep_unresolved, only same-file calls are bound: whether another
+    definition is unique depends on files outside this shard, so those
+    calls are left as `?name` for the merge.
+    """
+    edges = []
+    for name in sym.calls:
+        target = resolve_call(name, path, index, local_only=keep_unresolved)
+        if not target and keep_unresolved:
+            target = UNRESOLVED_CALL + name
+        if target and target != key and target not in edges:
+            edges.append(target)
+    return edges
+
+def build_call_graph(files: list[FileInfo], keep_unresolved: bool = False) -> dict:
+    """Build a call graph from the names each symbol calls.
+    
+    Keys are `path:qualified.name`. Names with no definition in `files`
+    are dropped. With `keep_unresolved` (shards), every call not defined
+    in the caller's own file is kept as `?name` so the merge resolves it
+    against all files.
+    """
+    index = symbol_index(files)
     graph = {}
-    all_symbols = {}
+    for info in files:
+        for key, sym in iter_keyed_symbols(info):
+            edges = resolve_edges(key, sym, info.path, index, keep_unresolved)
+            if edges:
+                graph[key] = edges
+    return graph
+
+def stitch_call_graphs(graphs: list[dict], files: list[FileInfo]) -> dict:
+    """Union call graphs and resolve `?name` edges against all files."""
+    index = symbol_index(files)
+    merged = {}
+    for graph in graphs:
+        for caller, callees in graph.items():
+            caller_path = caller.rsplit(":", 1)[0]
+            for callee in callees:
+                if callee.startswith(UNRESOLVED_CALL):
+                    callee = resolve_call(callee[len(UNRESOLVED_CALL):], caller_path, index)
+                if callee and callee != caller:
+                    edges = merged.setdefault(caller, [])
+                    if callee not in edges:
+                        edges.append(callee)
+    return merged
+
+def shard_files(files: list[Path], index: int, count: int) -> list[Path]:
+    """Deterministic, size-balanced subset of files for shard `index` of `count`.
     
-    # First pass: collect all symbols
-    for f in files:
-        for sym in f.symbols:
-            key = f"{f.path}:{sym.name}"
-            all_symbols[sym.name] = key
-            all_symbols[key] = key
+    Largest files are placed first, each onto the currently lightest shard
+    (ties go to the lowest shard), so every worker computes the same split
+    from the same checkout. `index` is 1-based.
+    """
+    sized = []
+    for path in files:
+        try:
+            sized.append((path.stat().st_size, str(path), path))
+        except OSError:
+            sized.append((0, str(path), path))
+    sized.sort(key=lambda item: (-item[0], item[1]))
+    
+    loads = [(0, shard) for shard in range(count)]
+    selected = []
+    for size, _, path in sized:
+        load, shard = heapq.heappop(loads)
+        if shard == index - 1:
+            selected.append(path)
+        heapq.heappush(loads, (load + max(size, 1), shard))
+    return sorted(selected)
+
+def analyze_language(root: Path, language: str, source_files: list[Path],
+                     entry_points: list[str], use_lsp: bool,
+                     options: AnalysisOptions, store: ContentStore,
+                     journal: Optional[CheckpointJournal] = None,
+                     on_file: Optional[Callable[[FileInfo], None]] = None,
+                     progress: Optional[ProgressReporter] = None,
+                     collect: bool = True) -> list[FileInfo]:
+    """Analyze one language's files with its LSP server or the fallback.
     
-    # Note: Full call graph requires LSP callHierarchy or deeper analysis
-    # This is a placeholder for the structure
+    on_file receives each record once it is final: as soon as it is
+    analyzed on the fallback path, after enrichment on the LSP paths.
+    With collect unset the records are not returned, only streamed.
+    """
+    server = LANGUAGE_SERVERS.get(language, "")
     
-    return graph
+    def finish(infos: list[FileInfo]) -> list[FileInfo]:
+        if on_file:
+            for info in infos:
+                on_file(info)
+        return infos
+    
+    # Files finished by an interrupted run are taken from its journal
+    resumed = []
+    if journal and journal.records:
+        remaining = []
+        for file_path in source_files:
+            info = journal.lookup(str(file_path.relative_to(root)), store.digest(file_path))
+            if info:
+                resumed.append(info)
+                if progress:
+                    progress.done(info)
+            else:
+                remaining.append(file_path)
+        source_files = remaining
+    
+    # Generated, minified and oversized files never reach the analyzers
+    regular, classified = [], []
+    for file_path in source_files:
+        reason = classify_file(file_path, options.max_file_size, store)
+        if reason:
+            info = analyze_classified_file(root, file_path, reason)
+            classified.append(info)
+            if progress:
+                progress.done(info)
+            if journal:
+                journal.record(info, store.digest(file_path))
+        else:
+            regular.append(file_path)
+    finish(classified)
+    if not collect:
+        classified = []
+    if not regular and not resumed:
+        return classified
+    regular = schedule_files(root, regular, entry_points, language, store)
+    
+    # Hybrid: fallback structure everywhere, the server only where it pays off
+    if use_lsp and server and options.mode == "hybrid":
+        files = analyze_with_fallback(root, language, regular, store, journal, progress=progress,
+                                      deadline=options.deadline, outline=options.outline)
+        if progress:
+            progress.phase(language, "lsp enrichment")
+        enrich_hybrid(root, server, resumed + files, entry_points, options, store, progress)
+        if progress:
+            progress.phase(language, "done")
+        files = finish(resumed + files)
+        return classified + files if collect else []
+    
+    # Try LSP first, fallback to regex; without collect, records are
+    # emitted in batches as soon as they are enriched
+    files = None
+    if use_lsp and server:
+        files = analyze_with_lsp(root, language, server, entry_points, options, regular, store,
+                                 journal, resumed, progress, on_file=None if collect else on_file)
+        if files is not None:
+            files = finish(files)
+    
+    if files is None:
+        status(f"[INFO] Using fallback analyzer for {language}")
+        files = finish(resumed) + analyze_with_fallback(root, language, regular, store, journal, on_file,
+                                                        progress, collect, options.deadline, options.outline)
+    
+    return files + classified if collect else []
+
+def analyze_groups(root: Path, groups: dict, entry_points: dict, use_lsp: bool,
+                   options: AnalysisOptions,
+                   journal: Optional[CheckpointJournal] = None,
+                   on_file: Optional[Callable[[FileInfo], None]] = None,
+                   progress: Optional[ProgressReporter] = None,
+                   collect: bool = True) -> list[FileInfo]:
+    """Analyze language groups side by side, sharing one content store.
+    
+    A mixed repo takes as long as its slowest language. Returns the
+    merged file records sorted by path; with collect unset they only go
+    to on_file.
+    """
+    if options.max_memory:
+        store = ContentStore(max_bytes=int(options.max_memory * CONTENT_CACHE_SHARE))
+    else:
+        store = ContentStore()
+    results = {}
+    if any(groups.values()):
+        with ThreadPoolExecutor(max_workers=len(groups)) as executor:
+            futures = {
+                executor.submit(analyze_language, root, lang, files, entry_points.get(lang, []),
+                                use_lsp, options, store, journal, on_file, progress, collect): lang
+                for lang, files in groups.items() if files
+            }
+            for future, lang in futures.items():
+                results[lang] = future.result()
+    return sorted((info for infos in results.values() for info in infos), key=lambda f: f.path)
+
+def summarize_files(files: list[FileInfo]) -> tuple[dict, dict]:
+    """Count files per language and per skip reason."""
+    languages = {}
+    skipped = {}
+    for info in files:
+        languages[info.language] = languages.get(info.language, 0) + 1
+        if info.skipped:
+            skipped[info.skipped] = skipped.get(info.skipped, 0) + 1
+    return languages, skipped
 
-def analyze_project(root: Path, use_lsp: bool = True) -> ProjectAnalysis:
-    """Main entry point: analyze a project."""
+def analyze_project(root: Path, use_lsp: bool = True,
+                    options: Optional[AnalysisOptions] = None,
+                    on_file: Optional[Callable[[dict], None]] = None) -> ProjectAnalysis:
+    """Main entry point: analyze a project.
+    
+    Every language found in the tree is analyzed concurrently, each with
+    its own server, and the results are merged into one analysis.
+    on_file streams each file record (the same dict that ends up in
+    ProjectAnalysis.files) as soon as it is final; it is called from
+    worker threads. With options.max_memory set, ProjectAnalysis.files
+    is a SpillStore: iterate it (or use write_analysis) rather than
+    indexing it or calling asdict on the analysis.
+    """
     root = root.resolve()
-    language, server, framework = detect_project_type(root)
+    options = options or AnalysisOptions()
+    if options.time_budget:
+        options = replace(options, deadline=time.monotonic() + options.time_budget)
+    language, _ = detect_project_type(root)
     
-    print(f"[INFO] Detected: {language}" + (f" ({framework})" if framework else ""), file=sys.stderr)
+    groups = group_languages(scan_source_inventory(root, options.use_ignore_files))
+    if groups and language not in groups:
+        language = max(groups, key=lambda lang: len(groups[lang]))
+    entry_points = {lang: find_entry_points(root, lang, files) for lang, files in groups.items()}
     
-    # Try LSP first, fallback to regex
-    files = []
-    if use_lsp and server:
-        files = analyze_with_lsp(root, language, server)
+    if options.shard:
+        index, count = options.shard
+        selected = set(shard_files([f for files in groups.values() for f in files], index, count))
+        groups = {lang: [f for f in files if f in selected] for lang, files in groups.items()}
+        print(f"[INFO] Shard {index}/{count}: {len(selected)} files", file=sys.stderr)
+    
+    others = [lang for lang in groups if lang != language]
+    print(f"[INFO] Detected: {language}" + (f"; also {', '.join(others)}" if others else ""),
+          file=sys.stderr)
     
-    if not files:
-        print(f"[INFO] Using fallback analyzer for {language}", file=sys.stderr)
-        files = analyze_with_fallback(root, language)
+    # Each record is converted once, when final, and shared with on_file.
+    # Under a memory cap records are spilled instead of kept as objects.
+    records = {}
+    spill = SpillStore(int(options.max_memory * SPILL_BUFFER_SHARE)) if options.max_memory else None
+    
+    def emit(info: FileInfo):
+        record = asdict(info)
+        if spill is not None:
+            spill.add(record)
+        else:
+            records[info.path] = record
+        if on_file:
+            on_file(record)
+    
+    journal = open_journal(root, use_lsp, options)
+    total = sum(len(files) for files in groups.values())
+    progress = ProgressReporter.create(options.progress, total)
+    try:
+        with progress or contextlib.nullcontext():
+            files = analyze_groups(root, groups, entry_points, use_lsp, options, journal, emit, progress,
+                                   collect=spill is None)
+    except BaseException:
+        journal.close()
+        if journal.path:
+            print("[INFO] Progress checkpointed; rerun with --resume to continue", file=sys.stderr)
+        raise
+    analyzed = len(spill) if spill is not None else len(records)
+    if analyzed < total:
+        # Out of time: keep the journal so --resume picks up the rest
+        journal.close()
+        print(f"[WARN] Time budget of {options.time_budget:g}s ran out: {analyzed}/{total} files analyzed"
+              + ("; rerun with --resume to continue" if journal.path else ""), file=sys.stderr)
+    else:
+        journal.complete()
+    if journal.resumed:
+        print(f"[INFO] Resumed {journal.resumed} files from checkpoint", file=sys.stderr)
+    if spill is not None:
+        # Every later pass streams the records back from disk
+        files = spill.infos()
+        print(f"[INFO] Spilled {spill.spilled}/{len(spill)} file records to {len(spill.segments)} segments",
+              file=sys.stderr)
+    
+    languages, skipped = summarize_files(files)
+    if skipped:
+        print("[INFO] Skipped full analysis: " + ", ".join(f"{n} {reason}" for reason, n in skipped.items()),
+              file=sys.stderr)
+    
+    # Frameworks from the imports the analyzers already collected
+    dependencies = get_all_dependencies(root, list(groups) or [language])
+    framework_evidence = detect_frameworks(files, dependencies)
+    framework = next(iter(framework_evidence), "")
+    if framework:
+        print(f"[INFO] Framework: {framework}", file=sys.stderr)
     
     # Build analysis result
     analysis = ProjectAnalysis(
@@ -697,23 +3346,1078 @@ def analyze_project(root: Path, use_lsp: bool = True) -> ProjectAnalysis:
         root=str(root),
         language=language,
         framework=framework,
-        entry_points=find_entry_points(root, language),
-        files=[asdict(f) for f in files],
-        dependencies=get_dependencies(root, language),
-        call_graph=build_call_graph(files)
+        framework_evidence=framework_evidence,
+        languages=languages,
+        entry_points=[e for lang in groups for e in entry_points[lang]],
+        files=spill if spill is not None else [records[f.path] for f in files],
+        dependencies=dependencies,
+        call_graph=build_call_graph(files, keep_unresolved=bool(options.shard)),
+        module_graph=build_module_graph(root, files),
+        metadata={"skipped": skipped}
     )
+    if options.shard:
+        analysis.metadata["shard"] = {"index": options.shard[0], "count": options.shard[1]}
+    if analyzed < total:
+        analysis.metadata["partial"] = {"time_budget": options.time_budget, "analyzed": analyzed, "total": total}
+    if spill is not None:
+        rss = peak_rss()
+        analysis.metadata["memory"] = {
+            "max_memory": options.max_memory,
+            "spilled_records": spill.spilled,
+            "segments": len(spill.segments),
+            "peak_rss": rss,
+            "exceeded": bool(rss and rss > options.max_memory)
+        }
+        if rss and rss > options.max_memory:
+            # The cap sizes buffers; the call graph and the interpreter are not bounded by it
+            print(f"[WARN] Peak RSS {rss >> 20} MB exceeded --max-memory {options.max_memory >> 20} MB",
+                  file=sys.stderr)
     
     return analysis
 
+# ============================================================================
+# Module Graph
+# ============================================================================
+
+SCRIPT_EXTENSIONS = LANGUAGE_EXTENSIONS["typescript"] + LANGUAGE_EXTENSIONS["javascript"]
+TSCONFIG_NAMES = ("tsconfig.json", "jsconfig.json")
+
+def read_jsonc(path: Path) -> dict:
+    """Parse a JSON-with-comments config such as tsconfig.json ({} if unreadable)."""
+    try:
+        text = path.read_text(errors="ignore")
+    except OSError:
+        return {}
+    # Drop comments outside strings, then trailing commas
+    text = re.sub(r'("(?:\\.|[^"\\])*")|//[^\n]*|/\*.*?\*/', lambda m: m.group(1) or "", text, flags=re.DOTALL)
+    text = re.sub(r",(\s*[}\]])", r"\1", text)
+    try:
+        data = json.loads(text)
+    except ValueError:
+        return {}
+    return data if isinstance(data, dict) else {}
+
+def load_ts_paths(root: Path) -> tuple[Optional[str], list]:
+    """baseUrl (relative to root) and `paths` mappings from the root tsconfig.
+    
+    One level of a relative `extends` is followed; mappings are returned
+    longest prefix first, as TypeScript matches them.
+    """
+    for name in TSCONFIG_NAMES:
+        config_path = root / name
+        if config_path.is_file():
+            break
+    else:
+        return None, []
+    config = read_jsonc(config_path)
+    options = dict(config.get("compilerOptions") or {})
+    base_dir = config_path.parent
+    extends = config.get("extends")
+    if isinstance(extends, str) and extends.startswith("."):
+        parent_path = (config_path.parent / extends)
+        if parent_path.suffix != ".json":
+            parent_path = parent_path.with_name(parent_path.name + ".json")
+        parent = read_jsonc(parent_path).get("compilerOptions") or {}
+        options = {**parent, **options}
+        if "baseUrl" not in (config.get("compilerOptions") or {}) and "baseUrl" in parent:
+            base_dir = parent_path.parent
+    
+    def relative(target: str) -> str:
+        resolved = os.path.normpath(os.path.join(str(base_dir), target))
+        rel = os.path.relpath(resolved, str(root))
+        return "" if rel == "." else rel.replace(os.sep, "/")
+    
+    base_url = relative(options["baseUrl"]) if isinstance(options.get("baseUrl"), str) else None
+    mappings = []
+    for pattern, targets in (options.get("paths") or {}).items():
+        if isinstance(targets, list):
+            mapped_base = base_url if base_url is not None else relative(".")
+            resolved = [(mapped_base + "/" if mapped_base else "") + t for t in targets if isinstance(t, str)]
+            mappings.append((pattern, [os.path.normpath(t).replace(os.sep, "/") for t in resolved]))
+    mappings.sort(key=lambda item: -len(item[0].split("*")[0]))
+    return base_url, mappings
+
+def load_go_module(root: Path) -> Optional[str]:
+    """Module path declared in the root go.mod."""
+    try:
+        with open(root / "go.mod", errors="ignore") as f:
+            for line in f:
+                match = re.match(r"\s*module\s+(\S+)", line)
+                if match:
+                    return match.group(1).strip('"')
+    except OSError:
+        pass
+    return None
+
+class ImportResolver:
+    """Resolve import strings to project files.
+    
+    Python modules resolve through dotted names registered from the root
+    and from every directory that is not itself a package (a `src/`
+    layout, say); relative imports walk up from the importer. TS/JS
+    specifiers are resolved relative to the importer or through the
+    tsconfig `paths`/`baseUrl`, trying the usual extensions and `index`
+    files. Go imports resolve through the go.mod module path, else the
+    longest suffix naming a package directory. Java imports and quoted
+    C/C++ includes match path suffixes.
+    
+    The tables are built once, in time linear in the number of files,
+    and lookups are memoized per (language, importer directory, import),
+    so resolving a whole project stays near-linear.
+    """
+    
+    def __init__(self, root: Path, paths):
+        self.root = root
+        self.paths = {p if isinstance(p, str) else p.relative_to(root).as_posix() for p in paths}
+        self.modules = {}  # dotted python module -> path
+        self.packages = {}  # directory -> its go files
+        self.suffixes = {}  # java/c path suffix -> path
+        self._memo = {}
+        self._ts = None  # (baseUrl, paths), read on first TS/JS lookup
+        self._go_module = ...  # read on first Go lookup
+        
+        package_dirs = {p.rsplit("/", 1)[0] for p in self.paths if p.endswith("/__init__.py")}
+        for path in sorted(self.paths, key=lambda p: (p.count("/"), p)):
+            extension = os.path.splitext(path)[1]
+            if extension == ".py":
+                parts = path[:-3].split("/")
+                if parts[-1] == "__init__":
+                    parts = parts[:-1]
+                for start in range(len(parts)):
+                    if start and "/".join(parts[:start]) in package_dirs:
+                        continue  # inside a package: only importable by its full name
+                    self.modules.setdefault(".".join(parts[start:]), path)
+            elif extension == ".go":
+                self.packages.setdefault(path.rsplit("/", 1)[0] if "/" in path else "", []).append(path)
+            elif extension == ".java" or extension in LANGUAGE_EXTENSIONS["cpp"]:
+                parts = path.split("/")
+                for start in range(len(parts)):
+                    self.suffixes.setdefault("/".join(parts[start:]), path)
+    
+    def resolve(self, importer: str, spec: str, language: str) -> list[str]:
+        """Project files an import in `importer` (relative path) refers to."""
+        directory = importer.rsplit("/", 1)[0] if "/" in importer else ""
+        key = (language, directory, spec)
+        if key not in self._memo:
+            if language == "python":
+                self._memo[key] = self._resolve_python(directory, spec)
+            elif language in ("typescript", "javascript"):
+                self._memo[key] = self._resolve_script(directory, spec)
+            elif language == "go":
+                self._memo[key] = self._resolve_go(spec)
+            elif language == "java":
+                self._memo[key] = self._resolve_java(spec)
+            elif language == "cpp":
+                self._memo[key] = self._resolve_include(directory, spec)
+            else:
+                self._memo[key] = []
+        return self._memo[key]
+    
+    def _resolve_python(self, directory: str, spec: str) -> list[str]:
+        dots = len(spec) - len(spec.lstrip("."))
+        name = spec[dots:]
+        if dots:
+            base = directory.split("/") if directory else []
+            if dots - 1 > len(base):
+                return []
+            base = base[:len(base) - (dots - 1)]
+            parts = name.split(".") if name else []
+            # `from .a import b` names module a.b or attribute b of a
+            while True:
+                stem = "/".join(base + parts)
+                for candidate in (stem + ".py", (stem + "/" if stem else "") + "__init__.py"):
+                    if candidate in self.paths:
+                        return [candidate]
+                if not parts:
+                    return []
+                parts.pop()
+        # `import a.b.c` may name a module or an attribute of one
+        while name:
+            if name in self.modules:
+                return [self.modules[name]]
+            name = name.rpartition(".")[0]
+        return []
+    
+    def _script_file(self, stem: str) -> Optional[str]:
+        stem = os.path.normpath(stem).replace(os.sep, "/") if stem else ""
+        if stem.startswith("../") or stem == "..":
+            return None
+        stem = "" if stem == "." else stem
+        if stem in self.paths:
+            return stem
+        for ext in SCRIPT_EXTENSIONS:
+            if stem + ext in self.paths:
+                return stem + ext
+        prefix = stem + "/" if stem else ""
+        for ext in SCRIPT_EXTENSIONS:
+            if f"{prefix}index{ext}" in self.paths:
+                return f"{prefix}index{ext}"
+        return None
+    
+    def _resolve_script(self, directory: str, spec: str) -> list[str]:
+        if spec.startswith("."):
+            found = self._script_file(f"{directory}/{spec}" if directory else spec)
+            return [found] if found else []
+        if self._ts is None:
+            self._ts = load_ts_paths(self.root)
+        base_url, mappings = self._ts
+        for pattern, targets in mappings:
+            prefix, star, suffix = pattern.partition("*")
+            if star and spec.startswith(prefix) and spec.endswith(suffix) \
+                    and len(spec) >= len(prefix) + len(suffix):
+                matched = spec[len(prefix):len(spec) - len(suffix)]
+            elif not star and spec == pattern:
+                matched = ""
+            else:
+                continue
+            for target in targets:
+                found = self._script_file(target.replace("*", matched, 1))
+                if found:
+                    return [found]
+            return []  # a matching pattern ends the search, as in tsc
+        if base_url is not None:
+            found = self._script_file(f"{base_url}/{spec}" if base_url else spec)
+            if found:
+                return [found]
+        return []  # a package, not a project file
+    
+    def _resolve_go(self, spec: str) -> list[str]:
+        if self._go_module is ...:
+            self._go_module = load_go_module(self.root)
+        module = self._go_module
+        if module and (spec == module or spec.startswith(module + "/")):
+            return self.packages.get(spec[len(module) + 1:], [])
+        parts = spec.split("/")
+        for start in range(len(parts)):
+            files = self.packages.get("/".join(parts[start:]))
+            if files:
+                return files
+        return []
+    
+    def _resolve_java(self, spec: str) -> list[str]:
+        if spec.endswith(".*"):
+            return []  # a whole package
+        parts = spec.split(".")
+        # `import a.b.C` or, for a nested class, `import a.b.C.Inner`
+        while len(parts) > 1:
+            found = self.suffixes.get("/".join(parts) + ".java")
+            if found:
+                return [found]
+            parts.pop()
+        return []
+    
+    def _resolve_include(self, directory: str, spec: str) -> list[str]:
+        local = os.path.normpath(f"{directory}/{spec}" if directory else spec).replace(os.sep, "/")
+        if local in self.paths:
+            return [local]
+        found = self.suffixes.get(spec)
+        return [found] if found else []
+
+def strongly_connected_components(graph: dict[str, list[str]]) -> list[list[str]]:
+    """Tarjan's algorithm, iterative so deep import chains cannot overflow the stack.
+    
+    Runs in O(nodes + edges); components come out in reverse
+    topological order, each listing its nodes in discovery order.
+    """
+    index = {}
+    lowlink = {}
+    on_stack = set()
+    stack = []
+    components = []
+    counter = 0
+    
+    for start in graph:
+        if start in index:
+            continue
+        work = [(start, iter(graph.get(start, ())))]
+        index[start] = lowlink[start] = counter
+        counter += 1
+        stack.append(start)
+        on_stack.add(start)
+        while work:
+            node, neighbors = work[-1]
+            for neighbor in neighbors:
+                if neighbor not in index:
+                    index[neighbor] = lowlink[neighbor] = counter
+                    counter += 1
+                    stack.append(neighbor)
+                    on_stack.add(neighbor)
+                    work.append((neighbor, iter(graph.get(neighbor, ()))))
+                    break
+                if neighbor in on_stack:
+                    lowlink[node] = min(lowlink[node], index[neighbor])
+            else:
+                work.pop()
+                if work:
+                    parent = work[-1][0]
+                    lowlink[parent] = min(lowlink[parent], lowlink[node])
+                if lowlink[node] == index[node]:
+                    component = []
+                    while True:
+                        member = stack.pop()
+                        on_stack.discard(member)
+                        component.append(member)
+                        if member == node:
+                            break
+                    component.reverse()
+                    components.append(component)
+    return components
+
+def build_module_graph(root: Path, files) -> dict:
+    """File-level import graph with its import cycles.
+    
+    `files` is any re-iterable of FileInfo (it is walked twice). Returns
+    {"edges": {path: [imported paths]}, "cycles": [[path, ...]],
+    "stats": {...}}; cycles are the strongly connected components with
+    more than one file, or a file importing itself.
+    """
+    resolver = ImportResolver(root, (info.path for info in files))
+    edges = {}
+    resolved = unresolved = 0
+    for info in files:
+        targets = []
+        for spec in info.imports:
+            found = resolver.resolve(info.path, spec, info.language)
+            if found:
+                resolved += 1
+                targets.extend(found)
+            else:
+                unresolved += 1
+        if targets:
+            # Go imports name packages: keep each file once, in order
+            edges[info.path] = list(dict.fromkeys(targets))
+    
+    cycles = [
+        sorted(component) for component in strongly_connected_components(edges)
+        if len(component) > 1 or component[0] in edges.get(component[0], ())
+    ]
+    cycles.sort(key=lambda component: (-len(component), component[0]))
+    return {
+        "edges": edges,
+        "cycles": cycles,
+        "stats": {
+            "modules": len(resolver.paths),
+            "edges": sum(len(targets) for targets in edges.values()),
+            "resolved_imports": resolved,
+            "unresolved_imports": unresolved
+        }
+    }
+
+# ============================================================================
+# Scheduling
+# ============================================================================
+
+def directory_distances(directories: set[str], sources: set[str]) -> dict[str, int]:
+    """Hops through the directory tree from the nearest source directory."""
+    neighbors = {}
+    for directory in directories:
+        while directory:
+            parent = directory.rsplit("/", 1)[0] if "/" in directory else ""
+            neighbors.setdefault(directory, set()).add(parent)
+            neighbors.setdefault(parent, set()).add(directory)
+            directory = parent
+    distance = {source: 0 for source in sources}
+    frontier = list(sources)
+    while frontier:
+        following = []
+        for directory in frontier:
+            for neighbor in neighbors.get(directory, ()):
+                if neighbor not in distance:
+                    distance[neighbor] = distance[directory] + 1
+                    following.append(neighbor)
+        frontier = following
+    return distance
+
+def schedule_files(root: Path, files: list[Path], entry_points: list[str], language: str,
+                   store: ContentStore) -> list[Path]:
+    """Order files so the most important are analyzed first.
+    
+    Entry points come first, then their import closure breadth-first
+    (smaller files first within a hop), then everything else by
+    directory distance from what was already scheduled, then size. When
+    a time budget cuts the run short, what is missing is the periphery.
+    """
+    by_path = {f.relative_to(root).as_posix(): f for f in files}
+    sizes = {}
+    
+    def size(path: str) -> int:
+        if path not in sizes:
+            try:
+                sizes[path] = by_path[path].stat().st_size
+            except OSError:
+                sizes[path] = 0
+        return sizes[path]
+    
+    resolver = ImportResolver(root, by_path)
+    heap = [(0, size(path), path) for path in entry_points if path in by_path]
+    heapq.heapify(heap)
+    seen = {path for _, _, path in heap}
+    ordered = []
+    while heap:
+        hops, _, path = heapq.heappop(heap)
+        ordered.append(path)
+        file_language = language_for_path(by_path[path]) or language
+        for spec in scan_import_header(io.StringIO(store.text(by_path[path])), file_language):
+            for target in resolver.resolve(path, spec, file_language):
+                if target in by_path and target not in seen:
+                    seen.add(target)
+                    heapq.heappush(heap, (hops + 1, size(target), target))
+    
+    def parent(path: str) -> str:
+        return path.rsplit("/", 1)[0] if "/" in path else ""
+    
+    rest = [path for path in by_path if path not in seen]
+    distances = directory_distances({parent(path) for path in rest},
+                                    {parent(path) for path in ordered} or {""})
+    rest.sort(key=lambda path: (distances.get(parent(path), 0), size(path), path))
+    return [by_path[path] for path in ordered + rest]
+
+def past_deadline(deadline: Optional[float]) -> bool:
+    """Whether a run's time budget (if any) has run out."""
+    return deadline is not None and time.monotonic() >= deadline
+
+def within_deadline(options: AnalysisOptions, budget: float) -> float:
+    """A phase budget clipped to the time left in the run."""
+    if options.deadline is None:
+        return budget
+    return min(budget, max(options.deadline - time.monotonic(), 0.0))
+
+# ============================================================================
+# Hybrid Analysis
+# ============================================================================
+
+# Used until a server has been measured on this machine
+DEFAULT_SERVER_STARTUP = {
+    "pylsp": 2.0, "typescript-language-server": 4.0, "gopls": 5.0,
+    "clangd": 5.0, "rust-analyzer": 60.0, "jdtls": 90.0
+}
+DEFAULT_SECONDS_PER_KB = 0.02
+CALL_HIERARCHY_KINDS = {"function", "method", "constructor"}
+
+class ServerStats:
+    """Server startup time and throughput measured on previous runs.
+    
+    Measurements are smoothed so one slow run (cold disk cache, busy
+    machine) does not swing the next plan too far.
+    """
+    
+    SMOOTHING = 0.5
+    
+    def __init__(self, path: Optional[Path]):
+        self.path = path
+        self.entries = {}
+        if path and path.exists():
+            try:
+                self.entries = json.loads(path.read_text())
+            except (OSError, ValueError):
+                self.entries = {}
+    
+    def estimate(self, server: str) -> tuple[float, float]:
+        """(startup seconds, seconds per KB of source) for a server."""
+        entry = self.entries.get(server, {})
+        return (entry.get("startup", DEFAULT_SERVER_STARTUP.get(server, 10.0)),
+                entry.get("per_kb", DEFAULT_SECONDS_PER_KB))
+    
+    def record(self, server: str, startup: float, per_kb: Optional[float]):
+        entry = self.entries.setdefault(server, {"runs": 0})
+        for key, value in (("startup", startup), ("per_kb", per_kb)):
+            if value is not None:
+                old = entry.get(key)
+                entry[key] = value if old is None else old + self.SMOOTHING * (value - old)
+        entry["runs"] += 1
+    
+    def save(self):
+        """Atomically write the measurements."""
+        if not self.path:
+            return
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.path.with_suffix(".tmp")
+            tmp.write_text(json.dumps(self.entries))
+            tmp.replace(self.path)
+        except OSError as e:
+            status(f"[WARN] Could not save server stats: {e}")
+
+def import_fan_in(files: list[FileInfo]) -> dict[str, int]:
+    """How many files import each file, matched on module name."""
+    counts = {}
+    for info in files:
+        for module in set(info.imports):
+            name = re.split(r"[./:]", module.strip("./:"))[-1]
+            counts[name] = counts.get(name, 0) + 1
+    
+    fan_in = {}
+    for info in files:
+        path = Path(info.path)
+        name = path.parent.name if path.stem in ("__init__", "index", "mod", "lib") else path.stem
+        fan_in[info.path] = counts.get(name, 0)
+    return fan_in
+
+def plan_hybrid(root: Path, files: list[FileInfo], entry_points: list[str],
+                startup: float, per_kb: float, budget: float) -> list[FileInfo]:
+    """Pick the files worth sending to the language server.
+    
+    Each file's value grows with its public symbols, how many files
+    import it and whether it is an entry point; its cost is its size at
+    the measured server throughput. Files are taken best value per
+    second first until the budget, less the server startup, is spent.
+    """
+    available = budget - startup
+    if available <= 0:
+        return []
+    
+    fan_in = import_fan_in(files)
+    ranked = []
+    for info in files:
+        public = sum(1 for sym, depth in iter_symbols(info.symbols)
+                     if not sym.name.startswith("_") and (depth == 0 or sym.kind == "method"))
+        if not public:
+            continue
+        value = public * (1 + fan_in.get(info.path, 0)) * (2 if info.path in entry_points else 1)
+        try:
+            size_kb = (root / info.path).stat().st_size / 1024
+        except OSError:
+            continue
+        cost = max(size_kb, 0.1) * per_kb
+        ranked.append((-value / cost, info.path, cost, info))
+    ranked.sort(key=lambda item: item[:2])
+    
+    selected = []
+    for _, _, cost, info in ranked:
+        if cost <= available:
+            selected.append(info)
+            available -= cost
+    return selected
+
+def merge_fallback_details(lsp_symbols: list[Symbol], fallback: list[Symbol]):
+    """Carry fallback-only details (calls, docstrings) over to LSP symbols."""
+    by_name = {}
+    for sym, _ in iter_symbols(fallback):
+        by_name.setdefault(sym.name, []).append(sym)
+    for sym, _ in iter_symbols(lsp_symbols):
+        candidates = by_name.get(sym.name)
+        if not candidates:
+            continue
+        match = min(candidates, key=lambda other: abs(other.line - sym.line))
+        sym.calls = sym.calls or match.calls
+        sym.docstring = sym.docstring or match.docstring
+
+def fill_call_hierarchy(client: LSPClient, files: list[FileInfo], deadline: float, workers: int) -> int:
+    """Replace Symbol.calls with outgoing calls from the server; returns the count."""
+    jobs = [sym for info in files for sym, _ in iter_symbols(info.symbols)
+            if sym.kind in CALL_HIERARCHY_KINDS]
+    filled = []
+    
+    def request(sym):
+        return client.get_call_hierarchy(Path(sym.file), sym.line - 1, sym.column)
+    
+    def on_result(sym, names):
+        if names is not None:
+            sym.calls = names
+            filled.append(sym)
+    
+    run_within_budget(jobs, request, deadline, workers, on_result)
+    return len(filled)
+
+def enrich_hybrid(root: Path, server: str, files: list[FileInfo], entry_points: list[str],
+                  options: AnalysisOptions, store: ContentStore,
+                  progress: Optional[ProgressReporter] = None):
+    """Upgrade the highest-value fallback files with LSP symbols and enrichment.
+    
+    Everything the server does (startup, symbols, hover, references,
+    call hierarchy) shares one `lsp_budget` deadline. Startup time and
+    throughput are measured and kept for the next run's plan.
+    """
+    cmd = get_lsp_command(server)
+    cache_dir = project_cache_dir(root, options.cache_dir)
+    stats = ServerStats(cache_dir / "server-stats.json" if cache_dir else None)
+    startup_estimate, per_kb = stats.estimate(server)
+    lsp_budget = within_deadline(options, options.lsp_budget)
+    selected = plan_hybrid(root, files, entry_points, startup_estimate, per_kb, lsp_budget)
+    if not cmd or not selected:
+        status(f"[INFO] Hybrid: no file worth starting {server} for "
+               f"(startup ~{startup_estimate:.0f}s, budget {lsp_budget:.0f}s)")
+        return
+    
+    deadline = time.monotonic() + lsp_budget
+    started = time.monotonic()
+    client = start_lsp_client(cmd, root, options)
+    if not client:
+        status(f"[WARN] Could not start LSP server {server}, keeping fallback results")
+        return
+    startup = time.monotonic() - started
+    if progress:
+        progress.watch(client)
+    
+    try:
+        began = time.monotonic()
+        enriched = []
+        size = 0
+        file_hashes = {}
+        for info in selected:
+            if time.monotonic() >= deadline:
+                break
+            file_path = root / info.path
+            client.open_file(file_path, info.language, store.text(file_path))
+            symbols = [lsp_symbol_to_symbol(sym, file_path) for sym in client.get_document_symbols(file_path)]
+            if symbols:
+                merge_fallback_details(symbols, info.symbols)
+                info.symbols = symbols
+            enriched.append(info)
+            size += store.size(file_path)
+            file_hashes[str(file_path)] = store.digest(file_path)
+        elapsed = time.monotonic() - began
+        stats.record(server, startup, elapsed / (size / 1024) if size else None)
+        
+        entry_names = entry_point_names(root, entry_points, store)
+        
+        def remaining() -> float:
+            return max(deadline - time.monotonic(), 0.0)
+        
+        if options.hover_budget > 0 and remaining():
+            cache = HoverCache(cache_dir / f"hover-{server}.json" if cache_dir else None)
+            enrich_with_hover(client, enriched, file_hashes, entry_names,
+                              replace(options, hover_budget=min(options.hover_budget, remaining())), cache)
+            cache.save()
+        if options.reference_budget > 0 and remaining():
+            harvest_references(
+                client, root, enriched, file_hashes, entry_names,
+                replace(options, reference_budget=min(options.reference_budget, remaining())),
+                cache_dir / f"references-{server}.json" if cache_dir else None, store
+            )
+        calls = fill_call_hierarchy(client, enriched, deadline, options.lsp_workers) if remaining() else 0
+    finally:
+        client.stop()
+        stats.save()
+        if progress:
+            progress.unwatch(client)
+    
+    status(f"[INFO] Hybrid: {server} enriched {len(enriched)}/{len(files)} files, "
+           f"{calls} call hierarchies (startup {startup:.1f}s)")
+
+# ============================================================================
+# Merging
+# ============================================================================
+
+def symbol_from_dict(data: dict) -> Symbol:
+    """Rebuild a Symbol (and its children) from its JSON form."""
+    known = {f.name for f in fields(Symbol)}
+    sym = Symbol(**{k: v for k, v in data.items() if k in known and k != "children"})
+    sym.children = [symbol_from_dict(child) for child in data.get("children", [])]
+    return sym
+
+def file_info_from_dict(data: dict) -> FileInfo:
+    """Rebuild a FileInfo from its JSON form."""
+    known = {f.name for f in fields(FileInfo)}
+    info = FileInfo(**{k: v for k, v in data.items() if k in known and k != "symbols"})
+    info.symbols = [symbol_from_dict(sym) for sym in data.get("symbols", [])]
+    return info
+
+def merge_analyses(parts: list[dict]) -> ProjectAnalysis:
+    """Combine partial (sharded) analysis outputs into one analysis.
+    
+    Files are deduplicated by path, entry points and dependencies are
+    deduplicated in order, and call-graph edges left unresolved by one
+    shard are resolved against the symbols of all shards.
+    """
+    first = parts[0]
+    files = {}
+    entry_points = []
+    dependencies = {"runtime": [], "dev": []}
+    skipped = {}
+    shards = []
+    
+    for part in parts:
+        for data in part.get("files", []):
+            files[data["path"]] = data
+        for entry in part.get("entry_points", []):
+            if entry not in entry_points:
+                entry_points.append(entry)
+        for kind, names in part.get("dependencies", {}).items():
+            for name in names:
+                if name not in dependencies.setdefault(kind, []):
+                    dependencies[kind].append(name)
+        metadata = part.get("metadata", {})
+        for reason, n in metadata.get("skipped", {}).items():
+            skipped[reason] = skipped.get(reason, 0) + n
+        if "shard" in metadata:
+            shards.append(metadata["shard"])
+    
+    if shards:
+        count = shards[0]["count"]
+        missing = sorted(set(range(1, count + 1)) - {s["index"] for s in shards})
+        if missing or any(s["count"] != count for s in shards):
+            print(f"[WARN] Incomplete shard set: missing {missing} of {count}", file=sys.stderr)
+    
+    ordered = [files[path] for path in sorted(files)]
+    infos = [file_info_from_dict(data) for data in ordered]
+    languages = {}
+    for info in infos:
+        languages[info.language] = languages.get(info.language, 0) + 1
+    framework_evidence = detect_frameworks(infos, dependencies)
+    
+    return ProjectAnalysis(
+        name=first.get("name", ""),
+        root=first.get("root", ""),
+        language=first.get("language", "unknown"),
+        framework=next(iter(framework_evidence), ""),
+        framework_evidence=framework_evidence,
+        languages=languages,
+        entry_points=entry_points,
+        files=ordered,
+        dependencies=dependencies,
+        call_graph=stitch_call_graphs([part.get("call_graph", {}) for part in parts], infos),
+        module_graph=build_module_graph(Path(first.get("root", ".")), infos),
+        metadata={"skipped": skipped, "merged_shards": len(parts)}
+    )
+
+def merge_main(argv: list[str]):
+    """`lsp_analyzer.py merge part1.json part2.json ... -o analysis.json`"""
+    parser = argparse.ArgumentParser(prog="lsp_analyzer.py merge",
+                                     description="Merge sharded analysis outputs")
+    parser.add_argument("parts", nargs="+", help="Partial analysis JSON files")
+    parser.add_argument("--output", "-o", help="Output JSON file (default: stdout)")
+    args = parser.parse_args(argv)
+    
+    parts = []
+    for part in args.parts:
+        path = Path(part)
+        if not path.exists():
+            print(f"Error: {path} not found", file=sys.stderr)
+            sys.exit(1)
+        parts.append(json.loads(path.read_text()))
+    
+    result = asdict(merge_analyses(parts))
+    if args.output:
+        Path(args.output).write_text(json.dumps(result, indent=2))
+        print(f"[INFO] Merged {len(parts)} analyses into {args.output}", file=sys.stderr)
+    else:
+        print(json.dumps(result, indent=2))
+
+# ============================================================================
+# Incremental Analysis
+# ============================================================================
+
+DEPENDENCY_MANIFESTS = {"package.json", "requirements.txt", "pyproject.toml", "go.mod"}
+
+def git_changes(root: Path, since: str) -> dict:
+    """Files changed in the working tree since `since`, relative to root.
+    
+    Returns {"added": [...], "modified": [...], "deleted": [...],
+    "renamed": [(old, new, similarity), ...]}, including untracked files.
+    Raises RuntimeError when git fails.
+    """
+    def git(*args) -> list[str]:
+        result = subprocess.run(["git", "-C", str(root), *args], capture_output=True)
+        if result.returncode != 0:
+            message = result.stderr.decode(errors="ignore").strip().splitlines()
+            raise RuntimeError(message[0] if message else "git failed")
+        return [token for token in result.stdout.decode(errors="surrogateescape").split("\0") if token]
+    
+    changes = {"added": [], "modified": [], "deleted": [], "renamed": []}
+    tokens = git("diff", "--name-status", "-M", "-z", "--relative", since, "--")
+    i = 0
+    while i < len(tokens):
+        status = tokens[i]
+        if status[0] in "RC":
+            old, new = tokens[i + 1], tokens[i + 2]
+            if status[0] == "R":
+                changes["renamed"].append((old, new, int(status[1:] or 0)))
+            else:
+                changes["added"].append(new)
+            i += 3
+            continue
+        path = tokens[i + 1]
+        if status == "A":
+            changes["added"].append(path)
+        elif status == "D":
+            changes["deleted"].append(path)
+        else:
+            changes["modified"].append(path)  # M, T, U
+        i += 2
+    
+    changes["added"].extend(git("ls-files", "--others", "--exclude-standard", "-z"))
+    return changes
+
+def is_analyzable(root: Path, rel_path: str, matcher: Optional[IgnoreMatcher]) -> bool:
+    """Whether a changed path would be picked up by a full walk.
+    
+    Ignore files are loaded into `matcher` on demand along the path, so
+    one matcher serves every changed file of a run.
+    """
+    parts = rel_path.split("/")
+    if not language_for_path(Path(rel_path)) or any(part in EXCLUDE_DIRS for part in parts[:-1]):
+        return False
+    if not (root / rel_path).is_file():
+        return False
+    if matcher is None:
+        return True
+    for depth in range(len(parts)):
+        rel_dir = "/".join(parts[:depth])
+        if rel_dir not in matcher.loaded:
+            matcher.load_dir(rel_dir, [name for name in IGNORE_FILES if (root / rel_dir / name).exists()])
+            matcher.loaded.add(rel_dir)
+        if depth and matcher.is_ignored(rel_dir, True):
+            return False
+    return not matcher.is_ignored(rel_path)
+
+def patch_call_graph(graph: dict, files: list[FileInfo], stale_paths: set,
+                     renames: dict, affected_names: set, changed_paths: set) -> dict:
+    """Update a call graph after files changed, without rebuilding it.
+    
+    Keys are rewritten for renamed files, edges from or into stale files
+    are dropped, and edges are recomputed for the changed files and for
+    unchanged callers of any name defined in a stale file.
+    """
+    def rename(key: str) -> str:
+        if key.startswith(UNRESOLVED_CALL):
+            return key
+        path, name = key.rsplit(":", 1)
+        return f"{renames.get(path, path)}:{name}"
+    
+    def stale(key: str) -> bool:
+        return not key.startswith(UNRESOLVED_CALL) and key.rsplit(":", 1)[0] in stale_paths
+    
+    patched = {}
+    for caller, callees in graph.items():
+        if stale(caller):
+            continue
+        kept = [rename(callee) for callee in callees if not stale(callee)]
+        if kept:
+            patched[rename(caller)] = kept
+    
+    index = symbol_index(files)
+    for info in files:
+        for key, sym in iter_keyed_symbols(info):
+            if info.path in changed_paths or affected_names.intersection(sym.calls):
+                edges = resolve_edges(key, sym, info.path, index)
+                if edges:
+                    patched[key] = edges
+                else:
+                    patched.pop(key, None)
+    return patched
+
+def relocate_symbols(symbols: list[Symbol], old_prefix: str, new_prefix: str):
+    """Rewrite the absolute file paths recorded on symbols."""
+    for sym in symbols:
+        if sym.file.startswith(old_prefix):
+            sym.file = new_prefix + sym.file[len(old_prefix):]
+        relocate_symbols(sym.children, old_prefix, new_prefix)
+
+def analyze_incremental(root: Path, base: dict, since: str, use_lsp: bool = True,
+                        options: Optional[AnalysisOptions] = None,
+                        on_file: Optional[Callable[[dict], None]] = None) -> ProjectAnalysis:
+    """Patch a previous analysis with the files changed since a git revision.
+    
+    Only added, modified and content-changing renames are re-analyzed;
+    deleted files are dropped, pure renames only rewrite paths, and the
+    affected call-graph edges are recomputed.
+    """
+    root = root.resolve()
+    options = options or AnalysisOptions()
+    changes = git_changes(root, since)
+    
+    files = {data["path"]: file_info_from_dict(data) for data in base.get("files", [])}
+    if base.get("root") and base["root"] != str(root):
+        # Base produced in another checkout: move absolute paths over
+        for info in files.values():
+            relocate_symbols(info.symbols, base["root"], str(root))
+    
+    deleted = set(changes["deleted"])
+    renames = {}
+    to_analyze = set(changes["added"]) | set(changes["modified"])
+    for old, new, similarity in changes["renamed"]:
+        deleted.discard(new)
+        renames[old] = new
+        if similarity < 100 or old not in files:
+            to_analyze.add(new)
+    
+    # Pure renames keep their edges; everything else is recomputed. Names
+    # defined by the outgoing versions need their callers re-resolved.
+    stale = deleted | to_analyze | {old for old, new in renames.items() if new in to_analyze}
+    affected_names = set()
+    for path in stale:
+        if path in files:
+            affected_names.update(sym.name for _, sym in iter_keyed_symbols(files[path]))
+    
+    for path in deleted:
+        files.pop(path, None)
+    for old, new in renames.items():
+        info = files.pop(old, None)
+        if info and new not in to_analyze:
+            relocate_symbols(info.symbols, str(root / old), str(root / new))
+            info.path = new
+            files[new] = info
+    
+    groups = {}
+    matcher = IgnoreMatcher(root) if options.use_ignore_files else None
+    for path in sorted(to_analyze):
+        files.pop(path, None)
+        if is_analyzable(root, path, matcher):
+            file_path = root / path
+            language = language_for_path(file_path)
+            if language == "javascript" and "typescript" in base.get("languages", {}):
+                language = "typescript"
+            groups.setdefault(language, []).append(file_path)
+    
+    print(f"[INFO] Since {since}: {len(to_analyze)} to analyze, {len(deleted)} deleted, "
+          f"{len(renames)} renamed", file=sys.stderr)
+    entry_names = {lang: find_entry_points(root, lang, paths) for lang, paths in groups.items()}
+    progress = ProgressReporter.create(options.progress, sum(len(paths) for paths in groups.values()))
+    with progress or contextlib.nullcontext():
+        for info in analyze_groups(root, groups, entry_names, use_lsp, options, progress=progress):
+            files[info.path] = info
+    
+    infos = [files[path] for path in sorted(files)]
+    for path in to_analyze:
+        # New definitions can resolve (or make ambiguous) calls elsewhere
+        if path in files:
+            affected_names.update(sym.name for _, sym in iter_keyed_symbols(files[path]))
+    
+    # Entry points and dependencies only change with the files behind them
+    entry_points = [renames.get(e, e) for e in base.get("entry_points", []) if e not in deleted]
+    for lang, paths in groups.items():
+        for entry in find_entry_points(root, lang, paths):
+            if entry not in entry_points:
+                entry_points.append(entry)
+    touched = {Path(p).name for p in deleted | set(renames) | set(changes["added"]) | set(changes["modified"])}
+    dependencies = base.get("dependencies", {})
+    if touched & DEPENDENCY_MANIFESTS:
+        dependencies = get_all_dependencies(root, list(base.get("languages", {})) or [base.get("language", "")])
+    
+    records = [asdict(info) for info in infos]
+    if on_file:
+        for record in records:
+            on_file(record)
+    
+    languages, skipped = summarize_files(infos)
+    framework_evidence = detect_frameworks(infos, dependencies)
+    metadata = dict(base.get("metadata", {}))
+    metadata["skipped"] = skipped
+    metadata["incremental"] = {
+        "since": since,
+        "analyzed": sorted(to_analyze),
+        "deleted": sorted(deleted),
+        "renamed": renames
+    }
+    
+    return ProjectAnalysis(
+        name=base.get("name", root.name),
+        root=str(root),
+        language=base.get("language", "unknown"),
+        framework=next(iter(framework_evidence), ""),
+        framework_evidence=framework_evidence,
+        languages=languages,
+        entry_points=entry_points,
+        files=records,
+        dependencies=dependencies,
+        call_graph=patch_call_graph(base.get("call_graph", {}), infos, stale, renames,
+                                    affected_names, to_analyze),
+        module_graph=build_module_graph(root, infos),
+        metadata=metadata
+    )
+
 # ============================================================================
 # CLI
 # ============================================================================
 
+def parse_shard(value: str) -> tuple[int, int]:
+    """Parse `K/N` (1-based shard K of N)."""
+    match = re.fullmatch(r"(\d+)/(\d+)", value)
+    if not match or not 1 <= int(match.group(1)) <= int(match.group(2)):
+        raise argparse.ArgumentTypeError(f"expected K/N with 1 <= K <= N, got {value!r}")
+    return int(match.group(1)), int(match.group(2))
+
+def add_analysis_arguments(parser: argparse.ArgumentParser):
+    """Register the analysis tuning options shared by the CLI scripts."""
+    defaults = AnalysisOptions()
+    parser.add_argument("--hover-budget", type=float, default=defaults.hover_budget, metavar="SECONDS",
+                        help="Wall-clock budget for LSP hover enrichment (0 disables)")
+    parser.add_argument("--reference-budget", type=float, default=defaults.reference_budget, metavar="SECONDS",
+                        help="Wall-clock budget for LSP reference counts (0 disables)")
+    parser.add_argument("--max-file-size", type=int, default=defaults.max_file_size // 1024, metavar="KB",
+                        help="Files above this size get a streamed outline instead of full analysis")
+    parser.add_argument("--no-ignore-files", action="store_true",
+                        help="Do not honor .gitignore/.agentignore rules")
+    parser.add_argument("--shard", type=parse_shard, metavar="K/N",
+                        help="Analyze only shard K of N (combine with `lsp_analyzer.py merge`)")
+    parser.add_argument("--cache-dir", default="", help="Cache directory (default: ~/.cache/wiki-generator-lsp)")
+    parser.add_argument("--no-cache", action="store_true", help="Do not read or write the persistent cache")
+    parser.add_argument("--mode", choices=["auto", "hybrid"], default=defaults.mode,
+                        help="auto: LSP when a server exists; hybrid: fallback for all files, LSP for the most valuable")
+    parser.add_argument("--lsp-budget", type=float, default=defaults.lsp_budget, metavar="SECONDS",
+                        help="Hybrid mode: wall-clock budget per language server, startup included")
+    parser.add_argument("--daemon", nargs="?", const="", default=None, metavar="SOCKET",
+                        help="Reuse warm servers from lsp_daemon.py (started on demand)")
+    parser.add_argument("--resume", action="store_true",
+                        help="Continue an interrupted run from its checkpoint journal (not with --no-cache)")
+    parser.add_argument("--time-budget", type=float, default=0.0, metavar="SECONDS",
+                        help="Stop after this long; the most important files are analyzed first")
+    parser.add_argument("--max-memory", type=int, default=0, metavar="MB",
+                        help="Spill finished file records to disk to keep memory under this cap")
+    parser.add_argument("--progress", choices=["auto", "tty", "json", "off"], default=defaults.progress,
+                        help="Progress on stderr: status line (tty), JSON lines (json); auto picks by terminal")
+    parser.add_argument("--outline", action="store_true",
+                        help="Python fallback: outline definitions from a lexer instead of a full AST (no call graph)")
+
+def options_from_args(args: argparse.Namespace) -> AnalysisOptions:
+    """Build AnalysisOptions from parsed command-line arguments."""
+    if args.resume and args.no_cache:
+        # The checkpoint journal lives in the cache directory
+        print("Error: --resume needs the cache; drop --no-cache", file=sys.stderr)
+        sys.exit(1)
+    return AnalysisOptions(
+        hover_budget=args.hover_budget,
+        reference_budget=args.reference_budget,
+        max_file_size=args.max_file_size * 1024,
+        use_ignore_files=not args.no_ignore_files,
+        shard=args.shard,
+        cache_dir=None if args.no_cache else args.cache_dir,
+        mode=args.mode,
+        lsp_budget=args.lsp_budget,
+        daemon=args.daemon,
+        resume=args.resume,
+        progress=args.progress,
+        max_memory=args.max_memory << 20,
+        time_budget=args.time_budget,
+        outline=args.outline
+    )
+
+def add_incremental_arguments(parser: argparse.ArgumentParser):
+    """Register --since/--base for git-diff-driven incremental runs."""
+    parser.add_argument("--since", metavar="REV",
+                        help="Re-analyze only files changed since this git revision (needs --base)")
+    parser.add_argument("--base", metavar="ANALYSIS_JSON",
+                        help="Previous analysis to patch with --since")
+
+def run_analysis(root: Path, args: argparse.Namespace,
+                 on_file: Optional[Callable[[dict], None]] = None) -> ProjectAnalysis:
+    """Full or incremental analysis, as selected by the parsed arguments."""
+    options = options_from_args(args)
+    if args.since or args.base:
+        if not (args.since and args.base and Path(args.base).exists()):
+            print("Error: --since and --base must be used together, with an existing base", file=sys.stderr)
+            sys.exit(1)
+        base = json.loads(Path(args.base).read_text())
+        try:
+            return analyze_incremental(root, base, args.since, use_lsp=not args.no_lsp, options=options,
+                                       on_file=on_file)
+        except RuntimeError as e:
+            print(f"[WARN] Incremental analysis unavailable ({e}), running a full analysis", file=sys.stderr)
+    return analyze_project(root, use_lsp=not args.no_lsp, options=options, on_file=on_file)
+
 def main():
-    parser = argparse.ArgumentParser(description="Analyze codebase using LSP")
+    if sys.argv[1:2] == ["merge"]:
+        merge_main(sys.argv[2:])
+        return
+    
+    parser = argparse.ArgumentParser(description="Analyze codebase using LSP",
+                                     epilog="Subcommand: lsp_analyzer.py merge PART.json... -o OUT.json")
     parser.add_argument("path", help="Path to project root")
     parser.add_argument("--output", "-o", help="Output JSON file (default: stdout)")
     parser.add_argument("--no-lsp", action="store_true", help="Skip LSP, use fallback only")
+    add_analysis_arguments(parser)
+    add_incremental_arguments(parser)
     args = parser.parse_args()
     
     root = Path(args.path)
@@ -721,14 +4425,15 @@ def main():
         print(f"Error: {root} does not exist", file=sys.stderr)
         sys.exit(1)
     
-    analysis = analyze_project(root, use_lsp=not args.no_lsp)
-    result = asdict(analysis)
+    analysis = run_analysis(root, args)
     
     if args.output:
-        Path(args.output).write_text(json.dumps(result, indent=2))
+        with open(args.output, "w") as out:
+            write_analysis(analysis, out)
         print(f"[INFO] Analysis saved to {args.output}", file=sys.stderr)
     else:
-        print(json.dumps(result, indent=2))
+        write_analysis(analysis, sys.stdout)
+        print()
 
 if __name__ == "__main__":
     main()
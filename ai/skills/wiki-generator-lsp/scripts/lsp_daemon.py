@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+"""
+Keep language servers warm across analysis runs.
+Usage: python lsp_daemon.py [--socket PATH] [--idle-timeout SECONDS]
+       python lsp_daemon.py --status | --stop
+
+Clients (`lsp_analyzer.py --daemon`) attach over a Unix domain socket and
+talk plain LSP; the daemon forwards their traffic to one server per
+(workspace root, server command), started on first use and stopped after
+sitting idle.
+"""
+
+import sys
+import json
+import time
+import socket
+import hashlib
+import argparse
+import threading
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+# Import from sibling scripts
+script_dir = Path(__file__).parent
+sys.path.insert(0, str(script_dir))
+
+from lsp_analyzer import LSPClient, default_daemon_socket, read_frame, write_frame
+
+DEFAULT_IDLE_TIMEOUT = 900.0  # seconds a server may sit unused
+REQUEST_TIMEOUT = 120.0  # warm servers answer fast; cold indexing may not
+
+# ============================================================================
+# Warm Servers
+# ============================================================================
+
+class WarmServer:
+    """One running language server shared by every attached client."""
+    
+    def __init__(self, root: Path, command: list):
+        self.root = root
+        self.command = command
+        self.client = LSPClient(command, root, timeout=REQUEST_TIMEOUT)
+        self.documents = {}  # uri -> (version, sha1 of text)
+        self.sessions = 0
+        self.last_used = time.monotonic()
+        self.lock = threading.Lock()
+    
+    def start(self) -> bool:
+        return self.client.start()
+    
+    def alive(self) -> bool:
+        return self.client.process is not None and self.client.process.poll() is None
+    
+    def sync_document(self, params: dict):
+        """Forward a didOpen only when the server's copy is missing or stale."""
+        document = params.get("textDocument", {})
+        uri = document.get("uri", "")
+        text = document.get("text", "")
+        digest = hashlib.sha1(text.encode()).hexdigest()
+        with self.lock:
+            known = self.documents.get(uri)
+            if known and known[1] == digest:
+                return
+            version = known[0] + 1 if known else 1
+            self.documents[uri] = (version, digest)
+        if known:
+            self.client.notify("textDocument/didChange", {
+                "textDocument": {"uri": uri, "version": version},
+                "contentChanges": [{"text": text}]
+            })
+        else:
+            self.client.notify("textDocument/didOpen", {
+                "textDocument": dict(document, version=version)
+            })
+    
+    def stop(self):
+        self.client.stop()
+
+# ============================================================================
+# Daemon
+# ============================================================================
+
+class LSPDaemon:
+    """Accepts clients on a Unix socket and multiplexes them onto warm servers."""
+    
+    def __init__(self, socket_path: Path, idle_timeout: float = DEFAULT_IDLE_TIMEOUT):
+        self.socket_path = socket_path
+        self.idle_timeout = idle_timeout
+        self.servers = {}  # (root, command) -> WarmServer
+        self.lock = threading.Lock()
+        self.sessions = 0
+        self.idle_since = time.monotonic()
+        self.running = True
+        # Requests are forwarded from worker threads so one slow answer
+        # does not hold up the rest of a client's traffic
+        self.executor = ThreadPoolExecutor(max_workers=32)
+    
+    def serve_forever(self):
+        listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        listener.bind(str(self.socket_path))
+        self.socket_path.chmod(0o600)
+        listener.listen()
+        listener.settimeout(1.0)
+        print(f"[INFO] LSP daemon listening on {self.socket_path}", file=sys.stderr)
+        
+        threading.Thread(target=self._reap_loop, daemon=True).start()
+        try:
+            while self.running:
+                try:
+                    conn, _ = listener.accept()
+                except socket.timeout:
+                    continue
+                conn.settimeout(None)
+                threading.Thread(target=self._serve_client, args=(conn,), daemon=True).start()
+        finally:
+            listener.close()
+            try:
+                self.socket_path.unlink()
+            except OSError:
+                pass
+            with self.lock:
+                servers, self.servers = list(self.servers.values()), {}
+            for server in servers:
+                server.stop()
+            self.executor.shutdown(wait=False, cancel_futures=True)
+    
+    def _attach(self, params: dict) -> tuple[Optional[WarmServer], bool]:
+        """Warm server for a workspace, started on first use."""
+        key = (str(Path(params.get("root", "")).resolve()), tuple(params.get("command", [])))
+        with self.lock:
+            server = self.servers.get(key)
+            if server and not server.alive():
+                del self.servers[key]
+                server = None
+            if server:
+                server.sessions += 1
+                return server, True
+            server = WarmServer(Path(key[0]), list(key[1]))
+            server.sessions += 1
+            self.servers[key] = server
+        
+        # Started outside the registry lock: indexing can take minutes
+        with server.lock:
+            started = server.alive() or server.start()
+        if not started:
+            with self.lock:
+                self.servers.pop(key, None)
+            return None, False
+        return server, False
+    
+    def _detach(self, server: Optional[WarmServer]):
+        with self.lock:
+            self.sessions -= 1
+            if not self.sessions:
+                self.idle_since = time.monotonic()
+            if server:
+                server.sessions -= 1
+                server.last_used = time.monotonic()
+    
+    def _serve_client(self, conn: socket.socket):
+        """Relay one client's LSP traffic until it detaches."""
+        with self.lock:
+            self.sessions += 1
+        reader, writer = conn.makefile("rb"), conn.makefile("wb")
+        write_lock = threading.Lock()
+        server = None
+        
+        def reply(message_id, result=None, error: Optional[str] = None):
+            message = {"jsonrpc": "2.0", "id": message_id}
+            if error:
+                message["error"] = {"code": -32603, "message": error}
+            else:
+                message["result"] = result
+            try:
+                with write_lock:
+                    write_frame(writer, message)
+            except OSError:
+                pass
+        
+        def forward(message: dict):
+            server.last_used = time.monotonic()
+            response = server.client.request_response(message["method"], message.get("params", {}))
+            if response is None:
+                reply(message["id"], error="language server did not answer")
+            elif "error" in response:
+                reply(message["id"], error=response["error"].get("message") or "request failed")
+            else:
+                reply(message["id"], response.get("result"))
+        
+        try:
+            while self.running:
+                message = read_frame(reader)
+                if message is None:
+                    break
+                method = message.get("method", "")
+                message_id = message.get("id")
+                
+                if method == "daemon/attach":
+                    server, warm = self._attach(message.get("params", {}))
+                    if server:
+                        reply(message_id, {"warm": warm})
+                    else:
+                        reply(message_id, error="could not start language server")
+                elif method == "daemon/status":
+                    reply(message_id, self.status())
+                elif method == "daemon/shutdown":
+                    self.running = False
+                    reply(message_id, True)
+                elif method == "exit":
+                    break
+                elif server is None:
+                    if message_id is not None:
+                        reply(message_id, error="not attached")
+                elif method == "initialize":
+                    # The server was initialized when it started
+                    reply(message_id, {"capabilities": server.client.capabilities})
+                elif method == "shutdown":
+                    reply(message_id)
+                elif method in ("initialized", "textDocument/didClose"):
+                    continue  # documents stay open for the next run
+                elif method == "textDocument/didOpen":
+                    server.sync_document(message.get("params", {}))
+                elif message_id is not None:
+                    self.executor.submit(forward, message)
+                else:
+                    server.client.notify(method, message.get("params", {}))
+        finally:
+            conn.close()
+            self._detach(server)
+    
+    def status(self) -> dict:
+        with self.lock:
+            now = time.monotonic()
+            return {
+                "sessions": self.sessions,
+                "servers": [
+                    {"root": str(server.root), "command": server.command, "sessions": server.sessions,
+                     "documents": len(server.documents), "idle": round(now - server.last_used, 1)}
+                    for server in self.servers.values()
+                ]
+            }
+    
+    def _reap_loop(self):
+        """Stop servers idle past the timeout; exit once nothing is left."""
+        interval = max(min(self.idle_timeout / 4, 30.0), 0.5)
+        while self.running:
+            time.sleep(interval)
+            now = time.monotonic()
+            with self.lock:
+                idle = [key for key, server in self.servers.items()
+                        if not server.sessions and (now - server.last_used > self.idle_timeout
+                                                    or not server.alive())]
+                reaped = [self.servers.pop(key) for key in idle]
+                if not self.servers and not self.sessions and now - self.idle_since > self.idle_timeout:
+                    self.running = False
+            for server in reaped:
+                print(f"[INFO] Stopping idle {server.command[0]} for {server.root}", file=sys.stderr)
+                server.stop()
+
+# ============================================================================
+# CLI
+# ============================================================================
+
+def call_daemon(socket_path: Path, method: str) -> Optional[dict]:
+    """Send one control request to a running daemon."""
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.connect(str(socket_path))
+            writer, reader = sock.makefile("wb"), sock.makefile("rb")
+            write_frame(writer, {"jsonrpc": "2.0", "id": 1, "method": method, "params": {}})
+            response = read_frame(reader)
+    except OSError:
+        return None
+    return response
+
+def main():
+    parser = argparse.ArgumentParser(description="Keep language servers warm across analysis runs")
+    parser.add_argument("--socket", default=None, help="Unix socket path (default: in the cache directory)")
+    parser.add_argument("--idle-timeout", type=float, default=DEFAULT_IDLE_TIMEOUT, metavar="SECONDS",
+                        help="Stop servers unused for this long, and the daemon once none are left")
+    parser.add_argument("--status", action="store_true", help="Show the running daemon's servers")
+    parser.add_argument("--stop", action="store_true", help="Stop the running daemon")
+    args = parser.parse_args()
+    
+    socket_path = Path(args.socket) if args.socket else default_daemon_socket()
+    
+    if args.status or args.stop:
+        response = call_daemon(socket_path, "daemon/shutdown" if args.stop else "daemon/status")
+        if response is None:
+            print(f"No daemon running at {socket_path}", file=sys.stderr)
+            sys.exit(1)
+        print(json.dumps(response.get("result"), indent=2))
+        return
+    
+    if socket_path.exists():
+        if call_daemon(socket_path, "daemon/status") is not None:
+            print(f"Error: a daemon is already running at {socket_path}", file=sys.stderr)
+            sys.exit(1)
+        socket_path.unlink()  # left behind by a daemon that died
+    socket_path.parent.mkdir(parents=True, exist_ok=True)
+    
+    LSPDaemon(socket_path, args.idle_timeout).serve_forever()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+"""
+Compile and render the wiki layout template.
+
+The layout lives in a fenced ```` ```wiki-template ```` block of
+references/wiki-template.md. It is parsed once into a render plan (a
+JSON tree), cached on disk under the template's hash, and rendered by
+writing each piece straight to the output stream.
+
+Syntax, a small Jinja subset:
+
+    {{ project.name }}            value, dotted lookup
+    {{ component | component }}   value through a filter
+    {% section overview %}        section slot, filled by a generator
+    {% diagram classes %}         diagram slot
+    {% for x in components %} ... {% else %} ... {% endfor %}
+    {% if modules %} ... {% else %} ... {% endif %}
+    {# comment #}
+
+A block tag or comment alone on its line takes the whole line with it.
+"""
+
+import re
+import sys
+import json
+import hashlib
+from pathlib import Path
+from typing import Optional, TextIO
+
+ENGINE_VERSION = 1  # bump when the plan format changes
+DEFAULT_TEMPLATE = Path(__file__).parent.parent / "references" / "wiki-template.md"
+
+TAG_PATTERN = re.compile(r"\{\{(.*?)\}\}|\{%(.*?)%\}|\{#.*?#\}", re.S)
+FENCE_PATTERN = re.compile(r"^(`{3,}|~{3,})[ \t]*wiki-template[ \t]*$", re.M)
+
+class TemplateError(ValueError):
+    """A template that cannot be compiled or rendered."""
+
+# ============================================================================
+# Compilation
+# ============================================================================
+
+def extract_template(text: str) -> str:
+    """Body of the first `wiki-template` fenced block in a markdown file."""
+    match = FENCE_PATTERN.search(text)
+    if not match:
+        raise TemplateError("no ```wiki-template block found")
+    fence = match.group(1)
+    start = match.end() + 1
+    end = re.compile(rf"^{re.escape(fence[0])}{{{len(fence)},}}[ \t]*$", re.M).search(text, start)
+    if not end:
+        raise TemplateError("unterminated wiki-template block")
+    return text[start:end.start()]
+
+def tokenize(source: str) -> list:
+    """(kind, content, line) tokens; standalone block tags take their line."""
+    tokens = []
+    pos = 0
+    for match in TAG_PATTERN.finditer(source):
+        start, end = match.start(), match.end()
+        line = source.count("\n", 0, start) + 1
+        if match.group(1) is None:
+            # Block tag or comment: trim it with its line when it stands alone
+            line_start = source.rfind("\n", 0, start) + 1
+            if not source[line_start:start].strip() and source[end:end + 1] in ("\n", ""):
+                tokens.append(("text", source[pos:line_start], line))
+                pos = end + 1
+            else:
+                tokens.append(("text", source[pos:start], line))
+                pos = end
+        else:
+            tokens.append(("text", source[pos:start], line))
+            pos = end
+        if match.group(1) is not None:
+            tokens.append(("value", match.group(1).strip(), line))
+        elif match.group(2) is not None:
+            tokens.append(("block", match.group(2).strip(), line))
+    tokens.append(("text", source[pos:], source.count("\n") + 1))
+    return [token for token in tokens if token[0] != "text" or token[1]]
+
+def parse_value(expression: str, line: int) -> list:
+    """["value", path, filters] for `a.b | filter`."""
+    path, *filters = [part.strip() for part in expression.split("|")]
+    if not re.fullmatch(r"\w+(\.\w+)*", path) or not all(re.fullmatch(r"\w+", f) for f in filters):
+        raise TemplateError(f"line {line}: bad expression {{{{ {expression} }}}}")
+    return ["value", path.split("."), filters]
+
+def compile_template(source: str) -> list:
+    """Parse template source into a render plan.
+    
+    Nodes: ["text", s], ["value", path, filters], ["section", name],
+    ["diagram", name], ["for", var, path, body, else_body] and
+    ["if", path, body, else_body].
+    """
+    root = []
+    stack = []  # (node, open tag, line, enclosing body)
+    body = root
+    for kind, content, line in tokenize(source):
+        if kind == "text":
+            body.append(["text", content])
+            continue
+        if kind == "value":
+            body.append(parse_value(content, line))
+            continue
+        
+        words = content.split()
+        tag = words[0] if words else ""
+        if tag in ("section", "diagram") and len(words) == 2:
+            body.append([tag, words[1]])
+        elif tag == "for" and len(words) == 4 and words[2] == "in":
+            node = ["for", words[1], words[3].split("."), [], []]
+            body.append(node)
+            stack.append((node, "for", line, body))
+            body = node[3]
+        elif tag == "if" and len(words) == 2:
+            node = ["if", words[1].split("."), [], []]
+            body.append(node)
+            stack.append((node, "if", line, body))
+            body = node[2]
+        elif tag == "else" and len(words) == 1 and stack and body is not stack[-1][0][-1]:
+            body = stack[-1][0][-1]
+        elif tag in ("endfor", "endif") and len(words) == 1 and stack and stack[-1][1] == tag[3:]:
+            body = stack.pop()[3]
+        else:
+            raise TemplateError(f"line {line}: unexpected {{% {content} %}}")
+    if stack:
+        node, tag, line, _ = stack[-1]
+        raise TemplateError(f"line {line}: {{% {tag} %}} is never closed")
+    return root
+
+# ============================================================================
+# Plan Cache
+# ============================================================================
+
+_plans = {}  # digest -> plan, for repeated renders in one process
+
+def template_digest(source: str) -> str:
+    return hashlib.sha256(f"{ENGINE_VERSION}\n{source}".encode()).hexdigest()[:16]
+
+def load_plan(path: Optional[Path] = None, cache_dir: Optional[Path] = None) -> list:
+    """Render plan for a template file, compiled once per template hash.
+    
+    Plans are kept in memory and in `cache_dir/templates/`; an edited
+    template has a new hash and is compiled afresh.
+    """
+    path = path or DEFAULT_TEMPLATE
+    try:
+        source = extract_template(path.read_text())
+    except OSError as e:
+        raise TemplateError(f"cannot read template {path}: {e}") from e
+    digest = template_digest(source)
+    if digest in _plans:
+        return _plans[digest]
+    
+    cache_file = cache_dir / "templates" / f"{digest}.json" if cache_dir else None
+    plan = None
+    if cache_file and cache_file.exists():
+        try:
+            plan = json.loads(cache_file.read_text())
+        except (OSError, ValueError):
+            plan = None
+    if plan is None:
+        plan = compile_template(source)
+        if cache_file:
+            try:
+                cache_file.parent.mkdir(parents=True, exist_ok=True)
+                temp = cache_file.with_suffix(".tmp")
+                temp.write_text(json.dumps(plan))
+                temp.replace(cache_file)
+            except OSError as e:
+                print(f"[WARN] Could not cache template plan: {e}", file=sys.stderr)
+    _plans[digest] = plan
+    return plan
+
+# ============================================================================
+# Rendering
+# ============================================================================
+
+def resolved(value, memo: Optional[dict] = None):
+    """A callable's result, computed once per `memo`; other values as-is."""
+    if not callable(value):
+        return value
+    if memo is None:
+        return value()
+    if value not in memo:  # equal bound methods share one entry
+        memo[value] = value()
+    return memo[value]
+
+def lookup(path: list, scopes: list, memo: Optional[dict] = None):
+    """Resolve a dotted path against the innermost scope defining its head."""
+    for scope in reversed(scopes):
+        if path[0] in scope:
+            value = scope[path[0]]
+            break
+    else:
+        raise TemplateError(f"unknown name {'.'.join(path)!r}")
+    for key in path[1:]:
+        value = value.get(key) if isinstance(value, dict) else getattr(value, key, None)
+    return resolved(value, memo)
+
+def render_plan(plan: list, context: dict, out: TextIO, filters: Optional[dict] = None,
+                scopes: Optional[list] = None, memo: Optional[dict] = None):
+    """Write a rendered plan to `out`.
+    
+    `context` holds the values, plus `sections` and `diagrams` dicts of
+    zero-argument callables for the slots. Callables anywhere in the
+    context are called when first used, and only once per render, so
+    unused aggregates cost nothing.
+    """
+    filters = filters or {}
+    scopes = scopes or [context]
+    memo = {} if memo is None else memo
+    for node in plan:
+        kind = node[0]
+        if kind == "text":
+            out.write(node[1])
+        elif kind == "value":
+            value = lookup(node[1], scopes, memo)
+            for name in node[2]:
+                if name not in filters:
+                    raise TemplateError(f"unknown filter {name!r}")
+                value = filters[name](value)
+            out.write("" if value is None else str(value))
+        elif kind in ("section", "diagram"):
+            slots = context.get(kind + "s", {})
+            if node[1] not in slots:
+                raise TemplateError(f"unknown {kind} {node[1]!r}")
+            out.write(resolved(slots[node[1]], memo))
+        elif kind == "for":
+            items = lookup(node[2], scopes, memo) or []
+            for item in items:
+                render_plan(node[3], context, out, filters, scopes + [{node[1]: item}], memo)
+            if not items:
+                render_plan(node[4], context, out, filters, scopes, memo)
+        elif kind == "if":
+            branch = node[2] if lookup(node[1], scopes, memo) else node[3]
+            render_plan(branch, context, out, filters, scopes, memo)